@@ -4,6 +4,8 @@ import time
 import os
 import google.generativeai as genai
 
+from datasage.normalize import normalize_values
+
 # --- 1. CONFIGURATION & UI BRANDING ---
 st.set_page_config(page_title="DataSage Autopilot", page_icon="🚀", layout="wide")
 
@@ -68,7 +70,7 @@ if uploaded_file:
                 df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
                 # Fix regional typos (e.g., SOUth -> South)
                 if 'region' in df.columns:
-                    df['region'] = df['region'].str.capitalize()
+                    df['region'], _ = normalize_values(df['region'], strip=False, case="capitalize")
                 st.session_state.cleaned_df = df
             st.success("✅ Data Cleaned by Jules Agent")
             # MANDATORY DISPLAY OF CLEANED DATA
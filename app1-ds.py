@@ -3,9 +3,29 @@ import pandas as pd
 import time
 import os
 import sys
-import google.generativeai as genai
 from datetime import datetime
-import hashlib
+import uuid
+
+from datasage.cleaning import DEFAULT_STEPS, normalize_header
+from datasage.datasets import DATASETS
+from datasage.digest import DIGEST_TOKEN_BUDGET
+from datasage.gemini import client_stats, display_name, get_resolver, set_api_key
+from datasage.excel import EXCEL_EXTENSIONS, is_excel
+from datasage.ingest import (INGEST_CACHE, IngestResult, content_digest, ingest, ingest_excel, pyarrow_available,
+                             read_bytes, sheet_names)
+from datasage.jobs import JOBS
+from datasage.metrics import METRICS, start_metrics_server
+from datasage.outofcore import duckdb_available, open_dataset, spool_upload
+from datasage.preview import COLUMN_WINDOW, PAGE_SIZES, page_count, preview_window
+from datasage.profile import profile_cached
+from datasage.progressive import PROGRESSIVE_MIN_ROWS, cached_profile, interval_caption
+from datasage.report import RECOMMENDED_ACTIONS, build_report_text, make_report_id
+from datasage.response_cache import data_fingerprint, get_response_cache
+from datasage.storage import ParquetStore
+from datasage.theme import APP_CSS
+from datasage.versions import VERSIONS, register_upload
+from datasage.workflows import (prepare_analysis, run_analysis_job, run_cleaning_job, run_out_of_core_cleaning_job,
+                                run_progressive_profile_job)
 
 # 1. PAGE CONFIG & STYLING - Updated to match images exactly
 st.set_page_config(
@@ -16,139 +36,7 @@ st.set_page_config(
 )
 
 # Custom CSS to match the exact styling from images
-st.markdown("""
-<style>
-    /* Main background */
-    .main { 
-        background-color: #f8f9fa; 
-        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-    }
-    
-    /* Headers */
-    h1 {
-        color: #1a73e8;
-        font-weight: 600;
-        border-bottom: 3px solid #1a73e8;
-        padding-bottom: 10px;
-        margin-bottom: 30px;
-    }
-    
-    h2 {
-        color: #1a73e8;
-        font-weight: 500;
-        margin-top: 25px;
-        margin-bottom: 15px;
-    }
-    
-    h3 {
-        color: #5f6368;
-        font-weight: 500;
-        margin-top: 20px;
-        margin-bottom: 10px;
-    }
-    
-    /* Buttons */
-    .stButton>button {
-        width: 100%; 
-        border-radius: 6px; 
-        height: 45px;
-        background-color: #1a73e8; 
-        color: white; 
-        font-weight: 500; 
-        border: none;
-        font-size: 14px;
-        transition: all 0.2s ease;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-    }
-    
-    .stButton>button:hover {
-        background-color: #0d62d9;
-        box-shadow: 0 2px 6px rgba(26, 115, 232, 0.3);
-    }
-    
-    /* Report box - matches Executive Strategic Brief from images */
-    .report-box {
-        border: 2px solid #1a73e8; 
-        padding: 25px; 
-        border-radius: 10px;
-        background: white;
-        box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-        margin-top: 20px;
-        font-size: 14px;
-    }
-    
-    /* Status boxes for agent progress */
-    .status-box {
-        background-color: #e8f0fe;
-        border-left: 4px solid #1a73e8;
-        padding: 12px 15px;
-        border-radius: 4px;
-        margin: 8px 0;
-        font-size: 14px;
-    }
-    
-    /* Sidebar styling */
-    .sidebar .sidebar-content {
-        background-color: white;
-        border-right: 1px solid #dadce0;
-    }
-    
-    /* Metrics styling */
-    .metric-container {
-        background: white;
-        border: 1px solid #dadce0;
-        border-radius: 8px;
-        padding: 15px;
-        margin: 10px 0;
-    }
-    
-    /* Upload area styling */
-    .upload-box {
-        border: 2px dashed #dadce0;
-        border-radius: 10px;
-        padding: 40px;
-        text-align: center;
-        background: white;
-        color: #5f6368;
-        margin: 20px 0;
-    }
-    
-    /* Data preview table */
-    .dataframe {
-        font-size: 13px;
-    }
-    
-    /* Alert boxes */
-    .stAlert {
-        border-radius: 8px;
-        padding: 15px;
-    }
-    
-    /* Custom columns for metrics */
-    .metric-card {
-        background: white;
-        border: 1px solid #e0e0e0;
-        border-radius: 8px;
-        padding: 15px;
-        text-align: center;
-        margin: 5px;
-    }
-    
-    .metric-value {
-        font-size: 24px;
-        font-weight: 600;
-        color: #1a73e8;
-    }
-    
-    .metric-label {
-        font-size: 12px;
-        color: #5f6368;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-    }
-</style>
-""", unsafe_allow_html=True)
+st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # 2. API KEY CONFIG
 API_KEY = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
@@ -174,12 +62,12 @@ if not API_KEY:
         """)
     st.stop()
 
-try:
-    genai.configure(api_key=API_KEY)
-    api_status = True
-except Exception as e:
-    st.error(f"❌ Failed to configure Gemini API: {str(e)}")
-    st.stop()
+# The Gemini SDK is imported and configured on first model call, not at startup
+set_api_key(API_KEY)
+api_status = True
+
+if os.getenv("DATASAGE_METRICS_PORT"):
+    start_metrics_server(int(os.getenv("DATASAGE_METRICS_PORT")))
 
 # 3. SIDEBAR - Updated to match images exactly
 with st.sidebar:
@@ -223,114 +111,330 @@ with st.sidebar:
     # System Metrics from image
     st.markdown("### System Metrics:")
     
-    # Create metric cards matching the image
+    # Live metric cards from the shared instrumentation
+    job_stats = JOBS.stats()
     col1, col2 = st.columns(2)
     
     with col1:
-        st.markdown("""
+        st.markdown(f"""
         <div class="metric-card">
-            <div class="metric-value">4</div>
-            <div class="metric-label">Active Agents</div>
-            <div style="font-size: 11px; color: #34a853;">+1</div>
+            <div class="metric-value">{job_stats['running'] + job_stats['queued']}</div>
+            <div class="metric-label">Active Jobs</div>
+            <div style="font-size: 11px; color: #34a853;">{job_stats['done']} done</div>
         </div>
         """, unsafe_allow_html=True)
     
     with col2:
-        st.markdown("""
+        st.markdown(f"""
         <div class="metric-card">
-            <div class="metric-value">500</div>
+            <div class="metric-value">{METRICS.count('gemini_calls')}</div>
             <div class="metric-label">API Calls</div>
-            <div style="font-size: 11px; color: #34a853;">+40</div>
+            <div style="font-size: 11px; color: #34a853;">+{METRICS.count('response_cache_hits')} cached</div>
+            <div style="font-size: 11px; color: #ea4335;">{METRICS.count('gemini_errors')} errors</div>
         </div>
         """, unsafe_allow_html=True)
+    
+    latencies = [
+        f"{label} {METRICS.last(phase):.2f}s"
+        for label, phase in [("Ingest", "ingest"), ("Profile", "profile"), ("First token", "generation_first_token"), ("Generation", "generation")]
+        if METRICS.last(phase) is not None
+    ]
+    if latencies:
+        st.caption("Last: " + " · ".join(latencies))
 
 # 4. SESSION STATE
 session_defaults = {
-    "raw_df": None,
-    "cleaned_df": None,
+    "raw_key": "",
+    "cleaned_key": "",
+    "cleaned_path": "",
     "insight": "",
     "analysis_complete": False,
     "report_generated": False,
     "file_name": "",
     "file_size": 0,
     "upload_time": None,
-    "gemini_model_used": ""
+    "gemini_model_used": "",
+    "dataset_digest": "",
+    "cleaned_fingerprint": "",
+    "session_id": "",
+    "cleaning_job": "",
+    "analysis_job": "",
+    "profile_job": "",
+    "upload_id": "",
+    "upload_digest": ""
 }
 
 for key, default in session_defaults.items():
     if key not in st.session_state:
         st.session_state[key] = default
 
+if not st.session_state.session_id:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Frames live in the process-wide dataset store; the session only keeps their keys
+raw_df = DATASETS.get(st.session_state.raw_key, st.session_state.session_id)
+cleaned_df = (
+    open_dataset(st.session_state.cleaned_path) if st.session_state.cleaned_path
+    else DATASETS.get(st.session_state.cleaned_key, st.session_state.session_id)
+)
+
+# 4b. BACKGROUND JOBS - run on the shared pool, polled on every rerun
+JOB_POLL_SECONDS = 0.5
+
+
+def render_job_messages(job):
+    for message in job.messages:
+        st.markdown(f'<div class="status-box">{message}</div>', unsafe_allow_html=True)
+    if job.active:
+        st.progress(job.progress)
+
+
+PROFILE_PRECISIONS = {"Full scan": None, "±1%": 0.01, "±5%": 0.05}
+
+
+def show_analysis_error(error_msg):
+    st.error(f"❌ **Analysis Error:** {error_msg}")
+    if "quota" in error_msg.lower():
+        st.warning(
+            "⚠️ The Gemini API quota stayed exhausted after several retries. "
+            "Try again in a minute, or check the quota in your Google AI Studio account."
+        )
+    elif "permission" in error_msg.lower() or "access" in error_msg.lower():
+        st.warning("⚠️ You may not have access to this model. Check your Google AI Studio permissions.")
+
+
+# 4c. DATA PREVIEW - only the visible page of rows and window of columns is sent to the browser
+def render_preview(frame, key):
+    total_rows, total_columns = frame.shape
+    column_pages = page_count(total_columns, COLUMN_WINDOW)
+    size_col, page_col, window_col = st.columns(3)
+    with size_col:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+    pages = page_count(total_rows, page_size)
+    for widget, last in ((f"{key}_page", pages), (f"{key}_columns", column_pages)):
+        if st.session_state.get(widget, 1) > last:
+            st.session_state[widget] = last
+    with page_col:
+        page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    with window_col:
+        column_page = st.number_input(
+            f"Column window (of {column_pages:,})", min_value=1, max_value=column_pages, step=1,
+            key=f"{key}_columns", disabled=column_pages == 1,
+            help=f"Columns are shown {COLUMN_WINDOW} at a time"
+        )
+    
+    window = preview_window(frame, page, page_size, column_page, COLUMN_WINDOW)
+    st.dataframe(
+        window.frame,
+        use_container_width=True,
+        hide_index=False,
+        column_config={
+            col: st.column_config.Column(
+                width="medium",
+                help=f"Column: {col}"
+            ) for col in window.frame.columns
+        }
+    )
+    st.caption(f"Showing {window.caption}")
+
 # 5. MAIN UI - Updated to match images
 st.title("🚀 DataSage Autopilot")
 st.markdown("### Autonomous Business Intelligence via Google Agentic Stack")
 st.markdown("---")
 
 # File upload section matching image
-st.markdown("## 📂 Upload Raw Business Data (CSV)")
+st.markdown("## 📂 Upload Raw Business Data (CSV / Excel)")
 uploaded_file = st.file_uploader(
-    "**Drag and drop file here**  \nLimit 500MB per file - CSV",
-    type=["csv"],
-    help="Upload your business data in CSV format for analysis",
+    "**Drag and drop file here**  \nLimit 500MB per file - CSV, XLSX, XLS",
+    type=["csv"] + [ext.lstrip(".") for ext in EXCEL_EXTENSIONS],
+    help="Upload your business data as CSV or an Excel workbook for analysis",
     label_visibility="collapsed"
 )
 
+INGEST_MODES = {
+    "Standard": "standard",
+    "Memory-optimized (chunked)": "optimized",
+    "Arrow (multithreaded)": "arrow",
+}
+ARROW_READY = pyarrow_available()
+if not ARROW_READY:
+    del INGEST_MODES["Arrow (multithreaded)"]
+if duckdb_available():
+    INGEST_MODES["Out-of-core (DuckDB)"] = "duckdb"
+
+mode_col, persist_col, version_col = st.columns([3, 1, 1])
+with mode_col:
+    ingest_label = st.radio(
+        "Ingestion mode",
+        list(INGEST_MODES),
+        horizontal=True,
+        help="Memory-optimized mode streams the file in chunks, downcasts numbers and stores repetitive text as categories. "
+             "Arrow mode parses on all cores into Arrow-backed columns. "
+             "Out-of-core mode leaves the CSV on disk and runs profiling and cleaning as DuckDB queries, for files larger than memory."
+    )
+with persist_col:
+    persist_parquet = st.checkbox(
+        "Persist as Parquet",
+        value=False,
+        disabled=not ARROW_READY,
+        help="Keep raw and cleaned data as Parquet in the local work directory so reopening the same file skips the parse"
+    )
+with version_col:
+    track_versions = st.checkbox(
+        "Incremental re-uploads",
+        value=False,
+        disabled=not ARROW_READY,
+        help="Recognize a new version of a file uploaded before (same name and columns) and profile, clean and "
+             "analyze only the rows that changed"
+    )
+parquet_store = ParquetStore() if persist_parquet else None
+
 if uploaded_file:
     try:
-        df = pd.read_csv(uploaded_file)
-        st.session_state.raw_df = df
+        # Hash the upload once per file, not on every rerun (job polling reruns twice a second)
+        if st.session_state.upload_id != uploaded_file.file_id:
+            st.session_state.upload_digest = content_digest(read_bytes(uploaded_file))
+            st.session_state.upload_id = uploaded_file.file_id
+        upload_digest = st.session_state.upload_digest
+        version_name = uploaded_file.name
+        if is_excel(uploaded_file.name):
+            sheets = sheet_names(uploaded_file, digest=upload_digest)
+            sheet = st.selectbox("Worksheet", sheets, help="Only the selected sheet is read") if len(sheets) > 1 else sheets[0]
+            # Workbook parses are the slowest path, so the converted sheet is always kept as Parquet when possible
+            excel_store = parquet_store or (ParquetStore() if ARROW_READY else None)
+            ingest_result = ingest_excel(uploaded_file, sheet_name=sheet, store=excel_store, digest=upload_digest)
+            version_name = f"{uploaded_file.name}#{sheet}"
+        elif INGEST_MODES[ingest_label] == "duckdb":
+            spool_start = time.perf_counter()
+            raw_path, digest = spool_upload(uploaded_file, digest=upload_digest)
+            ingest_result = IngestResult(None, digest, False, time.perf_counter() - spool_start, mode="duckdb")
+        else:
+            ingest_result = ingest(uploaded_file, INGEST_MODES[ingest_label], store=parquet_store, digest=upload_digest)
+        out_of_core = ingest_result.mode == "duckdb"
+        raw_key = f"{ingest_result.digest}:{ingest_result.mode}"
+        if st.session_state.raw_key and st.session_state.raw_key != raw_key:
+            DATASETS.release(st.session_state.raw_key, st.session_state.session_id)
+        if out_of_core:
+            # Only pages, samples and aggregates of the file are ever loaded
+            df = raw_df = open_dataset(raw_path, ingest_result.digest)
+        else:
+            df = raw_df = DATASETS.share(raw_key, ingest_result.frame, session_id=st.session_state.session_id)
+        st.session_state.raw_key = raw_key
+        st.session_state.dataset_digest = ingest_result.digest
+        # Re-uploads of a known file are compared with its previous version by row hashes
+        version = register_upload(version_name, df, ingest_result.digest) if track_versions and not out_of_core else None
+        previous_version = VERSIONS.get(version.lineage, version.previous_digest) if version and version.previous_digest else None
+        
+        if parquet_store is not None and cleaned_df is None and not out_of_core:
+            restored = parquet_store.load(ingest_result.digest, "cleaned", arrow=ingest_result.mode == "arrow")
+            if restored is not None:
+                st.session_state.cleaned_key = st.session_state.cleaned_fingerprint = f"{ingest_result.digest}:parquet-cleaned"
+                st.session_state.cleaned_path = ""
+                cleaned_df = DATASETS.share(
+                    st.session_state.cleaned_key, restored, parent=raw_key, session_id=st.session_state.session_id
+                )
         st.session_state.file_name = uploaded_file.name
         st.session_state.file_size = uploaded_file.size / 1024  # KB
         st.session_state.upload_time = datetime.now()
         
         # Show upload confirmation matching image
         st.success(f"📁 **Uploaded:** {st.session_state.file_name} ({st.session_state.file_size:.2f} KB)")
+        if ingest_result.cache_hit:
+            st.caption(f"⚡ Reused parsed data from ingestion cache ({ingest_result.seconds*1000:.0f} ms)")
+        if previous_version is not None:
+            st.caption(
+                f"🔁 New version of the file uploaded {previous_version.uploaded}: {version.delta.summary}"
+            )
+        if ingest_result.naive_bytes:
+            st.caption(
+                f"🗜️ In memory: {ingest_result.memory_bytes/1024/1024:.1f} MB "
+                f"(default load: {ingest_result.naive_bytes/1024/1024:.1f} MB, "
+                f"saved {ingest_result.memory_saved/1024/1024:.1f} MB)"
+            )
         
         st.markdown("### 🔍 Raw Data Preview (Standard MCP Context)")
         
         # Display dataframe with custom styling
-        st.dataframe(
-            df.head(),
-            use_container_width=True,
-            hide_index=False,
-            column_config={
-                col: st.column_config.Column(
-                    width="medium",
-                    help=f"Column: {col}"
-                ) for col in df.columns
-            }
-        )
+        render_preview(df, "raw_preview")
         
         # Data Quality Assessment expander
         with st.expander("🔬 Data Quality Assessment", expanded=False):
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.metric("Rows", df.shape[0])
+            # Large frames are profiled in the background from random blocks, so estimates show up at once
+            progressive = out_of_core or (version is None and len(df) >= PROGRESSIVE_MIN_ROWS)
+            profile_job = JOBS.get(st.session_state.profile_job)
+            if profile_job is not None and not progressive:
+                profile_job.cancel()
+            if progressive:
+                precision_label = st.selectbox(
+                    "Stop profiling when estimates are within",
+                    list(PROFILE_PRECISIONS),
+                    key="profile_precision",
+                    help="Missing rates within this many percentage points and means within this share of the "
+                         "column's standard deviation, at 95% confidence. Full scan profiles every row."
+                )
+                profile_key = (ingest_result.digest, ingest_result.mode)
+                # Finished profiles are shared by every session, so only the first one scans
+                profile = cached_profile(profile_key, PROFILE_PRECISIONS[precision_label])
+                stale = profile_job is not None and profile_job.meta != {"digest": ingest_result.digest, "precision": precision_label}
+                if profile_job is not None and (stale or profile is not None):
+                    if profile_job.active:
+                        profile_job.cancel()
+                    profile_job = None
+                if profile is None and profile_job is None:
+                    st.session_state.profile_job = JOBS.submit(
+                        "profile",
+                        run_progressive_profile_job,
+                        raw_key,
+                        PROFILE_PRECISIONS[precision_label],
+                        raw_path=raw_df.path if out_of_core else None,
+                        digest=ingest_result.digest,
+                        profile_key=profile_key,
+                        session_id=st.session_state.session_id,
+                        meta={"digest": ingest_result.digest, "precision": precision_label}
+                    )
+                    profile_job = JOBS.get(st.session_state.profile_job)
+                if profile_job is not None:
+                    if profile_job.status == "failed":
+                        st.error(f"❌ **Profiling Error:** {profile_job.error}")
+                    profile = profile_job.result if profile_job.status == "done" else profile_job.partial
+            elif version is not None:
+                profile = version.summary
+            else:
+                profile = profile_cached(df, (ingest_result.digest, ingest_result.mode))
+            if progressive and profile_job is not None and profile_job.active:
+                progress_col, stop_col = st.columns([4, 1])
+                with progress_col:
+                    st.progress(profile_job.progress, text=profile_job.messages[-1] if profile_job.messages else "Profiling...")
+                with stop_col:
+                    if st.button("⏹ Stop here", key="profile_stop", disabled=profile is None,
+                                 help="Keep the current estimates and stop scanning"):
+                        profile_job.cancel()
+            if profile is None:
+                st.info("⏳ Profiling the first blocks of the file...")
+            else:
+                col1, col2, col3 = st.columns(3)
             
-            with col2:
-                st.metric("Columns", df.shape[1])
+                with col1:
+                    st.metric("Rows", profile.rows)
             
-            with col3:
-                missing_total = df.isnull().sum().sum()
-                st.metric("Missing Values", missing_total, delta=f"{(missing_total/df.size*100):.1f}%" if missing_total > 0 else None)
+                with col2:
+                    st.metric("Columns", profile.columns)
             
-            # Column-wise analysis
-            st.markdown("**Column Analysis:**")
-            col_info = []
-            for col in df.columns:
-                null_count = df[col].isnull().sum()
-                unique_count = df[col].nunique()
-                dtype = str(df[col].dtype)
-                col_info.append({
-                    "Column": col,
-                    "Type": dtype,
-                    "Missing": null_count,
-                    "Unique": unique_count
-                })
+                with col3:
+                    missing_total = profile.missing_total
+                    st.metric("Missing Values", missing_total, delta=f"{profile.missing_pct:.1f}%" if missing_total > 0 else None)
             
-            col_df = pd.DataFrame(col_info)
-            st.dataframe(col_df, use_container_width=True, hide_index=True)
+                # Column-wise analysis
+                st.markdown("**Column Analysis:**")
+                st.dataframe(profile.table, use_container_width=True, hide_index=True)
+                caption = f"Profiled in {profile.seconds*1000:.0f} ms"
+                if version is not None and previous_version is not None and profile.meta.get("profiled_rows", 0) < profile.rows:
+                    caption += f" · only the {profile.meta['profiled_rows']:,} appended rows, merged with the previous version"
+                if interval_caption(profile):
+                    caption += " · " + interval_caption(profile)
+                elif profile.approximate or profile.table["Approx"].any():
+                    caption += " · Unique counts marked Approx are DuckDB HyperLogLog estimates" if out_of_core else " · Unique counts marked Approx are HyperLogLog estimates (±1%)"
+                st.caption(caption)
         
         st.markdown("---")
         
@@ -339,130 +443,211 @@ if uploaded_file:
         
         with col1:
             st.markdown("#### ⚙️ Trigger Jules Agent")
+            dedupe_keys = st.multiselect(
+                "Duplicate key columns",
+                options=[normalize_header(c) for c in df.columns],
+                key="dedupe_keys",
+                help="Leave empty to treat rows as duplicates only when every column matches"
+            )
+            cleaning_job = JOBS.get(st.session_state.cleaning_job)
+            if cleaning_job is not None and cleaning_job.meta.get("digest") != ingest_result.digest:
+                # A job for a previously uploaded file; its result no longer applies.
+                cleaning_job = None
+                st.session_state.cleaning_job = ""
+            
             if st.button("**Trigger Agent**", key="jules_btn", help="Clean and prepare data using Jules Agent"):
-                if st.session_state.raw_df is not None:
-                    with st.status("**Jules (ADK) is refactoring data...**", expanded=True) as status:
-                        # Step 1: Cleaning column names
-                        st.markdown('<div class="status-box">🔧 Cleaning column names...</div>', unsafe_allow_html=True)
-                        time.sleep(0.8)
-                        
-                        df = st.session_state.raw_df.copy()
-                        df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
-                        
-                        # Step 2: Validating data types
-                        st.markdown('<div class="status-box">📊 Validating data types...</div>', unsafe_allow_html=True)
-                        time.sleep(0.8)
-                        
-                        for col in df.select_dtypes(include=['object']).columns:
-                            df[col] = df[col].astype(str).str.strip()
-                        
-                        # Step 3: Removing duplicates
-                        st.markdown('<div class="status-box">🧹 Removing duplicates...</div>', unsafe_allow_html=True)
-                        time.sleep(0.8)
-                        
-                        initial_rows = len(df)
-                        df = df.drop_duplicates()
-                        duplicates_removed = initial_rows - len(df)
-                        
-                        st.session_state.cleaned_df = df
-                        
-                        status.update(label="✅ **Data refactoring completed**", state="complete")
+                if raw_df is not None and not (cleaning_job and cleaning_job.active):
+                    steps = list(DEFAULT_STEPS)
+                    if dedupe_keys:
+                        steps[steps.index("drop_duplicates")] = ("drop_duplicates", {"subset": tuple(dedupe_keys)})
+                    
+                    if out_of_core:
+                        st.session_state.cleaning_job = JOBS.submit(
+                            "cleaning",
+                            run_out_of_core_cleaning_job,
+                            raw_df.path,
+                            steps,
+                            raw_key,
+                            ingest_result.digest,
+                            session_id=st.session_state.session_id,
+                            meta={"digest": ingest_result.digest}
+                        )
+                    else:
+                        st.session_state.cleaning_job = JOBS.submit(
+                            "cleaning",
+                            run_cleaning_job,
+                            st.session_state.raw_key,
+                            steps,
+                            raw_key,
+                            parquet_store,
+                            ingest_result.digest,
+                            lineage=version.lineage if version is not None else None,
+                            session_id=st.session_state.session_id,
+                            meta={"digest": ingest_result.digest}
+                        )
+                    cleaning_job = JOBS.get(st.session_state.cleaning_job)
+            
+            if cleaning_job is not None:
+                if cleaning_job.active:
+                    with st.status("**Jules (ADK) is refactoring data...**", expanded=True, state="running"):
+                        render_job_messages(cleaning_job)
+                elif cleaning_job.status == "failed":
+                    with st.status("❌ **Data refactoring failed**", expanded=True, state="error"):
+                        render_job_messages(cleaning_job)
+                    st.error(f"❌ **Cleaning Error:** {cleaning_job.error}")
+                elif "path" not in cleaning_job.result and cleaning_job.result["dataset"] not in DATASETS:
+                    # Evicted after the session sat idle; the cached cleaning steps make a rerun cheap.
+                    st.warning("⏳ Cleaned data was unloaded after inactivity. Trigger the agent again.")
+                    st.session_state.cleaning_job = ""
+                else:
+                    step_results = cleaning_job.result["steps"]
+                    duplicates_removed = sum(r.rows_affected for r in step_results if r.name == "drop_duplicates")
+                    
+                    st.session_state.cleaned_key = cleaning_job.result["dataset"]
+                    st.session_state.cleaned_path = cleaning_job.result.get("path", "")
+                    st.session_state.cleaned_fingerprint = step_results[-1].fingerprint if step_results else ""
+                    df = cleaned_df = (
+                        open_dataset(st.session_state.cleaned_path) if st.session_state.cleaned_path
+                        else DATASETS.get(st.session_state.cleaned_key, st.session_state.session_id)
+                    )
+                    
+                    total_ms = sum(r.seconds for r in step_results) * 1000
+                    with st.status(f"✅ **Data refactoring completed** ({total_ms:.0f} ms)", expanded=False, state="complete"):
+                        render_job_messages(cleaning_job)
                     
                     st.success("🎉 **Data Cleaned by Jules Agent**")
                     
                     # Show cleaned data in expander
                     with st.expander("📊 View Cleaned Data", expanded=True):
-                        st.dataframe(
-                            st.session_state.cleaned_df.head(),
-                            use_container_width=True,
-                            hide_index=False
-                        )
+                        render_preview(cleaned_df, "cleaned_preview")
                         
                         # Show data cleaning stats
-                        col1, col2 = st.columns(2)
-                        with col1:
+                        stat_col1, stat_col2 = st.columns(2)
+                        with stat_col1:
                             st.metric("New Shape", f"{df.shape[0]} rows × {df.shape[1]} cols")
-                        with col2:
+                        with stat_col2:
                             st.metric("Duplicates Removed", duplicates_removed)
         
         with col2:
             st.markdown("#### 📊 Run Gemini Analysis")
+            stream_analysis = st.checkbox(
+                "Stream response",
+                value=True,
+                key="stream_analysis",
+                help="Show the analysis as Gemini writes it instead of waiting for the full answer"
+            )
+            reuse_cached = st.checkbox(
+                "Reuse cached analysis",
+                value=True,
+                key="reuse_cached_analysis",
+                help="Answer repeat analyses of the same data from the local response cache"
+            )
+            token_budget = st.number_input(
+                "Prompt token budget",
+                min_value=100,
+                max_value=30000,
+                value=DIGEST_TOKEN_BUDGET,
+                step=100,
+                key="digest_token_budget",
+                help="Upper bound on the tokens used to describe the data to Gemini"
+            )
+            analysis_depth = st.radio(
+                "Analysis depth",
+                ["Quick", "Deep (column groups)"],
+                horizontal=True,
+                key="analysis_depth",
+                help="Deep analysis sends one prompt per group of columns concurrently and ranks the risks found"
+            )
+            deep_analysis = analysis_depth == "Deep (column groups)"
+            changes_only = previous_version is not None and st.checkbox(
+                "Analyze only what changed",
+                value=True,
+                key="changes_only",
+                disabled=deep_analysis,
+                help="Send Gemini the changes since the previous upload and its earlier findings instead of the whole file"
+            ) and not deep_analysis
+            analysis_job = JOBS.get(st.session_state.analysis_job)
+            
             if st.button("**Run Analysis**", key="gemini_btn", help="Analyze data with Gemini AI"):
-                if st.session_state.cleaned_df is not None:
-                    data_sample = st.session_state.cleaned_df.head(10).to_string()
+                if cleaned_df is not None:
+                    plan = prepare_analysis(
+                        cleaned_df,
+                        st.session_state.cleaned_fingerprint,
+                        int(token_budget),
+                        deep=deep_analysis,
+                        changes=(version, previous_version) if changes_only else None
+                    )
                     
-                    with st.spinner("🔍 **Discovering available Gemini models...**"):
+                    model_resolver = get_resolver()
+                    spinner_text = (
+                        "🔍 **Discovering available Gemini models...**" if model_resolver.models is None
+                        else "🤖 **Gemini Reasoning Engine active...**"
+                    )
+                    with st.spinner(spinner_text):
                         try:
-                            models = genai.list_models()
-                            available_models = [
-                                m.name for m in models 
-                                if 'generateContent' in m.supported_generation_methods
-                            ]
+                            model_name = model_resolver.resolve()
                             
-                            if not available_models:
+                            if not model_name:
                                 st.error("No Gemini models available with generateContent capability")
                                 st.stop()
                             
-                            # Model selection logic
-                            model_name = None
-                            for preference in ["gemini-2.0-flash", "gemini-1.5-flash", "gemini-1.5-pro", "gemini-pro"]:
-                                for model in available_models:
-                                    if preference in model.lower():
-                                        model_name = model
-                                        break
-                                if model_name:
-                                    break
-                            
-                            if not model_name:
-                                model_name = available_models[0]
-                            
-                            model_display = model_name.split('/')[-1].replace('models/', '')
+                            model_display = display_name(model_name)
                             st.session_state.gemini_model_used = model_display
                             
                             st.info(f"🤖 **Using model:** {model_display}")
+                            st.caption(plan.caption)
                             
-                            # Create prompt for analysis
-                            prompt = f"""
-                            Analyze this business data and identify ONE significant business risk.
-                            Focus on data quality, operational issues, or strategic risks.
-                            
-                            Data Sample:
-                            {data_sample}
-                            
-                            Provide your response in this format:
-                            
-                            **Risk:** [Concise risk name]
-                            
-                            **Explanation:** [Brief explanation focusing on data quality issues like:
-                            - sales_amount containing non-numeric values or errors
-                            - region having inconsistent casing or missing values
-                            - customer_feedback having missing values]
-                            
-                            **Impact:** [Business impact - how this affects decision making]
-                            
-                            **Recommendation:** [Suggested action steps]
-                            
-                            Keep the response professional and concise.
-                            """
+                            response_cache = get_response_cache()
+                            sample_fingerprint = data_fingerprint(plan.data_sample)
+                            cached = response_cache.get(model_name, plan.prompt_version, sample_fingerprint) if reuse_cached else None
                             
-                            model = genai.GenerativeModel(model_name)
-                            response = model.generate_content(prompt)
-                            st.session_state.insight = response.text
-                            st.session_state.analysis_complete = True
-                            
-                            # Display analysis result
-                            st.markdown("### 🎯 Analysis Result")
-                            st.markdown(st.session_state.insight)
+                            if cached is not None:
+                                st.session_state.insight = cached.text
+                                st.session_state.analysis_complete = True
+                                if version is not None:
+                                    VERSIONS.save_insight(version.lineage, version.digest, cached.text)
+                                st.session_state.analysis_job = ""
+                                analysis_job = None
+                                
+                                # Display analysis result
+                                st.markdown("### 🎯 Analysis Result")
+                                st.markdown(st.session_state.insight)
+                                st.caption(f"⚡ Cached analysis from {datetime.fromtimestamp(cached.created_at).strftime('%d-%m-%Y %H:%M')} · no API call made")
+                            elif not (analysis_job and analysis_job.active):
+                                st.session_state.analysis_job = JOBS.submit(
+                                    "analysis",
+                                    run_analysis_job,
+                                    model_name,
+                                    plan.prompt_version,
+                                    sample_fingerprint,
+                                    prompt=plan.prompt,
+                                    group_prompt_list=plan.group_prompt_list,
+                                    stream=stream_analysis,
+                                    version=version,
+                                    session_id=st.session_state.session_id
+                                )
+                                analysis_job = JOBS.get(st.session_state.analysis_job)
                             
                         except Exception as e:
-                            error_msg = str(e)
-                            st.error(f"❌ **Analysis Error:** {error_msg}")
-                            if "quota" in error_msg.lower():
-                                st.warning("⚠️ You may have exceeded your API quota. Check your Google AI Studio account.")
-                            elif "permission" in error_msg.lower() or "access" in error_msg.lower():
-                                st.warning("⚠️ You may not have access to this model. Check your Google AI Studio permissions.")
+                            show_analysis_error(str(e))
                 else:
                     st.error("⚠️ **Please run Jules Agent first to clean the data!**")
+            
+            if analysis_job is not None:
+                # Display analysis result
+                st.markdown("### 🎯 Analysis Result")
+                if analysis_job.active:
+                    with st.status("🤖 **Gemini Reasoning Engine active...**", expanded=True, state="running"):
+                        render_job_messages(analysis_job)
+                    if analysis_job.partial_text:
+                        st.markdown(analysis_job.partial_text + " ▌")
+                elif analysis_job.status == "failed":
+                    show_analysis_error(analysis_job.error)
+                else:
+                    st.session_state.insight = analysis_job.result["insight"]
+                    st.session_state.analysis_complete = True
+                    st.markdown(st.session_state.insight)
+                    st.caption(analysis_job.result["caption"])
         
         with col3:
             st.markdown("#### 📄 Generate Stitch Report")
@@ -492,10 +677,11 @@ if uploaded_file:
                     st.session_state.report_generated = True
                     
                     # Generate Report ID
-                    report_id = hashlib.md5(f"{st.session_state.file_name}{datetime.now()}".encode()).hexdigest()[:12].upper()
+                    report_id = make_report_id(st.session_state.file_name)
                     
                     # Format insight for HTML display
                     insight_html = st.session_state.insight.replace("**", "").replace("\n", "<br>")
+                    actions_html = "".join(f'<li style="margin-bottom:8px;">{action}</li>' for action in RECOMMENDED_ACTIONS)
                     
                     # Executive Strategic Brief matching image exactly
                     st.markdown(f"""
@@ -524,11 +710,7 @@ if uploaded_file:
                         <div style="background:#f9f9f9; padding:20px; border-radius:8px; margin-top:20px; border:1px solid #e0e0e0;">
                             <h4 style="color:#1a73e8; font-size:16px; margin-bottom:15px;">📋 Recommended Actions:</h4>
                             <ol style="color:#5f6368; padding-left:20px;">
-                                <li style="margin-bottom:8px;">Immediate data validation for Sales_Amount column</li>
-                                <li style="margin-bottom:8px;">Regional data standardization protocol implementation</li>
-                                <li style="margin-bottom:8px;">Weekly automated data quality audits</li>
-                                <li style="margin-bottom:8px;">Stakeholder review of BI reporting accuracy</li>
-                                <li style="margin-bottom:8px;">Data governance framework establishment</li>
+                                {actions_html}
                             </ol>
                         </div>
                         
@@ -539,32 +721,13 @@ if uploaded_file:
                     """, unsafe_allow_html=True)
                     
                     # Create downloadable report text
-                    report_text = f"""EXECUTIVE STRATEGIC BRIEF
-================================================================================
-Report ID: A24-{report_id}
-Generated: {current_date}
-Project ID: 452177523793
-Source File: {st.session_state.file_name}
-File Size: {st.session_state.file_size:.2f} KB
-Analysis Model: {st.session_state.gemini_model_used}
-
-CRITICAL RISK IDENTIFIED
-================================================================================
-{st.session_state.insight}
-
-RECOMMENDED ACTIONS
-================================================================================
-1. Immediate data validation for Sales_Amount column
-2. Regional data standardization protocol implementation
-3. Weekly automated data quality audits
-4. Stakeholder review of BI reporting accuracy
-5. Data governance framework establishment
-
-================================================================================
-DataSage Autopilot v1.0 | Google Agentic Stack
-Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-================================================================================
-"""
+                    report_text = build_report_text(
+                        report_id,
+                        st.session_state.file_name,
+                        st.session_state.file_size,
+                        st.session_state.gemini_model_used,
+                        st.session_state.insight
+                    )
                     
                     # Download button
                     st.download_button(
@@ -579,16 +742,16 @@ Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
                     st.error("⚠️ **Please complete Gemini Analysis first!**")
     
     except Exception as e:
-        st.error(f"❌ **Error loading CSV file:** {str(e)}")
-        st.info("Please ensure you're uploading a valid CSV file with proper formatting.")
+        st.error(f"❌ **Error loading file:** {str(e)}")
+        st.info("Please ensure you're uploading a valid CSV file or Excel workbook with proper formatting.")
 
 else:
     # Upload placeholder matching image
     st.markdown("""
     <div class="upload-box">
         <h3 style="color:#5f6368; margin-bottom:15px;">📁 No file uploaded</h3>
-        <p style="color:#5f6368; margin-bottom:10px;">Drag and drop a CSV file here to begin analysis</p>
-        <p style="color:#999; font-size:0.9em;"><small>Supported: CSV files up to 500MB</small></p>
+        <p style="color:#5f6368; margin-bottom:10px;">Drag and drop a CSV or Excel file here to begin analysis</p>
+        <p style="color:#999; font-size:0.9em;"><small>Supported: CSV, XLSX and XLS files up to 500MB</small></p>
         <div style="margin-top:20px; color:#1a73e8;">
             <small>Try uploading: sample_database.csv</small>
         </div>
@@ -614,13 +777,88 @@ with st.expander("🔧 System Information", expanded=False):
         st.write(f"- Pandas: {pd.__version__}")
         st.write(f"- Python: {sys.version.split()[0]}")
         
-        if st.session_state.raw_df is not None:
-            st.write(f"- Data Shape: {st.session_state.raw_df.shape}")
+        if raw_df is not None:
+            st.write(f"- Data Shape: {raw_df.shape}")
         
         st.write(f"- API Status: {'✅ Active' if api_status else '❌ Inactive'}")
+        
+        cache_stats = INGEST_CACHE.stats()
+        st.write(
+            f"- Ingestion Cache: {cache_stats['entries']} files, "
+            f"{cache_stats['bytes']/1024/1024:.1f}/{cache_stats['max_bytes']/1024/1024:.0f} MB, "
+            f"{cache_stats['hits']} hits / {cache_stats['misses']} misses"
+        )
+        
+        dataset_stats = DATASETS.stats()
+        st.write(
+            f"- Shared Datasets: {dataset_stats['datasets']} held for {dataset_stats['sessions']} sessions, "
+            f"{dataset_stats['resident_mb']:.1f}/{dataset_stats['max_mb']:.0f} MB resident, "
+            f"{dataset_stats['mapped']} memory-mapped"
+        )
+        
+        response_stats = get_response_cache().stats()
+        st.write(
+            f"- Response Cache: {response_stats['entries']} analyses, "
+            f"{response_stats['hits']} hits / {response_stats['misses']} misses"
+        )
+        
+        job_stats = JOBS.stats()
+        st.write(
+            f"- Background Jobs: {job_stats['running']} running, {job_stats['queued']} queued "
+            f"on {job_stats['workers']} workers"
+        )
+        
+        client = client_stats()
+        st.write(
+            f"- Gemini Client: {client['in_flight']} in flight at {client['rpm']:.0f} req/min, "
+            f"{client['throttled']} throttled, {client['retries']} retried, {client['coalesced']} coalesced"
+        )
+        
+        model_resolver = get_resolver()
+        if model_resolver.models is not None:
+            st.write(
+                f"- Gemini Models: {len(model_resolver.models)} cached, "
+                f"refreshed {model_resolver.age/60:.0f} min ago (TTL {model_resolver.ttl/60:.0f} min)"
+            )
     
     with col2:
         st.write("**Session State:**")
         for key in ["file_name", "file_size", "analysis_complete", "report_generated"]:
             value = st.session_state.get(key, "Not set")
             st.write(f"- {key}: {value}")
+    
+    st.write("**Phase Metrics (this process):**")
+    metrics_snapshot = METRICS.snapshot()
+    if metrics_snapshot["phases"]:
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "Phase": name,
+                    "Runs": stats["count"],
+                    "Last (s)": round(stats["last_seconds"], 4),
+                    "Max (s)": round(stats["max_seconds"], 4),
+                    "Peak RSS (MB)": round(stats["peak_rss_bytes"] / 1024 / 1024, 1),
+                    "Rows": stats["last_rows"],
+                    "Columns": stats["last_columns"],
+                }
+                for name, stats in sorted(metrics_snapshot["phases"].items())
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
+    st.write(" · ".join(f"{name}: {value}" for name, value in sorted(metrics_snapshot["counters"].items())) or "No events yet")
+    
+    export_col1, export_col2 = st.columns(2)
+    with export_col1:
+        st.download_button("📥 Metrics (JSON)", METRICS.to_json(), file_name="datasage_metrics.json", mime="application/json", key="metrics_json")
+    with export_col2:
+        st.download_button("📥 Metrics (Prometheus)", METRICS.to_prometheus(), file_name="datasage_metrics.prom", mime="text/plain", key="metrics_prom")
+
+# 8. JOB POLLING - rerun while this session has background work in flight
+if any(
+    job is not None and job.active
+    for job in (JOBS.get(st.session_state.cleaning_job), JOBS.get(st.session_state.analysis_job),
+                JOBS.get(st.session_state.profile_job))
+):
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
@@ -0,0 +1 @@
+"""Reproducible benchmarks for the DataSage engine (see ``python -m benchmarks.run --help``)."""
@@ -0,0 +1,75 @@
+"""Offline stand-in for ``google.generativeai`` used by the benchmarks.
+
+Mimics the parts of the SDK the app touches (``configure``, ``list_models``,
+``GenerativeModel.generate_content`` with and without ``stream=True``, and
+``generate_content_async``) with deterministic text and configurable latency,
+so benchmark numbers depend on our code, not on the network.
+"""
+import asyncio
+import hashlib
+import time
+from types import SimpleNamespace
+
+FIRST_TOKEN_SECONDS = 0.0
+SECONDS_PER_CHUNK = 0.0
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def fake_answer(prompt):
+    tag = hashlib.blake2b(prompt.encode(), digest_size=4).hexdigest()
+    severity = int(tag, 16) % 10 + 1
+    return (
+        f"**Risk:** Synthetic risk {tag}\n\n"
+        f"**Severity:** {severity}\n\n"
+        "**Explanation:** Sales_Amount contains non-numeric values and Region has inconsistent casing.\n\n"
+        "**Impact:** Revenue reporting by region is unreliable.\n\n"
+        "**Recommendation:** Validate amounts at ingestion and standardize region names."
+    )
+
+
+class GenerativeModel:
+    calls = 0
+
+    def __init__(self, model_name, first_token_seconds=None, seconds_per_chunk=None):
+        self.model_name = model_name
+        self.first_token_seconds = FIRST_TOKEN_SECONDS if first_token_seconds is None else first_token_seconds
+        self.seconds_per_chunk = SECONDS_PER_CHUNK if seconds_per_chunk is None else seconds_per_chunk
+
+    def _chunks(self, prompt):
+        text = fake_answer(prompt)
+        return [text[i:i + 40] for i in range(0, len(text), 40)]
+
+    def generate_content(self, prompt, stream=False):
+        GenerativeModel.calls += 1
+        chunks = self._chunks(prompt)
+        if not stream:
+            time.sleep(self.first_token_seconds + self.seconds_per_chunk * len(chunks))
+            return FakeResponse("".join(chunks))
+
+        def iterate():
+            time.sleep(self.first_token_seconds)
+            for chunk in chunks:
+                yield FakeResponse(chunk)
+                time.sleep(self.seconds_per_chunk)
+        return iterate()
+
+    async def generate_content_async(self, prompt):
+        GenerativeModel.calls += 1
+        chunks = self._chunks(prompt)
+        await asyncio.sleep(self.first_token_seconds + self.seconds_per_chunk * len(chunks))
+        return FakeResponse("".join(chunks))
+
+
+def configure(api_key=None):
+    pass
+
+
+def list_models():
+    return [
+        SimpleNamespace(name="models/gemini-2.0-flash", supported_generation_methods=["generateContent"]),
+        SimpleNamespace(name="models/embedding-001", supported_generation_methods=["embedContent"]),
+    ]
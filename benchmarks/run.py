@@ -0,0 +1,236 @@
+"""Time each DataSage phase on synthetic datasets and write a JSON results file.
+
+    python -m benchmarks.run --rows 10000 100000 1000000 --widths 5 25
+    python -m benchmarks.run --output new.json --compare bench_results.json
+
+Phases: ingestion (every available mode), quality profile, the per-column
+distinct counts on one worker and on ``DATASAGE_PARALLEL_WORKERS``, each Jules
+cleaning step, analysis digest, analysis against the offline Gemini stand-in, and
+Stitch report rendering. Each phase records its best wall time over
+``--repeat`` runs and, from separate runs, its peak memory three ways:
+tracemalloc (Python objects and numpy buffers), the Arrow memory pool (pandas
+3 strings and the arrow mode live there, invisible to tracemalloc) and the
+process RSS. The results file is stable JSON so two runs can be diffed or
+compared with ``--compare``.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from datasage.cleaning import CLEANING_STEPS, DEFAULT_STEPS
+from datasage.digest import build_digest
+from datasage.gemini import generate, set_rate_limits
+from datasage.ingest import ingest, pyarrow_available
+from datasage.metrics import RSSSampler
+from datasage.parallel import PARALLEL_WORKERS, map_columns
+from datasage.profile import column_distinct, profile_frame
+from datasage.prompts import build_risk_prompt
+from datasage.report import build_report_text, make_report_id
+
+from . import fake_gemini
+from .synthetic import generate_csv
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+DEFAULT_WIDTHS = [5, 25]
+
+
+def arrow_allocated_bytes():
+    import pyarrow as pa
+
+    return pa.total_allocated_bytes()
+
+
+def measure(func, repeat=1, memory=True):
+    """Return (result, best seconds over ``repeat`` untimed runs, peak memory).
+
+    Peak memory is ``{"peak_bytes", "peak_arrow_bytes", "peak_rss_bytes"}``:
+    the tracemalloc peak from one traced run, kept separate because tracing
+    slows allocation-heavy code by several times, and the rise of the Arrow
+    pool and of RSS over their starting values from one sampled run. RSS
+    understates phases that reuse memory freed by earlier ones.
+    """
+    peak = {"peak_bytes": 0, "peak_arrow_bytes": 0, "peak_rss_bytes": 0}
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        samplers = {"peak_rss_bytes": RSSSampler()}
+        if pyarrow_available():
+            samplers["peak_arrow_bytes"] = RSSSampler(probe=arrow_allocated_bytes)
+        for sampler in samplers.values():
+            sampler.start()
+        try:
+            func()
+        finally:
+            for name, sampler in samplers.items():
+                peak[name] = max(sampler.stop() - sampler.start_bytes, 0)
+    best = None
+    result = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best, peak
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench_dataset(rows, width, repeat, memory, cache_dir):
+    data = generate_csv(rows, width, cache_dir=cache_dir)
+    records = []
+
+    def record(phase, seconds, peak, extra=None):
+        entry = {
+            "dataset": f"{rows}x{width}",
+            "rows": rows,
+            "width": width,
+            "csv_bytes": len(data),
+            "phase": phase,
+            "seconds": round(seconds, 6),
+            "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        }
+        entry.update({name: int(value) for name, value in peak.items()})
+        entry.update(extra or {})
+        records.append(entry)
+        print(f"  {entry['dataset']:>14} {phase:<26} {seconds:9.4f}s  peak {entry['peak_bytes'] / 1e6:8.1f} MB "
+              f"arrow {entry['peak_arrow_bytes'] / 1e6:8.1f} MB  rss {entry['peak_rss_bytes'] / 1e6:8.1f} MB",
+              file=sys.stderr)
+
+    modes = ["standard", "optimized"] + (["arrow"] if pyarrow_available() else [])
+    frame = None
+    for mode in modes:
+        result, seconds, peak = measure(lambda: ingest(data, mode, cache=None), repeat, memory)
+        record(f"ingest:{mode}", seconds, peak, {"frame_bytes": result.memory_bytes})
+        if mode == "standard":
+            frame = result.frame
+        del result
+
+    _, seconds, peak = measure(lambda: profile_frame(frame), repeat, memory)
+    record("profile", seconds, peak)
+
+    # min_cells=0 forces the pool even on small frames, so the two phases time the same work.
+    for workers in sorted({1, PARALLEL_WORKERS}):
+        map_columns(column_distinct, frame, workers=workers, min_cells=0)  # start the pool untimed
+        _, seconds, peak = measure(lambda: map_columns(column_distinct, frame, workers=workers, min_cells=0),
+                                   repeat, memory)
+        record(f"columns:workers={workers}", seconds, peak)
+
+    current = frame
+    clean_total = 0.0
+    for name in DEFAULT_STEPS:
+        step = CLEANING_STEPS[name]
+        (output, affected, _), seconds, peak = measure(lambda: step(current), repeat, memory)
+        record(f"clean:{name}", seconds, peak, {"rows_affected": int(affected)})
+        clean_total += seconds
+        current = output
+    record("clean:total", clean_total, {"peak_bytes": 0, "peak_arrow_bytes": 0, "peak_rss_bytes": 0})
+
+    digest, seconds, peak = measure(lambda: build_digest(current), repeat, memory)
+    record("digest", seconds, peak, {"tokens": digest.tokens})
+
+    model = fake_gemini.GenerativeModel("models/gemini-2.0-flash")
+    prompt = build_risk_prompt(digest.text)
+    analysis, seconds, peak = measure(lambda: generate(model, prompt), repeat, memory)
+    record("analyze:fake", seconds, peak)
+
+    _, seconds, peak = measure(
+        lambda: build_report_text(make_report_id("synthetic.csv"), "synthetic.csv", len(data) / 1024,
+                                  "gemini-2.0-flash", analysis.text),
+        repeat, memory,
+    )
+    record("report", seconds, peak)
+    return records
+
+
+def compare(results, baseline_path, threshold):
+    """Print phases slower than ``threshold`` x baseline; return the number of regressions."""
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)
+    before = {(r["dataset"], r["phase"]): r for r in baseline["results"]}
+    regressions = 0
+    for r in results:
+        old = before.get((r["dataset"], r["phase"]))
+        if not old or not old["seconds"]:
+            continue
+        ratio = r["seconds"] / old["seconds"]
+        if ratio > threshold:
+            regressions += 1
+            print(f"REGRESSION {r['dataset']} {r['phase']}: {old['seconds']:.4f}s -> {r['seconds']:.4f}s "
+                  f"({ratio:.2f}x)")
+    print(f"{regressions} regression(s) above {threshold:.2f}x against {baseline_path}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS,
+                        help="dataset sizes in rows (default: %(default)s)")
+    parser.add_argument("--widths", type=int, nargs="+", default=DEFAULT_WIDTHS,
+                        help="dataset widths in columns, minimum 5 (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="timed runs per phase; the best is kept (default: %(default)s)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the memory runs (faster, no peak memory)")
+    parser.add_argument("--cache-dir", default=os.path.join(".datasage", "bench"),
+                        help="where generated CSVs are kept between runs (default: %(default)s)")
+    parser.add_argument("--output", default="bench_results.json", help="results file (default: %(default)s)")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown ratio reported as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    memory = not args.no_memory
+    # The offline stand-in has no quota; throttling would only time the limiter.
+    set_rate_limits(rpm=0, tpm=0)
+    results = []
+    for rows in args.rows:
+        for width in args.widths:
+            results.extend(bench_dataset(rows, width, args.repeat, memory, args.cache_dir))
+
+    payload = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "memory_tracing": memory,
+            "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as fh:
+        json.dump(payload, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+    print(f"wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Guard app cold start: engine import time and first render of the Streamlit app.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --max-import-ms 1500 --max-render-ms 4000
+
+Each measurement runs in a fresh interpreter so nothing is already imported.
+The import check also fails if importing the app's engine modules pulls in the
+Gemini SDK, which must stay lazy. The first-render check drives ``app1-ds.py``
+through ``streamlit.testing`` against the offline Gemini stand-in and is
+skipped when Streamlit is not installed. Exits 1 when a budget is exceeded.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+APP_SCRIPT = "app1-ds.py"
+SDK_MODULE = "google.generativeai"
+
+ENGINE_MODULES = [
+    "datasage.cleaning",
+    "datasage.gemini",
+    "datasage.ingest",
+    "datasage.jobs",
+    "datasage.metrics",
+    "datasage.profile",
+    "datasage.report",
+    "datasage.response_cache",
+    "datasage.storage",
+    "datasage.theme",
+    "datasage.workflows",
+]
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+print(json.dumps({{"seconds": time.perf_counter() - start, "sdk_loaded": {sdk!r} in sys.modules}}))
+"""
+
+RENDER_PROBE = """
+import json, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+app = AppTest.from_file({script!r}, default_timeout=120).run()
+print(json.dumps({{"seconds": time.perf_counter() - start, "errors": [str(e.value) for e in app.exception]}}))
+"""
+
+
+def run_probe(code, env=None):
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         env={**os.environ, **(env or {})})
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_import():
+    return run_probe(IMPORT_PROBE.format(modules=ENGINE_MODULES, sdk=SDK_MODULE))
+
+
+def measure_render():
+    if importlib.util.find_spec("streamlit") is None:
+        return None
+    env = {
+        "DATASAGE_GENAI_MODULE": "benchmarks.fake_gemini",
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY") or "offline-benchmark",
+    }
+    return run_probe(RENDER_PROBE.format(script=APP_SCRIPT), env)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-import-ms", type=float, default=1500,
+                        help="budget for importing the engine (default: %(default)s)")
+    parser.add_argument("--max-render-ms", type=float, default=4000,
+                        help="budget for the app's first render (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the best is kept (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    failures = []
+    imports = [measure_import() for _ in range(args.repeat)]
+    import_ms = min(r["seconds"] for r in imports) * 1000
+    print(f"engine import   {import_ms:8.1f} ms  (budget {args.max_import_ms:.0f} ms)")
+    if import_ms > args.max_import_ms:
+        failures.append("engine import over budget")
+    if any(r["sdk_loaded"] for r in imports):
+        failures.append(f"{SDK_MODULE} imported eagerly by the engine")
+
+    renders = [measure_render() for _ in range(args.repeat)]
+    if renders[0] is None:
+        print("first render    skipped (streamlit not installed)")
+    else:
+        render_ms = min(r["seconds"] for r in renders) * 1000
+        print(f"first render    {render_ms:8.1f} ms  (budget {args.max_render_ms:.0f} ms)")
+        if render_ms > args.max_render_ms:
+            failures.append("first render over budget")
+        errors = [e for r in renders for e in r["errors"]]
+        if errors:
+            failures.append(f"app raised during first render: {errors[0]}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
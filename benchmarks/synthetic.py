@@ -0,0 +1,81 @@
+"""Synthetic business datasets shaped like ``sample_datasage.xlsx.csv``.
+
+Columns mirror the sample export and its defects:
+
+* ``Order_ID``           - sequential id
+* ``Date``               - dd-mm-yyyy text
+* ``Region``             - messy casing and padding ("SOUth", " north ") and nulls
+* ``Sales_Amount``       - numbers stored as text with ``ERROR_404`` and negatives
+* ``Customer_Feedback``  - short free text with ~20% nulls
+
+``width`` adds extra numeric and categorical columns to reach that many
+columns, and ``duplicate_rate`` repeats earlier rows verbatim. Generation is
+seeded, so the same arguments always give the same bytes.
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE_COLUMNS = 5
+REGIONS = ["North", "South", "East", "West", "SOUth", " north", "EAST ", "west"]
+FEEDBACK = [
+    "Great service!", "Fast delivery.", "Late arrival, very unhappy.",
+    "Loved the product.", "Average.", "Would buy again", "Package damaged",
+]
+SEGMENTS = ["Retail", "Wholesale", "Online", "Partner", "Enterprise"]
+
+
+def generate_frame(rows, width=BASE_COLUMNS, duplicate_rate=0.02, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+
+    region = pd.Series(rng.choice(REGIONS, rows), dtype=object)
+    region[rng.random(rows) < 0.03] = None
+
+    sales = rng.gamma(2.0, 400.0, rows).round(2)
+    sales[rng.random(rows) < 0.01] *= -1
+    sales_text = pd.Series(sales.astype(str), dtype=object)
+    sales_text[rng.random(rows) < 0.005] = "ERROR_404"
+
+    feedback = pd.Series(rng.choice(FEEDBACK, rows), dtype=object)
+    feedback[rng.random(rows) < 0.2] = None
+
+    df = pd.DataFrame({
+        "Order_ID": np.arange(1, rows + 1),
+        "Date": dates.strftime("%d-%m-%Y"),
+        "Region": region,
+        "Sales_Amount": sales_text,
+        "Customer_Feedback": feedback,
+    })
+    for i in range(max(width - BASE_COLUMNS, 0)):
+        if i % 2:
+            df[f"Segment {i}"] = rng.choice(SEGMENTS, rows)
+        else:
+            df[f"Metric {i}"] = rng.normal(100, 15, rows).round(3)
+
+    dupes = int(rows * duplicate_rate)
+    if dupes:
+        positions = rng.integers(0, rows, dupes)
+        targets = rng.choice(rows, dupes, replace=False)
+        df.iloc[targets] = df.iloc[positions].to_numpy()
+    return df
+
+
+def generate_csv(rows, width=BASE_COLUMNS, duplicate_rate=0.02, seed=0, cache_dir=None):
+    """CSV bytes for a synthetic dataset, optionally cached on disk between runs."""
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, f"synthetic_{rows}x{width}_d{duplicate_rate}_s{seed}.csv")
+        if os.path.exists(path):
+            with open(path, "rb") as fh:
+                return fh.read()
+    buf = io.StringIO()
+    generate_frame(rows, width, duplicate_rate, seed).to_csv(buf, index=False)
+    data = buf.getvalue().encode()
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path, "wb") as fh:
+            fh.write(data)
+    return data
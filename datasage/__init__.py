@@ -0,0 +1 @@
+"""DataSage Autopilot engine: ingestion, cleaning and analysis helpers shared by the Streamlit apps."""
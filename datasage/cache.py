@@ -0,0 +1,119 @@
+"""Memory-bounded LRU cache used to keep parsed datasets alive across Streamlit reruns."""
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def approx_nbytes(value):
+    """Best-effort size of a cached value in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, tuple):
+        return sum(approx_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by total size in bytes.
+
+    Streamlit serves every session from the same process, so one instance is
+    shared by all reruns and sessions. Entries larger than the whole budget are
+    never stored. With ``max_entries`` and no ``max_bytes`` the cache holds a
+    fixed number of entries instead and never sizes them.
+    """
+
+    def __init__(self, max_bytes=None, sizeof=approx_nbytes, max_entries=None):
+        if max_bytes is None and max_entries is None:
+            raise ValueError("LRUCache needs max_bytes or max_entries")
+        self.max_bytes = int(max_bytes) if max_bytes is not None else None
+        self.max_entries = max_entries
+        self._sizeof = sizeof if max_bytes is not None else (lambda value: 0)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return False
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self._over_budget():
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+            return True
+
+    def _over_budget(self):
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.current_bytes > self.max_bytes
+
+    def remap(self, func):
+        """Replace every value with ``func(value)``; entries mapped to None are dropped.
+
+        Returns the number of entries changed or dropped.
+        """
+        changed = 0
+        with self._lock:
+            for key, (value, size) in list(self._entries.items()):
+                new = func(value)
+                if new is value:
+                    continue
+                changed += 1
+                self.current_bytes -= size
+                if new is None:
+                    del self._entries[key]
+                else:
+                    new_size = self._sizeof(new)
+                    self._entries[key] = (new, new_size)
+                    self.current_bytes += new_size
+        return changed
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
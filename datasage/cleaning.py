@@ -0,0 +1,188 @@
+"""Jules cleaning pipeline.
+
+Cleaning is a sequence of registered steps. Every step output is cached under a
+fingerprint chained from the input dataset fingerprint and the names, versions
+and parameters of all steps up to and including it, so re-running the agent
+reuses every step, and appending or changing a step only recomputes the steps
+from that point on.
+
+Steps take a frame and return ``(frame, rows_affected, detail)``. They must not
+modify their input in place: it may be a cached output of the previous step.
+Steps registered as ``row_local`` treat every row independently of the others,
+so they can run on just the new rows of a re-uploaded dataset.
+"""
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .cache import LRUCache
+from .dedupe import drop_duplicates_hashed
+from .ingest import text_columns
+from .metrics import METRICS
+from .normalize import normalize_codes, rebuild_values
+from .parallel import map_columns
+
+STEP_CACHE = LRUCache(int(os.getenv("DATASAGE_STEP_CACHE_MB", "1024")) * 1024 * 1024)
+
+CLEANING_STEPS = {}
+
+
+@dataclass
+class CleaningStep:
+    name: str
+    label: str
+    func: object
+    version: int = 1
+    row_local: bool = True
+
+    def __call__(self, df, **params):
+        return self.func(df, **params)
+
+
+def cleaning_step(name, label, version=1, row_local=True):
+    """Register a cleaning step under ``name``; bump ``version`` when its behaviour changes."""
+    def register(func):
+        CLEANING_STEPS[name] = CleaningStep(name, label, func, version, row_local)
+        return func
+    return register
+
+
+@dataclass
+class StepResult:
+    name: str
+    label: str
+    seconds: float
+    rows_affected: int
+    detail: str
+    rows_before: int
+    rows_after: int
+    cache_hit: bool
+    fingerprint: str
+
+
+def chain_fingerprint(parent, step, params):
+    blob = f"{parent}|{step.name}|v{step.version}|{sorted(params.items())!r}"
+    return hashlib.blake2b(blob.encode(), digest_size=16).hexdigest()
+
+
+def frame_fingerprint(df):
+    """Content fingerprint of a frame, for inputs that have no upload digest."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(list(df.columns)).encode())
+    h.update(repr([str(t) for t in df.dtypes]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def normalize_header(name):
+    return str(name).strip().lower().replace(" ", "_")
+
+
+@cleaning_step("normalize_headers", "🔧 Cleaning column names")
+def normalize_headers(df):
+    new_columns = [normalize_header(c) for c in df.columns]
+    renamed = sum(1 for old, new in zip(df.columns, new_columns) if old != new)
+    out = df.copy(deep=False)
+    out.columns = new_columns
+    return out, 0, f"{renamed} columns renamed"
+
+
+@cleaning_step("strip_text", "📊 Validating data types", version=2)
+def strip_text(df):
+    out = df.copy(deep=False)
+    changed = np.zeros(len(df), dtype=bool)
+    columns = text_columns(df)
+    # Factorizing runs per column on the process pool for large frames; values are rebuilt here.
+    for col, (codes, categories, col_changed) in zip(columns, map_columns(normalize_codes, df, columns, strip=True)):
+        if col_changed.any():
+            # Untouched columns keep sharing the input's buffers (copy-on-write).
+            out[col] = rebuild_values(df[col], codes, categories)
+            changed |= col_changed
+    return out, int(changed.sum()), f"{len(columns)} text columns trimmed"
+
+
+@cleaning_step("standardize_case", "🔤 Standardizing categories")
+def standardize_case(df, columns=("region",), case="capitalize", typo_map=None):
+    out = df.copy(deep=False)
+    changed = np.zeros(len(df), dtype=bool)
+    present = [c for c in columns if c in df.columns]
+    results = map_columns(normalize_codes, df, present, strip=True, case=case, typo_map=typo_map)
+    for col, (codes, categories, col_changed) in zip(present, results):
+        if col_changed.any():
+            out[col] = rebuild_values(df[col], codes, categories)
+            changed |= col_changed
+    return out, int(changed.sum()), f"{len(present)} columns standardized"
+
+
+@cleaning_step("drop_duplicates", "🧹 Removing duplicates", version=2, row_local=False)
+def drop_duplicates(df, subset=None):
+    result = drop_duplicates_hashed(df, subset=subset)
+    scope = f" on {', '.join(map(str, subset))}" if subset else ""
+    return result.frame, result.removed, f"{result.removed} duplicate rows removed{scope}"
+
+
+DEFAULT_STEPS = ("normalize_headers", "strip_text", "drop_duplicates")
+
+
+class CleaningPipeline:
+    """Ordered list of registered steps with per-step result caching.
+
+    ``steps`` items are step names or ``(name, params)`` pairs.
+    """
+
+    def __init__(self, steps=DEFAULT_STEPS, cache=STEP_CACHE):
+        self.steps = [(s, {}) if isinstance(s, str) else (s[0], dict(s[1])) for s in steps]
+        unknown = [name for name, _ in self.steps if name not in CLEANING_STEPS]
+        if unknown:
+            raise KeyError(f"Unknown cleaning steps: {', '.join(unknown)}")
+        self.cache = cache
+
+    def fingerprints(self, input_fingerprint):
+        fingerprints = []
+        parent = input_fingerprint
+        for name, params in self.steps:
+            parent = chain_fingerprint(parent, CLEANING_STEPS[name], params)
+            fingerprints.append(parent)
+        return fingerprints
+
+    def run(self, df, input_fingerprint=None, progress=None):
+        """Run the pipeline and return ``(cleaned_df, [StepResult, ...])``.
+
+        ``progress`` is called with each StepResult as soon as the step is done.
+        """
+        if input_fingerprint is None:
+            input_fingerprint = frame_fingerprint(df)
+        results = []
+        current = df
+        for (name, params), fingerprint in zip(self.steps, self.fingerprints(input_fingerprint)):
+            step = CLEANING_STEPS[name]
+            start = time.perf_counter()
+            cached = self.cache.get(fingerprint) if self.cache is not None else None
+            if cached is not None:
+                output, affected, detail = cached
+                METRICS.incr("clean_step_cache_hits")
+            else:
+                with METRICS.phase(f"clean.{name}", *current.shape):
+                    output, affected, detail = step(current, **params)
+                if self.cache is not None:
+                    self.cache.put(fingerprint, (output, affected, detail))
+            result = StepResult(
+                name=name,
+                label=step.label,
+                seconds=time.perf_counter() - start,
+                rows_affected=int(affected),
+                detail=detail,
+                rows_before=len(current),
+                rows_after=len(output),
+                cache_hit=cached is not None,
+                fingerprint=fingerprint,
+            )
+            results.append(result)
+            if progress is not None:
+                progress(result)
+            current = output
+        return current, results
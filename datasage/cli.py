@@ -0,0 +1,258 @@
+"""Headless batch runner: ingest -> clean -> analyze -> report over many CSV and Excel files.
+
+Uses the same ingestion modes, Jules cleaning pipeline, analysis prompt and
+Stitch report layout as the Streamlit app, with one file per worker process
+(Excel workbooks contribute their first sheet):
+
+    python -m datasage exports/ --out reports/ --workers 8
+    python -m datasage a.csv b.csv --no-analyze --format csv
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from .cleaning import DEFAULT_STEPS, CleaningPipeline
+from .digest import DIGEST_TOKEN_BUDGET, build_digest
+from .excel import is_excel
+from .ingest import MODES, ingest, ingest_excel
+from .outofcore import OutOfCoreDataset, clean_out_of_core, file_digest, open_dataset
+from .parallel import set_workers
+from .prompts import RISK_PROMPT_VERSION, build_risk_prompt
+from .report import build_report_text, make_report_id
+
+
+@dataclass
+class FileSummary:
+    path: str
+    status: str = "ok"
+    error: str = ""
+    size_bytes: int = 0
+    rows: int = 0
+    columns: int = 0
+    duplicates_removed: int = 0
+    ingest_seconds: float = 0.0
+    clean_seconds: float = 0.0
+    analyze_seconds: float = 0.0
+    report_seconds: float = 0.0
+    model: str = ""
+
+    @property
+    def total_seconds(self):
+        return self.ingest_seconds + self.clean_seconds + self.analyze_seconds + self.report_seconds
+
+
+def collect_inputs(paths):
+    """Expand directories to the CSV and Excel files they contain; keep explicit files as given."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                f for f in glob.glob(os.path.join(path, "*"))
+                if f.lower().endswith(".csv") or is_excel(f)
+            ))
+        else:
+            files.append(path)
+    return files
+
+
+def output_stems(files):
+    """Output name stem per input file, unique across the batch.
+
+    The bare file stem is kept where it is unique; ``a.csv`` and ``a.xlsx``
+    become ``a_csv`` and ``a_xlsx``, and same-named files from different
+    directories get a numeric suffix, so no two workers write the same output.
+    """
+    def bare(path):
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def with_extension(path):
+        stem, ext = os.path.splitext(os.path.basename(path))
+        return f"{stem}_{ext.lstrip('.').lower()}" if ext else stem
+
+    counts = {}
+    for path in files:
+        counts[bare(path)] = counts.get(bare(path), 0) + 1
+    stems, used = {}, set()
+    for path in files:
+        stem = bare(path) if counts[bare(path)] == 1 else with_extension(path)
+        candidate, n = stem, 2
+        while candidate in used:
+            candidate, n = f"{stem}_{n}", n + 1
+        used.add(candidate)
+        stems[path] = candidate
+    return stems
+
+
+def api_key():
+    return os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+
+
+def configure_worker(key, column_workers=None):
+    """Process-pool initializer: hand the API key to the lazily loaded Gemini SDK.
+
+    File-level workers run their columns serially so pools don't nest.
+    """
+    from .gemini import set_api_key
+
+    set_api_key(key)
+    if column_workers is not None:
+        set_workers(column_workers)
+
+
+def analyze(df, token_budget):
+    from .gemini import display_name, generate, generative_model, get_resolver
+    from .response_cache import data_fingerprint, get_response_cache
+
+    model_name = get_resolver().resolve()
+    if not model_name:
+        raise RuntimeError("No Gemini models available with generateContent capability")
+    data_digest = df.digest_text(token_budget) if isinstance(df, OutOfCoreDataset) else build_digest(df, token_budget)
+    data_sample = data_digest.text
+    fingerprint = data_fingerprint(data_sample)
+    cache = get_response_cache()
+    cached = cache.get(model_name, RISK_PROMPT_VERSION, fingerprint)
+    if cached is not None:
+        return cached.text, display_name(model_name)
+    result = generate(generative_model(model_name), build_risk_prompt(data_sample))
+    cache.put(model_name, RISK_PROMPT_VERSION, fingerprint, result.text)
+    return result.text, display_name(model_name)
+
+
+def process_file(path, out_dir, mode="standard", fmt="parquet", run_analysis=True,
+                 token_budget=DIGEST_TOKEN_BUDGET, stem=None):
+    summary = FileSummary(path)
+    stem = stem or os.path.splitext(os.path.basename(path))[0]
+    try:
+        summary.size_bytes = os.path.getsize(path)
+
+        out_path = os.path.join(out_dir, f"{stem}_cleaned.{fmt}")
+        if mode == "duckdb" and not is_excel(path):
+            start = time.perf_counter()
+            raw = open_dataset(path, file_digest(path))
+            summary.ingest_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            df, steps = clean_out_of_core(raw, DEFAULT_STEPS, f"{raw.digest}:{mode}")
+            df.export(out_path, fmt)
+        else:
+            start = time.perf_counter()
+            raw = ingest_excel(path, cache=None) if is_excel(path) else ingest(path, mode, cache=None)
+            summary.ingest_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            df, steps = CleaningPipeline(cache=None).run(raw.frame, input_fingerprint=f"{raw.digest}:{mode}")
+            if fmt == "parquet":
+                df.to_parquet(out_path, index=False)
+            else:
+                df.to_csv(out_path, index=False)
+        del raw
+        summary.rows, summary.columns = df.shape
+        summary.duplicates_removed = sum(s.rows_affected for s in steps if s.name == "drop_duplicates")
+        summary.clean_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if run_analysis:
+            insight, summary.model = analyze(df, token_budget)
+        else:
+            insight, summary.model = "Analysis skipped (--no-analyze).", "n/a"
+        summary.analyze_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        report = build_report_text(
+            make_report_id(os.path.basename(path)),
+            os.path.basename(path),
+            summary.size_bytes / 1024,
+            summary.model,
+            insight,
+        )
+        with open(os.path.join(out_dir, f"{stem}_stitch_report.txt"), "w", encoding="utf-8") as fh:
+            fh.write(report)
+        summary.report_seconds = time.perf_counter() - start
+    except Exception as e:
+        summary.status = "failed"
+        summary.error = f"{type(e).__name__}: {e}"
+    return summary
+
+
+def format_summary(summaries, wall_seconds, workers):
+    header = f"{'file':<32} {'status':<7} {'MB':>8} {'rows':>10} {'dupes':>7} " \
+             f"{'ingest':>7} {'clean':>7} {'analyze':>8} {'report':>7} {'total':>7}"
+    lines = [header, "-" * len(header)]
+    for s in summaries:
+        lines.append(
+            f"{os.path.basename(s.path)[:32]:<32} {s.status:<7} {s.size_bytes/1e6:>8.1f} {s.rows:>10,} "
+            f"{s.duplicates_removed:>7,} {s.ingest_seconds:>6.2f}s {s.clean_seconds:>6.2f}s "
+            f"{s.analyze_seconds:>7.2f}s {s.report_seconds:>6.2f}s {s.total_seconds:>6.2f}s"
+        )
+        if s.error:
+            lines.append(f"    ! {s.error}")
+    total_mb = sum(s.size_bytes for s in summaries) / 1e6
+    ok = sum(1 for s in summaries if s.status == "ok")
+    lines.append("-" * len(header))
+    lines.append(
+        f"{ok}/{len(summaries)} files in {wall_seconds:.2f}s on {workers} workers · "
+        f"{total_mb / wall_seconds if wall_seconds else 0:.1f} MB/s · "
+        f"{len(summaries) / wall_seconds if wall_seconds else 0:.2f} files/s"
+    )
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m datasage",
+        description="Run DataSage ingest, Jules cleaning, Gemini analysis and Stitch reporting over CSV and Excel files.",
+    )
+    parser.add_argument("inputs", nargs="+", help="CSV or Excel files, or directories containing them")
+    parser.add_argument("-o", "--out", default="datasage_output", help="output directory (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: number of cores)")
+    parser.add_argument("--mode", choices=MODES + ("duckdb",), default="standard",
+                        help="ingestion mode for CSVs; duckdb processes them out of core (default: %(default)s)")
+    parser.add_argument("--format", choices=("parquet", "csv"), default="parquet",
+                        help="cleaned data format (default: %(default)s)")
+    parser.add_argument("--token-budget", type=int, default=DIGEST_TOKEN_BUDGET,
+                        help="analysis prompt token budget (default: %(default)s)")
+    parser.add_argument("--no-analyze", action="store_true", help="skip the Gemini analysis phase")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    files = collect_inputs(args.inputs)
+    if not files:
+        print("No CSV or Excel files found.", file=sys.stderr)
+        return 2
+    key = api_key()
+    if not args.no_analyze and not key:
+        print("GOOGLE_API_KEY (or GEMINI_API_KEY) is not set; set it or pass --no-analyze.", file=sys.stderr)
+        return 2
+    os.makedirs(args.out, exist_ok=True)
+
+    run_analysis = not args.no_analyze
+    options = dict(out_dir=args.out, mode=args.mode, fmt=args.format,
+                   run_analysis=run_analysis, token_budget=args.token_budget)
+    stems = output_stems(files)
+    workers = max(1, min(args.workers, len(files)))
+    start = time.perf_counter()
+    summaries = []
+    if workers == 1:
+        configure_worker(key if run_analysis else None)
+        for path in files:
+            summaries.append(process_file(path, stem=stems[path], **options))
+            print(f"done {path}", file=sys.stderr)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=configure_worker,
+                                 initargs=(key if run_analysis else None, 1)) as pool:
+            futures = {pool.submit(process_file, path, stem=stems[path], **options): path for path in files}
+            for future in as_completed(futures):
+                summaries.append(future.result())
+                print(f"done {futures[future]}", file=sys.stderr)
+    wall = time.perf_counter() - start
+
+    summaries.sort(key=lambda s: files.index(s.path))
+    print(format_summary(summaries, wall, workers))
+    return 0 if all(s.status == "ok" for s in summaries) else 1
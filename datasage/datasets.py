@@ -0,0 +1,340 @@
+"""Process-wide dataset store shared by all sessions.
+
+Sessions keep dataset keys in their state, not frames, so five analysts on the
+same export share one raw frame and one cleaned version instead of holding a
+copy each. Cleaned versions are registered with their parent; pandas'
+copy-on-write means columns a cleaning step did not touch still share the
+parent's buffers, and only the columns it rewrote are counted against the
+budget.
+
+The request asked for a memory-mapped, Arrow-backed store. This is an
+adaptation: frames live on the heap in their usual pandas dtypes (the
+cleaning steps and the UI rely on them) and are mapped only when spilled.
+A session holds a lease on each dataset it reads; leases lapse after
+``idle_seconds`` without access. When resident data exceeds ``max_bytes``,
+the least recently used datasets (unleased first) are spilled to Arrow IPC
+files and reopened memory-mapped, so their pages belong to the OS page cache
+rather than the process heap. Spilled frames keep their pandas dtypes; columns
+that can't be rebuilt over the mapping (object, categorical, bool, floats with
+missing values) are copied back onto the heap and still count as resident.
+The ingestion and step caches are pointed at the mapped frame (or lose the
+entries that shared its buffers), so the store is the only owner of the heap
+copy and spilling actually frees it. Spills are chosen under the store lock
+but converted and written outside it, so one session's spill doesn't stall
+the others. Unleased datasets idle for ``idle_seconds`` are dropped entirely.
+"""
+import hashlib
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .cleaning import STEP_CACHE
+from .ingest import INGEST_CACHE, frame_nbytes, pyarrow_available
+from .metrics import METRICS
+from .storage import WORK_DIR
+
+DATASET_BUDGET_MB = int(os.getenv("DATASAGE_DATASET_MB", "2048"))
+DATASET_IDLE_SECONDS = int(os.getenv("DATASAGE_DATASET_IDLE_SECONDS", "1800"))
+
+
+def column_shared(a, b):
+    """True if two columns are backed by overlapping buffers (a copy-on-write share or a view)."""
+    if a.array is b.array:
+        return True
+    if isinstance(a.dtype, np.dtype) and isinstance(b.dtype, np.dtype):
+        return np.shares_memory(a.to_numpy(copy=False), b.to_numpy(copy=False))
+    if arrow_backed(a) and arrow_backed(b):
+        ranges = buffer_ranges(b)
+        return any(start < end_b and start_b < end for start, end in buffer_ranges(a) for start_b, end_b in ranges)
+    return False
+
+
+def arrow_backed(series):
+    return isinstance(series.dtype, pd.ArrowDtype) or getattr(series.dtype, "storage", None) == "pyarrow"
+
+
+def buffer_ranges(series):
+    """``(start, end)`` addresses of the Arrow buffers behind a column (obtained without copying)."""
+    chunked = series.array.__arrow_array__()
+    return [(b.address, b.address + b.size) for chunk in chunked.chunks for b in chunk.buffers() if b is not None and b.size]
+
+
+def paired_columns(frame, parent):
+    """``(column, parent column or None)`` for each column of ``frame``.
+
+    Columns are paired by position when only the headers were renamed, else by name.
+    """
+    renamed = frame.shape[1] == parent.shape[1]
+    for i, col in enumerate(frame.columns):
+        if renamed:
+            yield frame.iloc[:, i], parent.iloc[:, i]
+        elif col in parent.columns:
+            yield frame.iloc[:, i], parent[col]
+        else:
+            yield frame.iloc[:, i], None
+
+
+def owned_nbytes(frame, parent=None):
+    """Bytes of ``frame`` not shared with ``parent``, measured column by column.
+
+    Row-filtered columns (e.g. after dropping duplicates) are real copies and
+    count in full; untouched and view columns count as shared.
+    """
+    if parent is None:
+        return frame_nbytes(frame)
+    total = int(frame.index.memory_usage(deep=True)) if not frame.index.equals(parent.index) else 0
+    for column, origin in paired_columns(frame, parent):
+        if origin is None or not column_shared(column, origin):
+            total += int(column.memory_usage(index=False, deep=True))
+    return total
+
+
+def shares_buffers(frame, other):
+    return any(origin is not None and column_shared(column, origin) for column, origin in paired_columns(frame, other))
+
+
+def restore_frame(table, dtypes):
+    """Frame over a (memory-mapped) Arrow table with the pandas ``dtypes`` it was written from."""
+    frame = table.to_pandas(split_blocks=True)
+    for i, dtype in enumerate(dtypes):
+        if frame.dtypes.iloc[i] == dtype:
+            continue
+        if isinstance(dtype, pd.ArrowDtype) and table.column(i).type == dtype.pyarrow_dtype:
+            frame.isetitem(i, pd.Series(pd.arrays.ArrowExtensionArray(table.column(i)), index=frame.index))
+        else:
+            frame.isetitem(i, frame.iloc[:, i].astype(dtype))
+    return frame
+
+
+def heap_nbytes(frame, start, end):
+    """Bytes of ``frame`` held outside the mapped region ``[start, end)``."""
+    total = int(frame.index.memory_usage(deep=True))
+    for _, column in frame.items():
+        if arrow_backed(column):
+            total += sum(e - s for s, e in buffer_ranges(column) if not (start <= s and e <= end))
+        elif isinstance(column.dtype, np.dtype) and column.dtype != object:
+            data = column.to_numpy(copy=False)
+            address = data.__array_interface__["data"][0]
+            if not (start <= address and address + data.nbytes <= end):
+                total += data.nbytes
+        else:
+            total += int(column.memory_usage(index=False, deep=True))
+    return total
+
+
+@dataclass
+class Dataset:
+    key: str
+    frame: pd.DataFrame
+    parent: str = None
+    nbytes: int = 0
+    last_access: float = 0.0
+    leases: dict = field(default_factory=dict)
+    path: str = None
+    spilling: bool = False
+
+    @property
+    def mapped(self):
+        return self.path is not None
+
+
+class DatasetStore:
+    def __init__(self, max_bytes=DATASET_BUDGET_MB * 1024 * 1024, idle_seconds=DATASET_IDLE_SECONDS,
+                 spill_dir=os.path.join(WORK_DIR, "datasets"), caches=()):
+        self.max_bytes = int(max_bytes)
+        self.idle_seconds = idle_seconds
+        self.spill_dir = spill_dir
+        self.caches = caches
+        self._datasets = {}
+        self._lock = threading.Lock()
+        self.spills = 0
+        self.evictions = 0
+        self._serial = itertools.count()
+
+    def share(self, key, frame, parent=None, session_id=None):
+        """Register ``frame`` under ``key`` and return the shared frame for it.
+
+        If the key is already stored, the stored frame is returned and the new
+        one is discarded, so every session ends up referencing the same data.
+        """
+        now = time.monotonic()
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is None:
+                parent_set = self._datasets.get(parent)
+                parent_frame = parent_set.frame if parent_set is not None and not parent_set.mapped else None
+                dataset = Dataset(key, frame, parent, owned_nbytes(frame, parent_frame), now)
+                self._datasets[key] = dataset
+            self._touch(dataset, session_id, now)
+            spills = self._sweep(now)
+        self._spill_all(spills)
+        return dataset.frame
+
+    def get(self, key, session_id=None):
+        """The frame stored under ``key`` (renewing the session's lease), or None."""
+        if not key:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is None:
+                return None
+            self._touch(dataset, session_id, now)
+            spills = self._sweep(now)
+        self._spill_all(spills)
+        return dataset.frame
+
+    def release(self, key, session_id):
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is not None:
+                dataset.leases.pop(session_id, None)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._datasets
+
+    @property
+    def resident_bytes(self):
+        return sum(d.nbytes for d in self._datasets.values())
+
+    def sweep(self):
+        with self._lock:
+            spills = self._sweep(time.monotonic())
+        self._spill_all(spills)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._datasets):
+                self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            datasets = list(self._datasets.values())
+            return {
+                "datasets": len(datasets),
+                "mapped": sum(d.mapped for d in datasets),
+                "sessions": len({s for d in datasets for s in d.leases}),
+                "resident_mb": self.resident_bytes / 1024 / 1024,
+                "max_mb": self.max_bytes / 1024 / 1024,
+                "spills": self.spills,
+                "evictions": self.evictions,
+            }
+
+    def _touch(self, dataset, session_id, now):
+        dataset.last_access = now
+        if session_id:
+            dataset.leases[session_id] = now
+
+    def _sweep(self, now):
+        """Drop idle datasets and pick the ones to spill (under the lock); returns the picks."""
+        for dataset in list(self._datasets.values()):
+            dataset.leases = {s: t for s, t in dataset.leases.items() if now - t < self.idle_seconds}
+            if not dataset.leases and not dataset.spilling and now - dataset.last_access >= self.idle_seconds:
+                self._drop(dataset.key)
+        excess = self.resident_bytes - self.max_bytes - sum(d.nbytes for d in self._datasets.values() if d.spilling)
+        candidates = sorted(
+            (d for d in self._datasets.values() if not d.mapped and not d.spilling),
+            key=lambda d: (bool(d.leases), d.last_access),
+        )
+        picked = []
+        for dataset in candidates:
+            if excess <= 0:
+                break
+            dataset.spilling = True
+            picked.append((dataset, dataset.frame))
+            excess -= dataset.nbytes
+        return picked
+
+    def _spill_all(self, picked):
+        for dataset, frame in picked:
+            spilled = self._spill(dataset.key, frame)
+            with self._lock:
+                dataset.spilling = False
+                current = self._datasets.get(dataset.key) is dataset and dataset.frame is frame
+                if spilled is not None and current:
+                    self._swap(dataset, frame, *spilled)
+                    continue
+                if spilled is not None:
+                    self._remove_file(spilled[1])
+                elif current and not dataset.leases:
+                    self._drop(dataset.key)
+
+    def _spill(self, key, frame):
+        """Write ``frame`` to an Arrow file and reopen it mapped (no lock held).
+
+        Returns ``(mapped frame, path, heap bytes)``, or None if it can't be converted.
+        """
+        if not pyarrow_available():
+            return None
+        import pyarrow as pa
+
+        os.makedirs(self.spill_dir, exist_ok=True)
+        name = hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+        path = os.path.join(self.spill_dir, f"{name}-{os.getpid()}-{next(self._serial)}.arrow")
+        tmp = f"{path}.tmp"
+        with METRICS.phase("dataset_spill", *frame.shape, memory=False):
+            try:
+                table = pa.Table.from_pandas(frame, preserve_index=None)
+                with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+                os.replace(tmp, path)
+            except (TypeError, ValueError, NotImplementedError, OSError, pa.ArrowException):
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                return None
+            del table
+            region = pa.memory_map(path).read_buffer()
+            mapped = restore_frame(pa.ipc.open_file(region).read_all(), list(frame.dtypes))
+        return mapped, path, heap_nbytes(mapped, region.address, region.address + region.size)
+
+    def _swap(self, dataset, frame, mapped, path, heap):
+        dataset.frame = mapped
+        dataset.path = path
+        dataset.nbytes = heap
+        self._release_cached(frame, mapped)
+        for child in self._datasets.values():
+            if child.parent == dataset.key and not child.mapped:
+                child.nbytes = frame_nbytes(child.frame)
+        self.spills += 1
+
+    def _release_cached(self, frame, mapped):
+        """Point cache entries holding ``frame`` at its mapped copy; drop those sharing its buffers."""
+        def remap(value):
+            items = value if isinstance(value, tuple) else (value,)
+            frames = [item for item in items if isinstance(item, pd.DataFrame)]
+            if any(item is frame for item in frames):
+                items = tuple(mapped if item is frame else item for item in items)
+                return items if isinstance(value, tuple) else items[0]
+            if any(shares_buffers(item, frame) for item in frames):
+                return None
+            return value
+
+        released = sum(cache.remap(remap) for cache in self.caches)
+        if released:
+            METRICS.incr("dataset_cache_entries_released", released)
+
+    def _drop(self, key):
+        dataset = self._datasets.pop(key)
+        if dataset.path:
+            self._remove_file(dataset.path)
+        for child in self._datasets.values():
+            if child.parent == key and not child.mapped:
+                child.nbytes = frame_nbytes(child.frame)
+        self.evictions += 1
+
+    def _remove_file(self, path):
+        # Frames still held by a running job keep the mapping alive; unlinking is safe on POSIX.
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Shared by every session served from this process.
+DATASETS = DatasetStore(caches=(INGEST_CACHE, STEP_CACHE))
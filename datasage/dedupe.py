@@ -0,0 +1,68 @@
+"""Hash-based row de-duplication.
+
+``DataFrame.drop_duplicates`` factorizes every column of the full frame at once,
+which on wide text-heavy frames costs several times the frame's own memory.
+Here rows are hashed to 64-bit keys a chunk at a time, duplicates are found on
+the single hash column, and only the candidate rows that share a hash are
+compared exactly, which rules out hash collisions.
+"""
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+DEDUPE_CHUNK_ROWS = int(os.getenv("DATASAGE_DEDUPE_CHUNK_ROWS", "200000"))
+
+
+@dataclass
+class DedupeResult:
+    frame: pd.DataFrame
+    removed: int
+    candidates: int
+    collisions: int
+
+
+def row_hashes(df, subset=None, chunk_rows=DEDUPE_CHUNK_ROWS):
+    """One uint64 hash per row over ``subset`` (all columns by default)."""
+    cols = list(subset) if subset else list(df.columns)
+    missing = [c for c in cols if c not in df.columns]
+    if missing:
+        raise KeyError(f"Duplicate key columns not in data: {', '.join(map(str, missing))}")
+    out = np.empty(len(df), dtype=np.uint64)
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows][cols]
+        out[start:start + len(chunk)] = pd.util.hash_pandas_object(
+            chunk, index=False, categorize=False
+        ).to_numpy()
+    return out
+
+
+def duplicate_mask(df, subset=None, chunk_rows=DEDUPE_CHUNK_ROWS, hashes=None):
+    """Boolean mask of rows that repeat an earlier row (``keep="first"`` semantics).
+
+    Returns ``(mask, candidates, collisions)`` where ``candidates`` is the number
+    of rows that had to be compared exactly. Pass ``hashes`` when the row
+    hashes are already known (e.g. kept from a previous version).
+    """
+    hashes = pd.Series(row_hashes(df, subset, chunk_rows) if hashes is None else hashes)
+    shared = hashes.duplicated(keep=False).to_numpy()
+    mask = np.zeros(len(df), dtype=bool)
+    candidates = int(shared.sum())
+    if not candidates:
+        return mask, 0, 0
+
+    positions = np.flatnonzero(shared)
+    cols = list(subset) if subset else list(df.columns)
+    exact = df.iloc[positions][cols].duplicated(keep="first").to_numpy()
+    mask[positions] = exact
+    collisions = int(hashes.duplicated(keep="first").sum()) - int(exact.sum())
+    return mask, candidates, collisions
+
+
+def drop_duplicates_hashed(df, subset=None, chunk_rows=DEDUPE_CHUNK_ROWS):
+    """Drop repeated rows (whole row or ``subset`` key columns), keeping the first."""
+    mask, candidates, collisions = duplicate_mask(df, subset, chunk_rows)
+    removed = int(mask.sum())
+    frame = df[~mask] if removed else df
+    return DedupeResult(frame, removed, candidates, collisions)
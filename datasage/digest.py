@@ -0,0 +1,186 @@
+"""Token-budgeted statistical digest of a dataset for the analysis prompt.
+
+``df.head(10).to_string()`` pads every cell with whitespace and shows Gemini ten
+rows out of millions. The digest instead describes every column (null rate, top
+values, quantiles, anomaly counts) and appends a small stratified sample as
+CSV, shrinking itself until it fits the token budget.
+"""
+import io
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .cache import LRUCache
+from .ingest import text_columns
+from .metrics import METRICS
+
+DIGEST_TOKEN_BUDGET = int(os.getenv("DATASAGE_DIGEST_TOKENS", "1500"))
+CHARS_PER_TOKEN = 4
+TOP_VALUES = 3
+SAMPLE_ROWS = 12
+MAX_VALUE_CHARS = 40
+STRATIFY_MAX_GROUPS = 20
+
+DIGEST_CACHE = LRUCache(16 * 1024 * 1024)
+
+
+def estimate_tokens(text):
+    """Rough Gemini token count (about four characters per token for English/CSV)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def clip(value, limit=MAX_VALUE_CHARS):
+    text = str(value).replace("\n", " ")
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def fmt_number(x):
+    if pd.isna(x):
+        return "nan"
+    x = float(x)
+    if x.is_integer() and abs(x) < 1e15:
+        return str(int(x))
+    return f"{x:.4g}"
+
+
+@dataclass
+class DataDigest:
+    text: str
+    tokens: int
+    budget: int
+    columns_described: int
+    sample_rows: int
+
+
+def numeric_summary(values):
+    """Quantiles plus anomaly counts (IQR outliers, negatives) of a numeric series."""
+    values = values.dropna()
+    if values.empty:
+        return "no numeric values"
+    q = values.quantile([0, 0.25, 0.5, 0.75, 1.0]).to_numpy()
+    iqr = q[3] - q[1]
+    outliers = int(((values < q[1] - 1.5 * iqr) | (values > q[3] + 1.5 * iqr)).sum())
+    negatives = int((values < 0).sum())
+    parts = [f"min/p25/median/p75/max {'/'.join(fmt_number(v) for v in q)}"]
+    if outliers:
+        parts.append(f"{outliers} outliers")
+    if negatives:
+        parts.append(f"{negatives} negative")
+    return ", ".join(parts)
+
+
+def column_line(series, top_k=TOP_VALUES):
+    rows = len(series)
+    nulls = int(series.isna().sum())
+    null_rate = nulls / rows * 100 if rows else 0.0
+    parts = [f"nulls {null_rate:.1f}%"]
+
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        parts.append(numeric_summary(series))
+    else:
+        counts = series.value_counts(dropna=True)
+        parts.append(f"{len(counts)} distinct")
+        if top_k and len(counts):
+            parts.append("top " + ", ".join(f"{clip(v)}×{c}" for v, c in counts.head(top_k).items()))
+        # Text columns that are mostly numbers: report the values that are not.
+        # Parsed per distinct value and weighted by its count.
+        numbers = pd.to_numeric(pd.Series(counts.index.astype(str)), errors="coerce").to_numpy()
+        is_number = ~np.isnan(numbers)
+        freq = counts.to_numpy()
+        bad = int(freq[~is_number].sum())
+        total = int(freq.sum())
+        if total and bad and bad < total / 2:
+            parts.append(f"non-numeric values: {bad}")
+            parts.append(numeric_summary(pd.Series(np.repeat(numbers[is_number], freq[is_number]))))
+    return f"- {series.name} ({series.dtype}): " + "; ".join(parts)
+
+
+def stratify_column(df):
+    """Low-cardinality text column to stratify the sample on, if any."""
+    for col in text_columns(df):
+        if 1 < df[col].nunique(dropna=True) <= STRATIFY_MAX_GROUPS:
+            return col
+    return None
+
+
+def stratified_sample(df, n, seed=0):
+    """Up to ``n`` rows covering every group of a low-cardinality column.
+
+    Deterministic for a given frame so the prompt (and its cache key) is stable.
+    """
+    if len(df) <= n:
+        return df
+    col = stratify_column(df)
+    if col is None:
+        return df.sample(n, random_state=seed).sort_index()
+    groups = df.groupby(df[col].astype(object).where(df[col].notna(), "<null>"), sort=False)
+    per_group = max(n // groups.ngroups, 1)
+    parts = [g.sample(min(len(g), per_group), random_state=seed) for _, g in groups]
+    sample = pd.concat(parts).sort_index()
+    return sample.head(n)
+
+
+def sample_csv(sample):
+    clipped = sample.apply(lambda s: s.map(lambda v: clip(v) if isinstance(v, str) else v))
+    buf = io.StringIO()
+    clipped.to_csv(buf, index=False)
+    return buf.getvalue().strip()
+
+
+def render(df, lines, sample, hidden_columns, total_rows=None):
+    header = f"Dataset: {total_rows or len(df):,} rows × {df.shape[1]} columns"
+    if total_rows:
+        header += f" (columns summarized from a {len(df):,}-row sample)"
+    body = [header, "Columns:"] + lines
+    if hidden_columns:
+        body.append(f"- … {hidden_columns} more columns not shown")
+    if sample is not None and len(sample):
+        body += [f"Stratified sample ({len(sample)} rows, CSV):", sample_csv(sample)]
+    return "\n".join(body)
+
+
+def build_digest(df, token_budget=DIGEST_TOKEN_BUDGET, sample_rows=SAMPLE_ROWS, top_k=TOP_VALUES,
+                 total_rows=None):
+    """Compact per-column summary plus stratified sample within ``token_budget`` tokens.
+
+    When over budget the sample is shrunk first, then top-value lists are
+    dropped, then trailing column lines are replaced by a count. Pass
+    ``total_rows`` when ``df`` is itself a sample of a larger dataset.
+    """
+    with METRICS.phase("digest", *df.shape):
+        return _build_digest(df, token_budget, sample_rows, top_k, total_rows)
+
+
+def _build_digest(df, token_budget, sample_rows, top_k, total_rows=None):
+    columns = list(df.columns)
+    lines = [column_line(df[c], top_k) for c in columns]
+    sample = stratified_sample(df, sample_rows)
+
+    text = render(df, lines, sample, 0, total_rows)
+    rows = len(sample)
+    while estimate_tokens(text) > token_budget and rows > 0:
+        rows = rows // 2
+        text = render(df, lines, sample.head(rows), 0, total_rows)
+    if estimate_tokens(text) > token_budget and top_k:
+        lines = [column_line(df[c], 0) for c in columns]
+        text = render(df, lines, None, 0, total_rows)
+    shown = len(lines)
+    while estimate_tokens(text) > token_budget and shown > 1:
+        shown -= 1
+        text = render(df, lines[:shown], None, len(lines) - shown, total_rows)
+
+    return DataDigest(text, estimate_tokens(text), token_budget, shown, rows)
+
+
+def digest_cached(df, key, token_budget=DIGEST_TOKEN_BUDGET, cache=DIGEST_CACHE, **options):
+    """Digest for ``key`` (e.g. the cleaning pipeline fingerprint), built once per budget."""
+    if not key:
+        return build_digest(df, token_budget, **options)
+    cache_key = (key, token_budget, tuple(sorted(options.items())))
+    digest = cache.get(cache_key)
+    if digest is None:
+        digest = build_digest(df, token_budget, **options)
+        cache.put(cache_key, digest)
+    return digest
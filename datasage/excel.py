@@ -0,0 +1,75 @@
+"""Excel workbook reading (.xlsx / .xls).
+
+openpyxl materialises every cell as a Python object and is very slow on large
+workbooks, so the Rust-based calamine reader (``python-calamine``) is used
+when installed; openpyxl / xlrd remain as fallbacks. Sheets are listed from
+the workbook metadata without parsing them, and only the requested sheet is
+read. Caching of the converted frames lives in ``ingest``.
+"""
+import io
+import os
+
+import pandas as pd
+
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+ENGINE = os.getenv("DATASAGE_EXCEL_ENGINE")  # force a pandas engine; default: fastest installed
+
+_FALLBACKS = {".xls": ("xlrd",), ".xlsx": ("openpyxl",), ".xlsm": ("openpyxl",)}
+
+
+def is_excel(name):
+    return str(name).lower().endswith(EXCEL_EXTENSIONS)
+
+
+def _installed(module):
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+
+def excel_engine(extension=".xlsx"):
+    """Fastest installed pandas engine for the given workbook extension."""
+    if ENGINE:
+        return ENGINE
+    if _installed("python_calamine"):
+        return "calamine"
+    for module in _FALLBACKS.get(extension.lower(), ("openpyxl",)):
+        if _installed(module):
+            return module
+    raise ImportError("Reading Excel files needs python-calamine (recommended) or openpyxl: pip install python-calamine")
+
+
+def workbook_extension(data):
+    """``.xls`` for legacy OLE2 workbooks, ``.xlsx`` for zip-based ones."""
+    return ".xls" if data[:4] == b"\xd0\xcf\x11\xe0" else ".xlsx"
+
+
+def list_sheets(data, engine=None):
+    """Sheet names, read from the workbook metadata without parsing any sheet."""
+    engine = engine or excel_engine(workbook_extension(data))
+    with pd.ExcelFile(io.BytesIO(data), engine=engine) as book:
+        return [str(name) for name in book.sheet_names]
+
+
+def unify_mixed_columns(df):
+    """Store object columns holding mixed types (e.g. ``500`` and ``ERROR_404``) as text.
+
+    This is what the CSV reader produces for the same data, so cleaning and
+    analysis behave identically for both sources, and it keeps the frame
+    writable as Parquet.
+    """
+    for col in df.columns:
+        s = df[col]
+        if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True).startswith("mixed"):
+            df[col] = s.astype("str")
+    return df
+
+
+def parse_excel(data, sheet_name=0, engine=None, **read_options):
+    """Parse one sheet into a frame; the second value mirrors the CSV parsers (no naive size)."""
+    engine = engine or excel_engine(workbook_extension(data))
+    frame = pd.read_excel(io.BytesIO(data), sheet_name=sheet_name, engine=engine, **read_options)
+    frame.columns = [str(c) for c in frame.columns]
+    return unify_mixed_columns(frame), 0
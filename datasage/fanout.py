@@ -0,0 +1,112 @@
+"""Deep analysis: concurrent per-column-group Gemini calls.
+
+Wide datasets are split into column groups, each described by its own digest
+and sent as a separate prompt. Requests run concurrently on one event loop,
+bounded by a semaphore and a per-request timeout, so total wall time is close
+to the slowest single call. Each request goes through the shared rate limits
+and retries with awaited waits, so a timeout cancels the request and its
+retries. The per-group risks are then ranked by the severity Gemini assigned
+and merged into one insight.
+"""
+import asyncio
+import os
+import re
+import time
+from dataclasses import dataclass
+
+from .digest import DIGEST_TOKEN_BUDGET, build_digest
+from .gemini import generate_async as gemini_generate_async
+from .metrics import METRICS
+from .prompts import build_group_prompt
+
+FANOUT_GROUP_SIZE = int(os.getenv("DATASAGE_FANOUT_GROUP_SIZE", "8"))
+FANOUT_CONCURRENCY = int(os.getenv("DATASAGE_FANOUT_CONCURRENCY", "4"))
+FANOUT_TIMEOUT_SECONDS = float(os.getenv("DATASAGE_FANOUT_TIMEOUT", "60"))
+
+SEVERITY_RE = re.compile(r"severity:?\**\s*\[?(\d+)", re.IGNORECASE)
+RISK_RE = re.compile(r"\*\*Risk:\*\*\s*(.+)")
+
+
+@dataclass
+class GroupResult:
+    columns: list
+    text: str = ""
+    severity: int = 0
+    seconds: float = 0.0
+    error: str = ""
+
+    @property
+    def title(self):
+        match = RISK_RE.search(self.text)
+        return match.group(1).strip() if match else "Unnamed risk"
+
+
+def partition_columns(columns, group_size=FANOUT_GROUP_SIZE):
+    columns = list(columns)
+    return [columns[i:i + group_size] for i in range(0, len(columns), group_size)]
+
+
+def parse_severity(text):
+    match = SEVERITY_RE.search(text or "")
+    return min(int(match.group(1)), 10) if match else 0
+
+
+async def generate_async(model, prompt):
+    result = await gemini_generate_async(model, prompt)
+    return result.text
+
+
+async def analyze_groups_async(model, prompts, concurrency=FANOUT_CONCURRENCY,
+                               timeout=FANOUT_TIMEOUT_SECONDS):
+    """Run ``[(columns, prompt), ...]`` with at most ``concurrency`` requests in flight."""
+    semaphore = asyncio.Semaphore(max(int(concurrency), 1))
+
+    async def one(columns, prompt):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                text = await asyncio.wait_for(generate_async(model, prompt), timeout)
+            except asyncio.TimeoutError:
+                return GroupResult(columns, seconds=time.perf_counter() - start,
+                                   error=f"timed out after {timeout:g}s")
+            except Exception as e:
+                return GroupResult(columns, seconds=time.perf_counter() - start, error=str(e))
+            return GroupResult(columns, text, parse_severity(text), time.perf_counter() - start)
+
+    return await asyncio.gather(*(one(columns, prompt) for columns, prompt in prompts))
+
+
+def group_prompts(df, group_size=FANOUT_GROUP_SIZE, token_budget=DIGEST_TOKEN_BUDGET):
+    """One ``(columns, prompt)`` pair per column group, each digest within ``token_budget``."""
+    return [
+        (columns, build_group_prompt(columns, build_digest(df[columns], token_budget).text))
+        for columns in partition_columns(df.columns, group_size)
+    ]
+
+
+def merge_risks(results):
+    """Rank successful group results by severity into one markdown insight."""
+    ranked = sorted((r for r in results if not r.error), key=lambda r: r.severity, reverse=True)
+    failed = [r for r in results if r.error]
+    if not ranked:
+        raise RuntimeError("Deep analysis failed for every column group: " +
+                           "; ".join(r.error for r in failed))
+    sections = [
+        f"**Top risks across {len(results)} column groups (ranked by severity)**"
+    ]
+    for rank, result in enumerate(ranked, 1):
+        sections.append(
+            f"#### {rank}. {result.title} (severity {result.severity or '?'}/10)\n"
+            f"_Columns: {', '.join(map(str, result.columns))}_\n\n{result.text.strip()}"
+        )
+    if failed:
+        sections.append(f"_{len(failed)} column group(s) could not be analyzed._")
+    return "\n\n".join(sections)
+
+
+def run_fanout(model, prompts, concurrency=FANOUT_CONCURRENCY, timeout=FANOUT_TIMEOUT_SECONDS):
+    """Blocking wrapper: returns ``(merged_insight, [GroupResult, ...], wall_seconds)``."""
+    start = time.perf_counter()
+    with METRICS.phase("generation.fanout"):
+        results = asyncio.run(analyze_groups_async(model, prompts, concurrency, timeout))
+    return merge_risks(results), results, time.perf_counter() - start
@@ -0,0 +1,428 @@
+"""Gemini SDK loading, model discovery and generation helpers.
+
+The SDK (``google.generativeai``) is only imported on first use via
+``load_genai()``, so starting the app or importing the engine does not pay
+for it. ``DATASAGE_GENAI_MODULE`` swaps in another module with the same
+surface, e.g. ``benchmarks.fake_gemini`` for offline runs.
+
+``genai.list_models()`` is a network round trip, so the resolved model list is
+shared by every session in the process, kept for ``MODEL_TTL_SECONDS`` and
+snapshotted to disk so a cold start can answer from the last known list. Once
+the list is stale it is still served while a background thread refreshes it.
+
+Every ``generate_content`` call goes through one process-wide client layer:
+token buckets sized to the quota (``DATASAGE_GEMINI_RPM`` requests and
+``DATASAGE_GEMINI_TPM`` prompt tokens per minute) space out requests from all
+sessions, quota and transient errors are retried with jittered exponential
+backoff (a quota error also pauses the shared bucket), and concurrent
+identical prompts to the same model share a single in-flight request.
+"""
+import asyncio
+import hashlib
+import importlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, replace
+
+from .digest import estimate_tokens
+from .metrics import METRICS
+from .ratelimit import Coalescer, TokenBucket, backoff_delay
+from .storage import WORK_DIR
+
+MODEL_PREFERENCES = ["gemini-2.0-flash", "gemini-1.5-flash", "gemini-1.5-pro", "gemini-pro"]
+MODEL_TTL_SECONDS = int(os.getenv("DATASAGE_MODEL_TTL", "3600"))
+MODEL_SNAPSHOT = os.path.join(WORK_DIR, "gemini_models.json")
+GENAI_MODULE = os.getenv("DATASAGE_GENAI_MODULE", "google.generativeai")
+GEMINI_RPM = float(os.getenv("DATASAGE_GEMINI_RPM", "60"))
+GEMINI_TPM = float(os.getenv("DATASAGE_GEMINI_TPM", "1000000"))
+GEMINI_BURST = float(os.getenv("DATASAGE_GEMINI_BURST", "4"))
+GEMINI_RETRIES = int(os.getenv("DATASAGE_GEMINI_RETRIES", "5"))
+GEMINI_BACKOFF_SECONDS = float(os.getenv("DATASAGE_GEMINI_BACKOFF", "1"))
+GEMINI_BACKOFF_MAX_SECONDS = float(os.getenv("DATASAGE_GEMINI_BACKOFF_MAX", "60"))
+
+# google.api_core exception class names, so the SDK need not be imported to classify errors.
+QUOTA_ERRORS = {"ResourceExhausted", "TooManyRequests"}
+TRANSIENT_ERRORS = {"ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout",
+                    "BadGateway", "Aborted"}
+RETRY_HINT_RE = re.compile(r"retry (?:in|after) (\d+(?:\.\d+)?)\s*s|retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+
+_genai = None
+_api_key = None
+_configured_key = None
+_genai_lock = threading.Lock()
+
+
+def set_api_key(api_key):
+    """Remember the API key; the SDK is configured with it on first use."""
+    global _api_key
+    _api_key = api_key
+
+
+def load_genai(api_key=None):
+    """Import (once per process) and configure the Gemini SDK module."""
+    global _genai, _configured_key
+    with _genai_lock:
+        if _genai is None:
+            with METRICS.phase("sdk_import", memory=False):
+                _genai = importlib.import_module(GENAI_MODULE)
+        key = api_key or _api_key
+        if key and key != _configured_key:
+            _genai.configure(api_key=key)
+            _configured_key = key
+        return _genai
+
+
+def list_generation_models(genai):
+    """Names of the models that support ``generateContent``."""
+    return [
+        m.name for m in genai.list_models()
+        if "generateContent" in m.supported_generation_methods
+    ]
+
+
+def pick_model(available, preferences=MODEL_PREFERENCES):
+    """First available model matching the preference order, else the first available."""
+    for preference in preferences:
+        for model in available:
+            if preference in model.lower():
+                return model
+    return available[0] if available else None
+
+
+def display_name(model_name):
+    return model_name.split("/")[-1].replace("models/", "")
+
+
+class ModelResolver:
+    """Process-wide, TTL-cached model list with an on-disk snapshot."""
+
+    def __init__(self, discover, ttl=MODEL_TTL_SECONDS, snapshot_path=MODEL_SNAPSHOT,
+                 preferences=MODEL_PREFERENCES):
+        self.discover = discover
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.preferences = preferences
+        self.models = None
+        self.fetched_at = 0.0
+        self.last_error = None
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._load_snapshot()
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at if self.models is not None else None
+
+    @property
+    def stale(self):
+        return self.models is None or self.age > self.ttl
+
+    def _load_snapshot(self):
+        if not self.snapshot_path:
+            return
+        try:
+            with open(self.snapshot_path) as fh:
+                snapshot = json.load(fh)
+            self.models = list(snapshot["models"])
+            self.fetched_at = float(snapshot["fetched_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def _save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+            tmp = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as fh:
+                json.dump({"models": self.models, "fetched_at": self.fetched_at}, fh)
+            os.replace(tmp, self.snapshot_path)
+        except OSError:
+            pass
+
+    def refresh(self):
+        """Run discovery now (blocking) and return the new model list."""
+        with METRICS.phase("model_discovery"):
+            models = self.discover()
+        METRICS.incr("model_discovery_calls")
+        with self._lock:
+            self.models = list(models)
+            self.fetched_at = time.time()
+            self.last_error = None
+            self.refreshes += 1
+        self._save_snapshot()
+        return self.models
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:  # keep serving the stale list
+                self.last_error = str(e)
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="gemini-model-refresh", daemon=True).start()
+
+    def available_models(self):
+        """Cached model list; only blocks when nothing has ever been discovered."""
+        if self.models is None:
+            return self.refresh()
+        if self.stale:
+            self._refresh_in_background()
+        return self.models
+
+    def resolve(self):
+        """Preferred model name, or None if no model supports generateContent."""
+        return pick_model(self.available_models(), self.preferences)
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver(**options):
+    """Process-wide resolver; discovery loads the SDK lazily."""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = ModelResolver(lambda: list_generation_models(load_genai()), **options)
+        return _resolver
+
+
+def generative_model(model_name):
+    return load_genai().GenerativeModel(model_name)
+
+
+class QuotaExceededError(RuntimeError):
+    """The API kept answering with quota errors after every retry."""
+
+
+REQUEST_LIMIT = None
+TOKEN_LIMIT = None
+# Shared by every session served from this process.
+IN_FLIGHT = Coalescer("gemini")
+
+
+def set_rate_limits(rpm=GEMINI_RPM, tpm=GEMINI_TPM, burst=GEMINI_BURST):
+    """Size the shared buckets to the quota; 0 disables a limit."""
+    global REQUEST_LIMIT, TOKEN_LIMIT, GEMINI_RPM, GEMINI_TPM
+    GEMINI_RPM, GEMINI_TPM = rpm, tpm
+    REQUEST_LIMIT = TokenBucket(rpm / 60, max(burst, 1)) if rpm > 0 else None
+    TOKEN_LIMIT = TokenBucket(tpm / 60, tpm) if tpm > 0 else None
+
+
+set_rate_limits()
+
+
+def error_kind(error):
+    """``"quota"``, ``"transient"`` or None (not worth retrying)."""
+    name = type(error).__name__
+    code = getattr(error, "code", None)
+    code = code if isinstance(code, int) else None
+    if name in QUOTA_ERRORS or code == 429:
+        return "quota"
+    if name in TRANSIENT_ERRORS or code in (500, 502, 503, 504) or isinstance(error, (ConnectionError, TimeoutError)):
+        return "transient"
+    return None
+
+
+def retry_hint(error):
+    """Seconds the server asked us to wait, if the error says so."""
+    match = RETRY_HINT_RE.search(str(error))
+    return float(match.group(1) or match.group(2)) if match else 0.0
+
+
+def retry_delay(error, retry, on_status=None, can_retry=None):
+    """Seconds to wait before retrying after ``error``; re-raises it when not worth retrying.
+
+    Must be called from the ``except`` block that caught ``error``.
+    """
+    kind = error_kind(error)
+    if kind is None or retry == GEMINI_RETRIES or (can_retry is not None and not can_retry()):
+        if kind == "quota":
+            raise QuotaExceededError(
+                f"Gemini API quota still exhausted after {retry + 1} attempts: {error}"
+            ) from error
+        raise
+    delay = max(backoff_delay(retry, GEMINI_BACKOFF_SECONDS, GEMINI_BACKOFF_MAX_SECONDS), retry_hint(error))
+    if kind == "quota" and REQUEST_LIMIT is not None:
+        # Hold back every session, not just this request.
+        REQUEST_LIMIT.pause(delay)
+    METRICS.incr(f"gemini_retries_{kind}")
+    if on_status is not None:
+        reason = "API quota reached" if kind == "quota" else "temporary API error"
+        on_status(f"⏳ {reason}, retrying in {delay:.1f}s ({retry + 1}/{GEMINI_RETRIES})")
+    return delay
+
+
+def call_with_retry(attempt, prompt, on_status=None, can_retry=None):
+    """Run ``attempt()`` under the shared limits, retrying quota and transient errors."""
+    for retry in range(GEMINI_RETRIES + 1):
+        if REQUEST_LIMIT is not None:
+            REQUEST_LIMIT.acquire(name="gemini_rate")
+        if TOKEN_LIMIT is not None:
+            TOKEN_LIMIT.acquire(estimate_tokens(prompt), name="gemini_token_rate")
+        try:
+            return attempt()
+        except Exception as e:
+            delay = retry_delay(e, retry, on_status, can_retry)
+        time.sleep(delay)
+
+
+async def call_with_retry_async(attempt, prompt, on_status=None):
+    """``call_with_retry`` for coroutines; every wait is awaited, so a timeout cancels it."""
+    for retry in range(GEMINI_RETRIES + 1):
+        if REQUEST_LIMIT is not None:
+            await REQUEST_LIMIT.acquire_async(name="gemini_rate")
+        if TOKEN_LIMIT is not None:
+            await TOKEN_LIMIT.acquire_async(estimate_tokens(prompt), name="gemini_token_rate")
+        try:
+            return await attempt()
+        except Exception as e:
+            delay = retry_delay(e, retry, on_status)
+        await asyncio.sleep(delay)
+
+
+def request_key(model, prompt):
+    model_name = getattr(model, "model_name", None) or id(model)
+    return model_name, hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest()
+
+
+@dataclass
+class GenerationResult:
+    text: str
+    seconds: float
+    first_token_seconds: float = None
+    chunks: int = 1
+    streamed: bool = False
+    coalesced: bool = False
+
+
+def chunk_text(chunk):
+    """Text of a response chunk; chunks without text parts (e.g. safety stops) yield ''."""
+    try:
+        return chunk.text or ""
+    except ValueError:
+        return ""
+
+
+def generate(model, prompt, on_status=None):
+    """Blocking generation; time to first token equals total time."""
+    start = time.perf_counter()
+
+    def attempt():
+        METRICS.incr("gemini_calls")
+        try:
+            with METRICS.phase("generation"):
+                return model.generate_content(prompt).text
+        except Exception:
+            METRICS.incr("gemini_errors")
+            raise
+
+    def call(publish):
+        text = call_with_retry(attempt, prompt, on_status)
+        elapsed = time.perf_counter() - start
+        METRICS.record("generation_first_token", elapsed)
+        return GenerationResult(text, elapsed, first_token_seconds=elapsed)
+
+    result, coalesced = IN_FLIGHT.run(request_key(model, prompt), call)
+    if coalesced:
+        elapsed = time.perf_counter() - start
+        return replace(result, seconds=elapsed, first_token_seconds=elapsed, coalesced=True)
+    return result
+
+
+async def generate_async(model, prompt, on_status=None):
+    """Non-blocking generation for event loops (deep-analysis fan-out).
+
+    Uses the SDK's ``generate_content_async`` under the same limits and retries
+    as ``generate``, so cancelling the coroutine (e.g. on timeout) really stops
+    the request and its retries. Not coalesced: fan-out prompts are distinct.
+    """
+    start = time.perf_counter()
+
+    async def attempt():
+        METRICS.incr("gemini_calls")
+        try:
+            with METRICS.phase("generation"):
+                if hasattr(model, "generate_content_async"):
+                    response = await model.generate_content_async(prompt)
+                else:
+                    response = await asyncio.to_thread(model.generate_content, prompt)
+                return response.text
+        except Exception:
+            METRICS.incr("gemini_errors")
+            raise
+
+    text = await call_with_retry_async(attempt, prompt, on_status)
+    elapsed = time.perf_counter() - start
+    METRICS.record("generation_first_token", elapsed)
+    return GenerationResult(text, elapsed, first_token_seconds=elapsed)
+
+
+def generate_stream(model, prompt, on_text=None, on_status=None):
+    """Stream a completion, calling ``on_text(text_so_far)`` after every chunk.
+
+    Returns the full text with time-to-first-token and total time, so the
+    caller can render progressively and still keep the final insight. A
+    failed stream is only retried if nothing was received yet. Sessions
+    asking for the same prompt while it streams follow the same response.
+    """
+    start = time.perf_counter()
+    state = {"first_token": None, "text": "", "chunks": 0}
+
+    def received(text):
+        if state["first_token"] is None:
+            state["first_token"] = time.perf_counter() - start
+        if on_text is not None:
+            on_text(text)
+
+    def attempt(publish):
+        METRICS.incr("gemini_calls")
+        try:
+            with METRICS.phase("generation"):
+                for chunk in model.generate_content(prompt, stream=True):
+                    piece = chunk_text(chunk)
+                    if not piece:
+                        continue
+                    if not state["text"]:
+                        METRICS.record("generation_first_token", time.perf_counter() - start)
+                    state["text"] += piece
+                    state["chunks"] += 1
+                    publish(state["text"])
+        except Exception:
+            METRICS.incr("gemini_errors")
+            raise
+        return state["text"]
+
+    def call(publish):
+        text = call_with_retry(lambda: attempt(publish), prompt, on_status, can_retry=lambda: not state["text"])
+        return GenerationResult(text, time.perf_counter() - start, state["first_token"], state["chunks"], streamed=True)
+
+    result, coalesced = IN_FLIGHT.run(request_key(model, prompt), call, on_text=received)
+    if coalesced:
+        return replace(result, seconds=time.perf_counter() - start,
+                       first_token_seconds=state["first_token"], coalesced=True)
+    return result
+
+
+def client_stats():
+    """Shared limiter and retry counters for the debug panel."""
+    return {
+        "rpm": GEMINI_RPM,
+        "requests_available": REQUEST_LIMIT.available if REQUEST_LIMIT is not None else None,
+        "throttled": METRICS.count("gemini_rate_throttled") + METRICS.count("gemini_token_rate_throttled"),
+        "retries": METRICS.count("gemini_retries_quota") + METRICS.count("gemini_retries_transient"),
+        "coalesced": METRICS.count("gemini_coalesced"),
+        "in_flight": IN_FLIGHT.in_flight,
+    }
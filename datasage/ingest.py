@@ -0,0 +1,348 @@
+"""CSV and Excel ingestion with a content-hash keyed cache.
+
+Streamlit re-executes the whole script on every widget interaction, so the
+uploaded file would otherwise be parsed again for each button click. Parsed
+frames are cached on a digest of the raw bytes plus the parse options.
+
+Three parse modes are available:
+
+* ``standard``  - the plain ``pd.read_csv`` load;
+* ``optimized`` - a chunked load that infers column types from a sample,
+  streams the file and stores numerics downcast and low-cardinality text as
+  categoricals;
+* ``arrow``     - pyarrow's multithreaded CSV reader producing Arrow-backed
+  frames.
+
+Excel workbooks go through ``ingest_excel``: one sheet is parsed per call
+(see ``excel``) and cached like any other mode, keyed by the workbook digest
+and sheet name.
+
+Parsed frames can additionally be persisted as Parquet (see ``storage``), so
+reopening a dataset in a fresh process is a columnar read, not a re-parse.
+"""
+import hashlib
+import io
+import os
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from .cache import LRUCache
+from .excel import list_sheets, parse_excel
+from .metrics import METRICS
+
+MODES = ("standard", "optimized", "arrow")
+
+INGEST_CACHE_MB = int(os.getenv("DATASAGE_INGEST_CACHE_MB", "1024"))
+CHUNK_ROWS = int(os.getenv("DATASAGE_CHUNK_ROWS", "250000"))
+SAMPLE_ROWS = 50_000
+CATEGORY_MAX_RATIO = 0.5
+CATEGORY_MAX_UNIQUE = 10_000
+
+# pd.read_csv's default missing-value markers, so every mode counts the same cells as missing.
+PANDAS_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# Shared by every session served from this process.
+INGEST_CACHE = LRUCache(INGEST_CACHE_MB * 1024 * 1024)
+
+
+@dataclass
+class IngestResult:
+    frame: pd.DataFrame
+    digest: str
+    cache_hit: bool
+    seconds: float
+    mode: str = "standard"
+    memory_bytes: int = 0
+    naive_bytes: int = 0
+
+    @property
+    def memory_saved(self):
+        """Bytes saved compared with a default-dtype load (0 when unknown)."""
+        if not self.naive_bytes:
+            return 0
+        return max(self.naive_bytes - self.memory_bytes, 0)
+
+
+def read_bytes(source):
+    """Return the raw bytes of an uploaded file, path or bytes object."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    if hasattr(source, "read"):
+        data = source.read()
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return data
+    with open(source, "rb") as fh:
+        return fh.read()
+
+
+def content_digest(data):
+    """Stable digest of the uploaded bytes."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def cache_key(digest, kind, options):
+    return (digest, kind, tuple(sorted((k, repr(v)) for k, v in options.items())))
+
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def is_text(series):
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+
+def plan_dtypes(sample, max_ratio=CATEGORY_MAX_RATIO, max_unique=CATEGORY_MAX_UNIQUE):
+    """Decide a storage type per column from a sample of rows.
+
+    Returns a mapping of column -> "integer", "float", "category" or None
+    (leave as parsed).
+    """
+    plan = {}
+    rows = max(len(sample), 1)
+    for col in sample.columns:
+        s = sample[col]
+        if pd.api.types.is_bool_dtype(s):
+            plan[col] = None
+        elif pd.api.types.is_integer_dtype(s):
+            plan[col] = "integer"
+        elif pd.api.types.is_float_dtype(s):
+            plan[col] = "float"
+        elif is_text(s):
+            unique = s.nunique(dropna=True)
+            plan[col] = "category" if unique <= max_unique and unique / rows <= max_ratio else None
+        else:
+            plan[col] = None
+    return plan
+
+
+def optimize_chunk(chunk, plan, downcast_floats=False):
+    """Apply a dtype plan to one parsed chunk.
+
+    Columns whose chunk turned out non-numeric (e.g. ``ERROR_404`` in a sales
+    column) are left as parsed; ``parse_optimized`` re-reads them as text once
+    all chunks are in. Floats are only downcast on request because
+    float32 loses precision on currency values.
+    """
+    for col, kind in plan.items():
+        if col not in chunk.columns or kind is None:
+            continue
+        s = chunk[col]
+        if kind == "integer" and pd.api.types.is_integer_dtype(s):
+            chunk[col] = pd.to_numeric(s, downcast="integer")
+        elif kind == "float" and pd.api.types.is_float_dtype(s) and downcast_floats:
+            chunk[col] = pd.to_numeric(s, downcast="float")
+        elif kind == "category" and is_text(s):
+            chunk[col] = s.astype("category")
+    return chunk
+
+
+def mixed_columns(chunks):
+    """Columns parsed as text in some chunks and as numbers (or other types) in others."""
+    return [
+        col for col in chunks[0].columns
+        if len({is_text(c[col]) or isinstance(c[col].dtype, pd.CategoricalDtype) for c in chunks}) > 1
+    ]
+
+
+def concat_chunks(chunks):
+    """Concatenate optimized chunks, unioning categoricals so they stay categorical."""
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = chunks[0].columns
+    for col in columns:
+        if all(isinstance(c[col].dtype, pd.CategoricalDtype) for c in chunks):
+            merged = union_categoricals([c[col] for c in chunks])
+            categories = merged.categories
+            for c in chunks:
+                c[col] = c[col].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def text_columns(df):
+    """Columns holding text, whatever the backing dtype (object, string, category, Arrow)."""
+    columns = []
+    for col in df.columns:
+        dtype = df[col].dtype
+        if dtype == object or isinstance(dtype, (pd.StringDtype, pd.CategoricalDtype)):
+            columns.append(col)
+        elif isinstance(dtype, pd.ArrowDtype) and (
+            "string" in str(dtype) or "large_string" in str(dtype)
+        ):
+            columns.append(col)
+    return columns
+
+
+def parse_standard(data, **read_options):
+    frame = pd.read_csv(io.BytesIO(data), **read_options)
+    return frame, 0
+
+
+def parse_optimized(data, chunk_rows=CHUNK_ROWS, sample_rows=SAMPLE_ROWS,
+                    downcast_floats=False, **read_options):
+    """Chunked, dtype-optimizing CSV parse for large uploads.
+
+    Column types are planned from the first ``sample_rows`` rows, then the file
+    is streamed ``chunk_rows`` at a time so only one default-dtype chunk is
+    alive at once. The second return value is the summed footprint of the
+    chunks before optimization, i.e. what a plain ``pd.read_csv`` would hold.
+    """
+    sample = pd.read_csv(io.BytesIO(data), nrows=sample_rows, **read_options)
+    plan = plan_dtypes(sample)
+    del sample
+
+    chunks = []
+    naive_bytes = 0
+    reader = pd.read_csv(io.BytesIO(data), chunksize=chunk_rows, **read_options)
+    for chunk in reader:
+        naive_bytes += frame_nbytes(chunk)
+        chunks.append(optimize_chunk(chunk, plan, downcast_floats))
+    if not chunks:
+        return pd.read_csv(io.BytesIO(data), **read_options), 0
+    mixed = mixed_columns(chunks)
+    if mixed:
+        # Concatenating would give an object column mixing 5 and "5"; read these as text, like a plain load does
+        columns = chunks[0].columns
+        positions = [columns.get_loc(col) for col in mixed]
+        chunks = [chunk.drop(columns=mixed) for chunk in chunks]
+        text = pd.read_csv(io.BytesIO(data), usecols=positions, dtype=str, **read_options)
+        METRICS.incr("ingest_mixed_columns", len(mixed))
+    frame = concat_chunks(chunks)
+    if mixed:
+        # usecols returns the columns in file order
+        for i, (pos, col) in enumerate(sorted(zip(positions, mixed))):
+            frame.insert(pos, col, text.iloc[:, i])
+    return frame, naive_bytes
+
+
+def pyarrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "The Arrow ingestion backend and Parquet persistence need pyarrow: pip install pyarrow"
+        ) from e
+
+
+def parse_arrow(data, threads=None, block_size=None):
+    """Parse with pyarrow's multithreaded reader into an Arrow-backed frame."""
+    require_pyarrow()
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    # The thread pool itself is process-wide, so a single-threaded parse is the only per-call choice.
+    read_options = pa_csv.ReadOptions(use_threads=threads != 1)
+    if block_size:
+        read_options.block_size = block_size
+    convert_options = pa_csv.ConvertOptions(null_values=PANDAS_NA_VALUES, strings_can_be_null=True)
+    table = pa_csv.read_csv(pa.BufferReader(data), read_options=read_options, convert_options=convert_options)
+    return table.to_pandas(types_mapper=pd.ArrowDtype), 0
+
+
+PARSERS = {
+    "standard": parse_standard,
+    "optimized": parse_optimized,
+    "arrow": parse_arrow,
+    "excel": parse_excel,
+}
+
+
+def ingest(source, mode="standard", cache=INGEST_CACHE, store=None, digest=None, **options):
+    """Parse an upload once per (content, mode, options) and reuse it afterwards.
+
+    Lookup order is the in-process cache, then the Parquet ``store`` (if one is
+    given), then a real parse, which is written back to both. The returned
+    frame is shared with the cache and with other sessions; copy it before
+    mutating in place. A caller that already knows the upload's ``digest``
+    (e.g. memoized per uploaded file) skips reading and hashing the bytes
+    unless they have to be parsed.
+    """
+    if mode not in PARSERS:
+        raise ValueError(f"Unknown ingestion mode {mode!r}; expected one of {tuple(PARSERS)}")
+
+    start = time.perf_counter()
+    with METRICS.phase("ingest") as phase:
+        data = None
+        if digest is None:
+            data = read_bytes(source)
+            digest = content_digest(data)
+        key = cache_key(digest, mode, options)
+
+        cached = cache.get(key) if cache is not None else None
+        cache_hit = cached is not None
+        if cache_hit:
+            frame, naive_bytes = cached
+        else:
+            frame = None
+            name = store.dataset_name("raw", mode, options) if store is not None else None
+            if store is not None:
+                frame = store.load(digest, name, arrow=(mode == "arrow"))
+                naive_bytes = store.load_meta(digest, name).get("naive_bytes", 0) if frame is not None else 0
+            if frame is None:
+                frame, naive_bytes = PARSERS[mode](read_bytes(source) if data is None else data, **options)
+                if store is not None:
+                    store.save(digest, name, frame, meta={"naive_bytes": naive_bytes})
+            if cache is not None:
+                cache.put(key, (frame, naive_bytes))
+        phase.set_shape(*frame.shape)
+    METRICS.incr("ingest_cache_hits" if cache_hit else "ingest_cache_misses")
+
+    return IngestResult(frame, digest, cache_hit, time.perf_counter() - start,
+                        mode=mode, memory_bytes=frame_nbytes(frame),
+                        naive_bytes=naive_bytes)
+
+
+def ingest_csv(source, cache=INGEST_CACHE, **read_options):
+    """Standard ``pd.read_csv`` load through the ingestion cache."""
+    return ingest(source, "standard", cache=cache, **read_options)
+
+
+def ingest_csv_optimized(source, cache=INGEST_CACHE, **options):
+    """Chunked, dtype-optimizing load through the ingestion cache."""
+    return ingest(source, "optimized", cache=cache, **options)
+
+
+def ingest_csv_arrow(source, cache=INGEST_CACHE, **options):
+    """Multithreaded Arrow load through the ingestion cache."""
+    return ingest(source, "arrow", cache=cache, **options)
+
+
+def sheet_names(source, cache=INGEST_CACHE, digest=None):
+    """Sheet names of an Excel workbook, cached on its content digest."""
+    data = read_bytes(source) if digest is None else None
+    key = cache_key(digest or content_digest(data), "sheets", {})
+    names = cache.get(key) if cache is not None else None
+    if names is None:
+        names = tuple(list_sheets(read_bytes(source) if data is None else data))
+        if cache is not None:
+            cache.put(key, names)
+    return list(names)
+
+
+def ingest_excel(source, sheet_name=0, cache=INGEST_CACHE, store=None, digest=None, **options):
+    """Load one sheet of a workbook; re-selecting it is served from the cache or ``store``.
+
+    The result's ``digest`` identifies the sheet (workbook digest plus sheet
+    name), so profiles, cleaning fingerprints and stored cleaned data of
+    different sheets never collide.
+    """
+    result = ingest(source, "excel", cache=cache, store=store, digest=digest, sheet_name=sheet_name, **options)
+    result.digest = content_digest(f"{result.digest}:{sheet_name!r}".encode())
+    return result
@@ -0,0 +1,165 @@
+"""Background job runner shared by all Streamlit sessions.
+
+Cleaning and analysis used to run inline in the button handler, so a rerun
+(any widget touch) interrupted them and a long clean froze the session. Jobs
+now run on a process-wide pool of worker threads; the session only keeps the
+job ID and polls the job's progress on each rerun.
+
+Pending jobs are queued per session and workers serve sessions round-robin,
+so one analyst queueing many jobs cannot starve the others. Long jobs publish
+intermediate results through ``report(partial=...)`` and may stop early when
+the session calls ``cancel()``.
+"""
+import itertools
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+
+JOB_WORKERS = int(os.getenv("DATASAGE_JOB_WORKERS", "4"))
+JOB_RETENTION_SECONDS = int(os.getenv("DATASAGE_JOB_RETENTION", "3600"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    def __init__(self, kind, func, args, kwargs, session_id, meta=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.session_id = session_id
+        self.meta = dict(meta or {})
+        self.status = QUEUED
+        self.progress = 0.0
+        self.messages = []
+        self.partial_text = ""
+        self.partial = None
+        self.cancel_requested = False
+        self.result = None
+        self.error = ""
+        self.traceback = ""
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def seconds(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def report(self, message=None, progress=None, text=None, partial=None):
+        """Called from the job body to publish progress for the polling session."""
+        if message is not None:
+            self.messages.append(message)
+        if progress is not None:
+            self.progress = min(max(float(progress), 0.0), 1.0)
+        if text is not None:
+            self.partial_text = text
+        if partial is not None:
+            self.partial = partial
+
+    def cancel(self):
+        """Ask the job to stop; job bodies that support it check ``cancel_requested``."""
+        self.cancel_requested = True
+
+    def run(self):
+        self.status = RUNNING
+        self.started_at = time.time()
+        try:
+            self.result = self._func(self, *self._args, **self._kwargs)
+            self.progress = 1.0
+            self.status = DONE
+        except Exception as e:
+            self.error = str(e)
+            self.traceback = traceback.format_exc()
+            self.status = FAILED
+        finally:
+            self.finished_at = time.time()
+            self._func = self._args = self._kwargs = None
+
+
+class JobRunner:
+    """Fixed pool of worker threads with per-session round-robin queues."""
+
+    def __init__(self, workers=JOB_WORKERS, retention=JOB_RETENTION_SECONDS):
+        self.workers = workers
+        self.retention = retention
+        self._jobs = {}
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._counter = itertools.count()
+
+    def _ensure_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._work, name=f"datasage-job-{next(self._counter)}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_job(self):
+        # Take one job from the session at the head, then move that session to the back.
+        session_id, queue = next(iter(self._pending.items()))
+        job = queue.popleft()
+        del self._pending[session_id]
+        if queue:
+            self._pending[session_id] = queue
+        return job
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job = self._next_job()
+            job.run()
+
+    def submit(self, kind, func, *args, session_id=None, meta=None, **kwargs):
+        """Queue ``func(job, *args, **kwargs)`` and return its job ID."""
+        job = Job(kind, func, args, kwargs, session_id, meta)
+        with self._cond:
+            self._prune()
+            self._jobs[job.id] = job
+            self._pending.setdefault(session_id, deque()).append(job)
+            self._ensure_workers()
+            self._cond.notify()
+        return job.id
+
+    def get(self, job_id):
+        return self._jobs.get(job_id) if job_id else None
+
+    def jobs_for(self, session_id):
+        return [j for j in self._jobs.values() if j.session_id == session_id]
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._cond:
+            jobs = list(self._jobs.values())
+            queued = sum(len(q) for q in self._pending.values())
+        return {
+            "workers": self.workers,
+            "queued": queued,
+            "running": sum(1 for j in jobs if j.status == RUNNING),
+            "done": sum(1 for j in jobs if j.status == DONE),
+            "failed": sum(1 for j in jobs if j.status == FAILED),
+        }
+
+
+JOBS = JobRunner()
@@ -0,0 +1,229 @@
+"""Process-wide latency, memory and call-count instrumentation.
+
+Engine phases (ingestion, profiling, each cleaning step, model discovery,
+generation, report rendering) are timed with ``METRICS.phase(...)``; events
+such as Gemini calls, errors and cache hits are counted with
+``METRICS.incr(...)``. Everything is exported as JSON or in the Prometheus text
+exposition format, and optionally served on ``DATASAGE_METRICS_PORT``.
+
+Memory is the process resident set size sampled while the phase runs, so
+phases that overlap in background jobs see each other's allocations.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RSS_SAMPLE_SECONDS = 0.02
+PREFIX = "datasage"
+
+try:
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+
+def rss_bytes():
+    """Current resident set size (Linux), else the process peak from getrusage."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+        except ImportError:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        return peak if peak > 1 << 32 else peak * 1024
+
+
+class RSSSampler:
+    """Tracks the peak RSS seen between start() and stop() on a helper thread.
+
+    ``probe`` samples another byte count instead, e.g. ``pyarrow.total_allocated_bytes``.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS, probe=rss_bytes):
+        self.interval = interval
+        self.probe = probe
+        self.start_bytes = self.peak_bytes = probe()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="datasage-rss", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, self.probe())
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self.probe())
+        return self.peak_bytes
+
+
+class PhaseRecord:
+    """Handle yielded by ``Metrics.phase`` for attaching row/column counts."""
+
+    def __init__(self):
+        self.rows = None
+        self.columns = None
+
+    def set_shape(self, rows, columns=None):
+        self.rows = int(rows)
+        if columns is not None:
+            self.columns = int(columns)
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = {}
+        self.counters = {}
+        self.started_at = time.time()
+
+    def record(self, name, seconds, peak_rss_bytes=0, rss_delta_bytes=0, rows=None, columns=None):
+        with self._lock:
+            stats = self.phases.setdefault(name, {
+                "count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "last_seconds": 0.0,
+                "peak_rss_bytes": 0, "last_rss_delta_bytes": 0, "last_rows": None, "last_columns": None,
+                "last_at": None,
+            })
+            stats["count"] += 1
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["last_seconds"] = seconds
+            stats["peak_rss_bytes"] = max(stats["peak_rss_bytes"], int(peak_rss_bytes))
+            stats["last_rss_delta_bytes"] = int(rss_delta_bytes)
+            if rows is not None:
+                stats["last_rows"] = int(rows)
+            if columns is not None:
+                stats["last_columns"] = int(columns)
+            stats["last_at"] = time.time()
+
+    @contextmanager
+    def phase(self, name, rows=None, columns=None, memory=True):
+        """Time the enclosed block (and sample RSS) under ``name``; failures are timed too."""
+        record = PhaseRecord()
+        if rows is not None:
+            record.set_shape(rows, columns)
+        sampler = RSSSampler().start() if memory else None
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            peak = sampler.stop() if sampler else 0
+            delta = peak - sampler.start_bytes if sampler else 0
+            self.record(name, seconds, peak, delta, record.rows, record.columns)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def count(self, name):
+        return self.counters.get(name, 0)
+
+    def last(self, name, key="last_seconds", default=None):
+        stats = self.phases.get(name)
+        return stats[key] if stats else default
+
+    def reset(self):
+        with self._lock:
+            self.phases.clear()
+            self.counters.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "uptime_seconds": time.time() - self.started_at,
+                "rss_bytes": rss_bytes(),
+                "phases": {name: dict(stats) for name, stats in self.phases.items()},
+                "counters": dict(self.counters),
+            }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent, sort_keys=True)
+
+    def to_prometheus(self):
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            full = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{escape(v)}"' for k, v in labels.items())
+                lines.append(f"{full}{{{label_text}}} {value}" if label_text else f"{full} {value}")
+
+        phases = sorted(snap["phases"].items())
+        metric("phase_runs_total", "counter", "Completed runs per phase.",
+               [({"phase": n}, s["count"]) for n, s in phases])
+        metric("phase_seconds_total", "counter", "Total wall time per phase.",
+               [({"phase": n}, f"{s['total_seconds']:.6f}") for n, s in phases])
+        metric("phase_last_seconds", "gauge", "Wall time of the latest run per phase.",
+               [({"phase": n}, f"{s['last_seconds']:.6f}") for n, s in phases])
+        metric("phase_max_seconds", "gauge", "Slowest run per phase.",
+               [({"phase": n}, f"{s['max_seconds']:.6f}") for n, s in phases])
+        metric("phase_peak_rss_bytes", "gauge", "Highest process RSS sampled during the phase.",
+               [({"phase": n}, s["peak_rss_bytes"]) for n, s in phases])
+        metric("phase_last_rows", "gauge", "Rows handled by the latest run per phase.",
+               [({"phase": n}, s["last_rows"]) for n, s in phases if s["last_rows"] is not None])
+        metric("phase_last_columns", "gauge", "Columns handled by the latest run per phase.",
+               [({"phase": n}, s["last_columns"]) for n, s in phases if s["last_columns"] is not None])
+        metric("events_total", "counter", "Event counters (Gemini calls, errors, cache hits).",
+               [({"event": n}, v) for n, v in sorted(snap["counters"].items())])
+        metric("process_rss_bytes", "gauge", "Current process resident set size.", [({}, snap["rss_bytes"])])
+        metric("uptime_seconds", "gauge", "Seconds since metrics were started.",
+               [({}, f"{snap['uptime_seconds']:.0f}")])
+        return "\n".join(lines) + "\n"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics()
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, metrics=METRICS, host="0.0.0.0"):
+    """Serve ``/metrics`` (Prometheus) and ``/metrics.json`` once per process."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, content_type = metrics.to_json(), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, content_type = metrics.to_prometheus(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        _server = ThreadingHTTPServer((host, int(port)), Handler)
+        threading.Thread(target=_server.serve_forever, name="datasage-metrics", daemon=True).start()
+        return _server
@@ -0,0 +1,99 @@
+"""String normalization at the level of distinct values.
+
+Text columns in business exports have a few hundred distinct values repeated
+over millions of rows. Instead of ``astype(str).str.strip()`` on every cell,
+each column is factorized, only the distinct values are normalized (strip,
+casing, typo map) and the result is mapped back through the integer codes.
+Nulls stay null rather than becoming the literal ``"nan"``.
+"""
+import numpy as np
+import pandas as pd
+
+CASES = {
+    None: None,
+    "lower": str.lower,
+    "upper": str.upper,
+    "title": str.title,
+    "capitalize": str.capitalize,
+}
+
+
+def normalize_value(value, strip=True, case=None, typo_map=None):
+    """Normalize one distinct value; non-strings are converted with ``str()``."""
+    text = value if isinstance(value, str) else str(value)
+    if strip:
+        text = text.strip()
+    if case is not None:
+        text = CASES[case](text)
+    if typo_map:
+        text = typo_map.get(text.casefold(), text)
+    return text
+
+
+def factorized(series):
+    """``(codes, uniques)`` with -1 codes for nulls, reusing categorical codes when present."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    return pd.factorize(series, use_na_sentinel=True)
+
+
+def normalize_codes(series, strip=True, case=None, typo_map=None):
+    """The expensive half of ``normalize_values``: factorize and normalize distinct values.
+
+    Returns ``(codes, categories, changed)``: output codes (-1 for nulls,
+    smallest integer dtype), the normalized distinct values and the per-row
+    changed mask. The result is compact enough to send back from a worker.
+    """
+    if case not in CASES:
+        raise ValueError(f"Unknown case {case!r}; expected one of {[c for c in CASES if c]}")
+    if typo_map:
+        typo_map = {str(k).casefold(): v for k, v in typo_map.items()}
+
+    codes, uniques = factorized(series)
+    originals = np.asarray(uniques, dtype=object)
+    normalized = np.array(
+        [normalize_value(v, strip, case, typo_map) for v in originals], dtype=object
+    )
+    changed_unique = np.array(
+        [not isinstance(o, str) or o != n for o, n in zip(originals, normalized)], dtype=bool
+    )
+    valid = codes >= 0
+    changed = np.zeros(len(codes), dtype=bool)
+    if len(originals):
+        changed[valid] = changed_unique[codes[valid]]
+
+    # Distinct inputs may collapse onto one output ("SOUth", "South " -> "South").
+    new_codes, categories = pd.factorize(normalized)
+    mapped = new_codes[codes] if len(new_codes) else codes.copy()
+    mapped[~valid] = -1
+    mapped = mapped.astype(np.min_scalar_type(-max(len(categories), 1)))
+    return mapped, np.asarray(categories, dtype=object), changed
+
+
+def rebuild_values(series, codes, categories):
+    """Map output ``codes`` back to values, keeping the column's dtype family."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = pd.Categorical.from_codes(codes, categories=categories)
+        return pd.Series(values, index=series.index, name=series.name)
+
+    if isinstance(series.dtype, (pd.StringDtype, pd.ArrowDtype)):
+        target = pd.array(categories, dtype=series.dtype)
+    else:
+        target = categories
+    values = pd.api.extensions.take(target, codes.astype(np.intp, copy=False), allow_fill=True)
+    return pd.Series(values, index=series.index, name=series.name, dtype=values.dtype)
+
+
+def normalize_values(series, strip=True, case=None, typo_map=None):
+    """Normalize a text column by its distinct values.
+
+    ``case`` is one of None, "lower", "upper", "title" or "capitalize".
+    ``typo_map`` maps wrong spellings (matched case-insensitively after strip
+    and casing) to canonical ones, e.g. ``{"south": "South"}``.
+
+    Returns ``(normalized_series, changed)`` where ``changed`` is a boolean
+    array marking the rows whose value changed. Categorical columns stay
+    categorical; other columns keep their string dtype where they had one.
+    """
+    codes, categories, changed = normalize_codes(series, strip, case, typo_map)
+    return rebuild_values(series, codes, categories), changed
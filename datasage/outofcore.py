@@ -0,0 +1,381 @@
+"""Out-of-core execution over DuckDB for files larger than worker RAM.
+
+The pandas path parses the whole upload into memory before doing anything.
+Here the file stays on disk and every operation is a DuckDB query streamed
+over it, spilling to ``temp_directory`` under ``DATASAGE_DUCKDB_MEMORY``:
+
+* the quality profile is one aggregate pass with DuckDB's HyperLogLog
+  distinct estimates, plus one exact ``count(DISTINCT)`` pass over the
+  columns estimated under ``EXACT_DISTINCT_THRESHOLD`` (as in memory);
+* header normalization, string trimming and first-occurrence deduplication
+  run as one query written straight to Parquet;
+* previews and the analysis digest only materialize a page or a reservoir
+  sample.
+
+Only the default cleaning steps have SQL equivalents; other steps raise.
+"""
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .cache import LRUCache
+from .cleaning import CLEANING_STEPS, CleaningPipeline, StepResult, normalize_header
+from .digest import DIGEST_TOKEN_BUDGET, build_digest
+from .ingest import PANDAS_NA_VALUES, content_digest, read_bytes
+from .metrics import METRICS
+from .profile import EXACT_DISTINCT_THRESHOLD, DataProfile
+from .storage import WORK_DIR
+
+DUCKDB_MEMORY_LIMIT = os.getenv("DATASAGE_DUCKDB_MEMORY", "2GB")
+DUCKDB_THREADS = int(os.getenv("DATASAGE_DUCKDB_THREADS", "0"))
+OUT_OF_CORE_SAMPLE_ROWS = 100_000
+OUT_OF_CORE_STEPS = ("normalize_headers", "strip_text", "drop_duplicates")
+
+NUMERIC_TYPES = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT",
+                 "UINTEGER", "UBIGINT", "FLOAT", "DOUBLE", "DECIMAL")
+TEXT_TYPES = ("VARCHAR",)
+# str.strip() whitespace, so trimmed values match the pandas pipeline.
+WHITESPACE_SQL = "' ' || chr(9) || chr(10) || chr(11) || chr(12) || chr(13)"
+
+# Types the sniffer may pick. Dates and times stay VARCHAR, as pandas leaves them
+# as text, so both modes see the same text columns.
+CSV_TYPE_CANDIDATES = ("BOOLEAN", "BIGINT", "DOUBLE", "VARCHAR")
+
+# Sniffed read_csv() calls per path.
+_sources = LRUCache(max_entries=256)
+# Opened datasets keep their row count and profile, so reruns don't rescan the file.
+_opened = LRUCache(max_entries=64)
+
+
+def duckdb_available():
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def require_duckdb():
+    try:
+        import duckdb  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Out-of-core mode needs DuckDB: pip install duckdb") from e
+
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def literal(text):
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+def connect(temp_dir=None):
+    """A fresh DuckDB connection with the memory limit and spill directory set."""
+    require_duckdb()
+    import duckdb
+
+    con = duckdb.connect()
+    con.execute(f"SET memory_limit = {literal(DUCKDB_MEMORY_LIMIT)}")
+    con.execute(f"SET temp_directory = {literal(temp_dir or os.path.join(WORK_DIR, 'duckdb_tmp'))}")
+    # Row numbering in cleaning_sql relies on scans keeping file order.
+    con.execute("SET preserve_insertion_order = true")
+    if DUCKDB_THREADS:
+        con.execute(f"SET threads = {DUCKDB_THREADS}")
+    return con
+
+
+def csv_source(path):
+    """``read_csv(...)`` call with types sniffed once over the whole file.
+
+    Sniffing every row costs one streamed pass but means a stray ``ERROR_404``
+    deep in a numeric column makes it text instead of failing mid-query.
+    Missing markers and candidate types follow the pandas reader.
+    """
+    source = _sources.get(path)
+    if source is None:
+        nullstr = ", ".join(literal(v) for v in PANDAS_NA_VALUES)
+        types = ", ".join(literal(t) for t in CSV_TYPE_CANDIDATES)
+        con = connect()
+        try:
+            prompt = con.execute(
+                f"SELECT Prompt FROM sniff_csv({literal(path)}, sample_size=-1, nullstr=[{nullstr}], "
+                f"auto_type_candidates=[{types}])"
+            ).fetchone()[0]
+        finally:
+            con.close()
+        source = prompt.strip().removeprefix("FROM ").rstrip(";")
+        _sources.put(path, source)
+    return source
+
+
+def file_digest(path, block_size=8 * 1024 * 1024):
+    """``content_digest`` of a file on disk, read in blocks."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def spool_upload(source, work_dir=WORK_DIR, digest=None):
+    """Write an upload to ``<work_dir>/<digest>/source.csv`` once and return ``(path, digest)``.
+
+    With a known ``digest`` an upload that is already spooled is not read again.
+    """
+    if isinstance(source, str) and os.path.exists(source):
+        return source, digest or file_digest(source)
+    if digest is not None and os.path.exists(os.path.join(work_dir, digest, "source.csv")):
+        return os.path.join(work_dir, digest, "source.csv"), digest
+    data = read_bytes(source)
+    digest = digest or content_digest(data)
+    path = os.path.join(work_dir, digest, "source.csv")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    return path, digest
+
+
+class OutOfCoreDataset:
+    """A CSV or Parquet file queried lazily through DuckDB."""
+
+    def __init__(self, path, digest=None):
+        self.path = path
+        self.digest = digest or os.path.basename(os.path.dirname(path))
+        if path.endswith(".parquet"):
+            self.source = f"read_parquet({literal(path)})"
+        else:
+            self.source = csv_source(path)
+        con = connect()
+        try:
+            schema = con.execute(f"DESCRIBE SELECT * FROM {self.source}").fetchall()
+        finally:
+            con.close()
+        self.columns = [row[0] for row in schema]
+        self.types = {row[0]: row[1] for row in schema}
+        self._rows = None
+        self._profile = None
+
+    def query(self, sql, params=None):
+        """Run ``sql`` (``{source}`` is the dataset) and return a pandas frame."""
+        con = connect()
+        try:
+            return con.execute(sql.replace("{source}", self.source), params or []).df()
+        finally:
+            con.close()
+
+    @property
+    def rows(self):
+        if self._rows is None:
+            self._rows = int(self.query("SELECT count(*) AS n FROM {source}")["n"].iloc[0])
+        return self._rows
+
+    @property
+    def shape(self):
+        return (self.rows, len(self.columns))
+
+    def numeric_columns(self):
+        return [c for c in self.columns if self.types[c].startswith(NUMERIC_TYPES)]
+
+    def text_columns(self):
+        return [c for c in self.columns if self.types[c] in TEXT_TYPES]
+
+    def slice(self, row_start, row_stop, column_start, column_stop):
+        """Rows ``[row_start, row_stop)`` of columns ``[column_start, column_stop)`` as a small frame."""
+        columns = ", ".join(quote(c) for c in self.columns[column_start:column_stop])
+        frame = self.query(f"SELECT {columns} FROM {{source}} LIMIT ? OFFSET ?",
+                           [row_stop - row_start, row_start])
+        frame.index = pd.RangeIndex(row_start, row_start + len(frame))
+        return frame
+
+    def sample(self, rows=OUT_OF_CORE_SAMPLE_ROWS, seed=0):
+        """Reservoir sample of up to ``rows`` rows, reproducible for a given seed."""
+        return self.query(f"SELECT * FROM {{source}} USING SAMPLE reservoir({int(rows)} ROWS) REPEATABLE ({int(seed)})")
+
+    def export(self, path, fmt="parquet"):
+        """Stream the dataset to a Parquet or CSV file."""
+        options = "FORMAT parquet" if fmt == "parquet" else "FORMAT csv, HEADER true"
+        con = connect()
+        try:
+            con.execute(f"COPY (SELECT * FROM {self.source}) TO {literal(path)} ({options})")
+        finally:
+            con.close()
+
+    def digest_text(self, token_budget=DIGEST_TOKEN_BUDGET):
+        return build_digest(self.sample(), token_budget, total_rows=self.rows)
+
+    def profile(self):
+        """Quality profile computed in one streamed aggregate over the file (once per dataset)."""
+        if self._profile is None:
+            self._profile = self._compute_profile()
+        return self._profile
+
+    def _compute_profile(self):
+        with METRICS.phase("profile.out_of_core", memory=False) as phase:
+            start = time.perf_counter()
+            numeric = set(self.numeric_columns())
+            aggregates = ["count(*)"]
+            for col in self.columns:
+                q = quote(col)
+                aggregates += [f"count({q})", f"approx_count_distinct({q})"]
+                if col in numeric:
+                    aggregates += [f"avg({q})", f"stddev_samp({q})", f"min({q})::DOUBLE", f"max({q})::DOUBLE"]
+            con = connect()
+            try:
+                values = list(con.execute(f"SELECT {', '.join(aggregates)} FROM {self.source}").fetchone())
+            finally:
+                con.close()
+
+            rows = int(values.pop(0))
+            self._rows = rows
+            table = {"Column": [], "Type": [], "Missing": [], "Unique": [], "Approx": [],
+                     "Mean": [], "Std": [], "Min": [], "Max": []}
+            for col in self.columns:
+                present, unique = values.pop(0), values.pop(0)
+                stats = [values.pop(0) for _ in range(4)] if col in numeric else [None] * 4
+                table["Column"].append(str(col))
+                table["Type"].append(self.types[col])
+                table["Missing"].append(rows - int(present))
+                table["Unique"].append(int(unique))
+                table["Approx"].append(True)
+                for name, value in zip(("Mean", "Std", "Min", "Max"), stats):
+                    table[name].append(float(value) if value is not None else np.nan)
+            # Small cardinalities are shown as exact counts, so count them exactly in one more pass.
+            small = [i for i, unique in enumerate(table["Unique"]) if unique <= EXACT_DISTINCT_THRESHOLD]
+            if small:
+                exact = ", ".join(f"count(DISTINCT {quote(self.columns[i])})" for i in small)
+                con = connect()
+                try:
+                    counts = con.execute(f"SELECT {exact} FROM {self.source}").fetchone()
+                finally:
+                    con.close()
+                for i, count in zip(small, counts):
+                    table["Unique"][i] = int(count)
+                    table["Approx"][i] = False
+            table = pd.DataFrame(table)
+            phase.set_shape(rows, len(self.columns))
+        return DataProfile(
+            rows=rows,
+            columns=len(self.columns),
+            missing_total=int(table["Missing"].sum()),
+            table=table,
+            seconds=time.perf_counter() - start,
+            approximate=bool(table["Approx"].any()),
+        )
+
+
+def open_dataset(path, digest=None):
+    """Shared OutOfCoreDataset for ``path``."""
+    dataset = _opened.get(path)
+    if dataset is None:
+        dataset = OutOfCoreDataset(path, digest)
+        _opened.put(path, dataset)
+    return dataset
+
+
+def cleaning_sql(dataset, steps):
+    """SELECT producing the cleaned dataset, plus the cleaned column names."""
+    names = {c: c for c in dataset.columns}
+    text = set(dataset.text_columns())
+    subset = None
+    for name, params in steps:
+        if name == "normalize_headers":
+            names = {c: normalize_header(n) for c, n in names.items()}
+        elif name == "drop_duplicates":
+            subset = params.get("subset")
+    trim = any(name == "strip_text" for name, _ in steps)
+
+    select = []
+    for col, new in names.items():
+        expr = quote(col)
+        if trim and col in text:
+            expr = f"trim({expr}, {WHITESPACE_SQL})"
+        select.append(f"{expr} AS {quote(new)}")
+    if not any(name == "drop_duplicates" for name, _ in steps):
+        return f"SELECT {', '.join(select)} FROM {{source}}", list(names.values())
+
+    keys = list(subset) if subset else list(names.values())
+    missing = [k for k in keys if k not in names.values()]
+    if missing:
+        raise KeyError(f"Duplicate key columns not found: {', '.join(map(str, missing))}")
+    # Number rows in file order so the first occurrence is kept and order is preserved:
+    # with insertion order preserved (see connect), the streaming row_number() follows the scan.
+    numbered = f"SELECT {', '.join(select)}, __row FROM (SELECT *, row_number() OVER () AS __row FROM {{source}})"
+    sql = (
+        f"SELECT * EXCLUDE (__row) FROM ({numbered}) "
+        f"QUALIFY row_number() OVER (PARTITION BY {', '.join(quote(k) for k in keys)} ORDER BY __row) = 1 "
+        f"ORDER BY __row"
+    )
+    return sql, list(names.values())
+
+
+def clean_out_of_core(dataset, steps, input_fingerprint, out_dir=None, progress=None):
+    """Run the cleaning steps as one streamed query into Parquet.
+
+    Returns ``(cleaned OutOfCoreDataset, [StepResult, ...])``. Output is kept
+    under the pipeline fingerprint, so re-running the same steps on the same
+    file is a cache hit.
+    """
+    pipeline = CleaningPipeline(steps, cache=None)
+    unsupported = [name for name, _ in pipeline.steps if name not in OUT_OF_CORE_STEPS]
+    if unsupported:
+        raise ValueError(f"Not available out of core: {', '.join(unsupported)}")
+    fingerprints = pipeline.fingerprints(input_fingerprint)
+    out_dir = out_dir or os.path.join(WORK_DIR, dataset.digest)
+    out_path = os.path.join(out_dir, f"cleaned-{fingerprints[-1] if fingerprints else input_fingerprint}.parquet")
+    cache_hit = os.path.exists(out_path)
+    rows_before = dataset.rows
+
+    strip_seconds = strip_affected = 0
+    copy_seconds = 0.0
+    if not cache_hit:
+        text = dataset.text_columns()
+        if text and any(name == "strip_text" for name, _ in pipeline.steps):
+            start = time.perf_counter()
+            changed = " OR ".join(f"{quote(c)} IS DISTINCT FROM trim({quote(c)}, {WHITESPACE_SQL})" for c in text)
+            strip_affected = int(dataset.query(f"SELECT count(*) AS n FROM {{source}} WHERE {changed}")["n"].iloc[0])
+            strip_seconds = time.perf_counter() - start
+
+        sql, _ = cleaning_sql(dataset, pipeline.steps)
+        os.makedirs(out_dir, exist_ok=True)
+        tmp = f"{out_path}.{os.getpid()}.tmp"
+        start = time.perf_counter()
+        with METRICS.phase("clean.out_of_core", rows_before, len(dataset.columns), memory=False):
+            con = connect()
+            try:
+                con.execute(f"COPY ({sql.replace('{source}', dataset.source)}) TO {literal(tmp)} (FORMAT parquet)")
+            finally:
+                con.close()
+        os.replace(tmp, out_path)
+        copy_seconds = time.perf_counter() - start
+
+    cleaned = open_dataset(out_path, dataset.digest)
+    rows_after = cleaned.rows
+    renamed = sum(1 for c in dataset.columns if normalize_header(c) != c)
+    results = []
+    for (name, params), fingerprint in zip(pipeline.steps, fingerprints):
+        if name == "normalize_headers":
+            seconds, affected, detail = 0.0, 0, f"{renamed} columns renamed"
+        elif name == "strip_text":
+            seconds, affected = strip_seconds, strip_affected
+            detail = f"{len(dataset.text_columns())} text columns trimmed"
+        else:
+            subset = params.get("subset")
+            scope = f" on {', '.join(map(str, subset))}" if subset else ""
+            seconds, affected = copy_seconds, rows_before - rows_after
+            detail = f"{affected} duplicate rows removed{scope}"
+        if cache_hit:
+            detail = "reused cleaned Parquet"
+        result = StepResult(name, CLEANING_STEPS[name].label, seconds, affected, detail,
+                            rows_before, rows_after if name == "drop_duplicates" else rows_before,
+                            cache_hit, fingerprint)
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    return cleaned, results
@@ -0,0 +1,126 @@
+"""Column-partitioned execution on a process pool.
+
+Profiling and text cleaning work column by column, so on wide frames they
+parallelize cleanly across cores. Columns are written once to an Arrow IPC
+file in shared memory (``/dev/shm`` where available) and each worker
+memory-maps it and reads only the columns of its partition, so no worker
+receives a pickled copy of the frame. Workers return compact per-column
+results (counts, integer codes) that are merged back in column order.
+
+Frames under ``PARALLEL_MIN_CELLS`` cells, single columns and
+``DATASAGE_PARALLEL_WORKERS=1`` run serially in-process, as do columns
+Arrow can't represent (mixed-type object columns).
+"""
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from .ingest import pyarrow_available
+from .metrics import METRICS
+
+PARALLEL_WORKERS = int(os.getenv("DATASAGE_PARALLEL_WORKERS", str(os.cpu_count() or 1)))
+PARALLEL_MIN_CELLS = int(os.getenv("DATASAGE_PARALLEL_MIN_CELLS", "2000000"))
+PARTITIONS_PER_WORKER = 4
+SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def set_workers(workers):
+    """Change the default worker count (e.g. 1 inside already-parallel batch workers)."""
+    global PARALLEL_WORKERS
+    PARALLEL_WORKERS = max(int(workers), 1)
+
+
+def get_pool(workers):
+    """Process-wide pool for ``workers`` processes, started on first use.
+
+    Pools are kept per worker count and never shut down here, so a caller
+    asking for a different size can't pull the pool out from under another
+    session's running tasks. Spawned workers never inherit app threads.
+    """
+    with _pool_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        return pool
+
+
+def partition(positions, parts):
+    """Split column positions into up to ``parts`` contiguous, near-equal runs."""
+    parts = max(min(parts, len(positions)), 1)
+    size, extra = divmod(len(positions), parts)
+    runs, start = [], 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        runs.append(positions[start:stop])
+        start = stop
+    return [run for run in runs if run]
+
+
+def export_columns(df, positions):
+    """Write columns to a shared-memory Arrow file; returns ``(path, exported positions)``."""
+    import pyarrow as pa
+
+    arrays, names = [], []
+    for pos in positions:
+        try:
+            arrays.append(pa.array(df.iloc[:, pos], from_pandas=True))
+        except (pa.ArrowException, TypeError, ValueError):
+            continue
+        names.append(str(pos))
+    table = pa.table(arrays, names=names)
+    fd, path = tempfile.mkstemp(prefix="datasage-", suffix=".arrow", dir=SHARED_DIR)
+    os.close(fd)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path, [int(n) for n in names]
+
+
+def run_partition(path, positions, func, kwargs):
+    """Worker side: memory-map the shared file and apply ``func`` to each column."""
+    import pyarrow as pa
+
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    results = {}
+    for pos in positions:
+        series = table.column(str(pos)).to_pandas()
+        results[pos] = func(series, **kwargs)
+    return results
+
+
+def map_columns(func, df, columns=None, workers=None, min_cells=None, **kwargs):
+    """``[func(df[col], **kwargs) for col in columns]``, on the process pool for large frames.
+
+    ``func`` must be a module-level function so workers can import it.
+    Results are returned in the order of ``columns`` (default: all columns).
+    """
+    workers = workers or PARALLEL_WORKERS
+    min_cells = PARALLEL_MIN_CELLS if min_cells is None else min_cells
+    positions = list(range(df.shape[1])) if columns is None else [df.columns.get_loc(c) for c in columns]
+    serial = workers <= 1 or len(positions) < 2 or len(df) * len(positions) < min_cells
+    if serial or not pyarrow_available():
+        return [func(df.iloc[:, pos], **kwargs) for pos in positions]
+
+    results = {}
+    with METRICS.phase("parallel.columns", len(df), len(positions), memory=False):
+        path, exported = export_columns(df, positions)
+        try:
+            pool = get_pool(workers)
+            futures = [
+                pool.submit(run_partition, path, run, func, kwargs)
+                for run in partition(exported, workers * PARTITIONS_PER_WORKER)
+            ]
+            shared = set(exported)
+            for pos in (p for p in positions if p not in shared):
+                results[pos] = func(df.iloc[:, pos], **kwargs)
+            for future in futures:
+                results.update(future.result())
+        finally:
+            os.remove(path)
+    METRICS.incr("parallel_columns", len(positions))
+    return [results[pos] for pos in positions]
+
@@ -0,0 +1,71 @@
+"""Server-side windowing for data previews.
+
+Sending a whole frame (and a column config per column) to the browser on
+every rerun dominates render time for very wide or very long datasets. The
+preview instead slices one page of rows and one window of columns here, so
+only the visible cells are serialized. Besides DataFrames, any source with
+``shape`` and ``slice(row_start, row_stop, column_start, column_stop)`` (an
+out-of-core dataset) can be previewed.
+"""
+import os
+from dataclasses import dataclass
+
+import pandas as pd
+
+PAGE_SIZES = (10, 25, 100)
+COLUMN_WINDOW = int(os.getenv("DATASAGE_PREVIEW_COLUMNS", "20"))
+
+
+@dataclass
+class PreviewWindow:
+    frame: pd.DataFrame
+    page: int
+    pages: int
+    column_page: int
+    column_pages: int
+    row_start: int
+    row_stop: int
+    column_start: int
+    column_stop: int
+    total_rows: int
+    total_columns: int
+
+    @property
+    def caption(self):
+        rows = f"rows {self.row_start + 1:,}–{self.row_stop:,} of {self.total_rows:,}" if self.total_rows else "no rows"
+        columns = f"columns {self.column_start + 1:,}–{self.column_stop:,} of {self.total_columns:,}" if self.total_columns else "no columns"
+        return f"{rows} · {columns}"
+
+
+def page_count(total, size):
+    return max((total + size - 1) // size, 1)
+
+
+def preview_window(source, page=1, page_size=PAGE_SIZES[0], column_page=1, column_window=COLUMN_WINDOW):
+    """Slice the visible rows and columns; pages are 1-based and clamped to range."""
+    total_rows, total_columns = source.shape
+    pages = page_count(total_rows, page_size)
+    column_pages = page_count(total_columns, column_window)
+    page = min(max(int(page), 1), pages)
+    column_page = min(max(int(column_page), 1), column_pages)
+
+    row_start = (page - 1) * page_size
+    row_stop = min(row_start + page_size, total_rows)
+    column_start = (column_page - 1) * column_window
+    column_stop = min(column_start + column_window, total_columns)
+    return PreviewWindow(
+        frame=(
+            source.iloc[row_start:row_stop, column_start:column_stop] if isinstance(source, pd.DataFrame)
+            else source.slice(row_start, row_stop, column_start, column_stop)
+        ),
+        page=page,
+        pages=pages,
+        column_page=column_page,
+        column_pages=column_pages,
+        row_start=row_start,
+        row_stop=row_stop,
+        column_start=column_start,
+        column_stop=column_stop,
+        total_rows=total_rows,
+        total_columns=total_columns,
+    )
@@ -0,0 +1,226 @@
+"""Progressive, sampling-based profiling with confidence intervals.
+
+A full profile of a multi-GB frame takes long enough that users stare at a
+spinner. Here the rows are shuffled once and profiled a block at a time, each
+block a random sample of rows; after each block the merged ProfileState of
+everything scanned so far is published as an approximate profile with 95%
+confidence intervals, so the quality assessment renders after the first blocks
+and tightens as the scan proceeds. The scan can be stopped once the intervals
+are narrow enough. Random rows rather than contiguous slices keep sorted files
+from needing a near-full scan before the intervals narrow.
+
+Missing rates and means are ratio estimates over the scanned blocks. Their
+intervals use the variance between blocks with a finite-population correction
+and Student t quantiles. Distinct counts are given as a range: the
+values seen so far, up to that plus the rate of new values in the latest block
+times the rows not yet scanned. Min and max are the extremes seen so far.
+"""
+import math
+import os
+import time
+
+import numpy as np
+
+from .metrics import METRICS
+from .profile import PROFILE_CACHE, DataProfile, profile_cache_key, profile_state
+
+PROGRESSIVE_MIN_ROWS = int(os.getenv("DATASAGE_PROGRESSIVE_ROWS", "1000000"))
+PROGRESSIVE_BLOCK_ROWS = int(os.getenv("DATASAGE_PROGRESSIVE_BLOCK_ROWS", "50000"))
+PROGRESSIVE_MAX_BLOCKS = 200
+FIRST_BLOCKS = 2
+MIN_STOP_BLOCKS = 5
+KEY_DISTINCT_RATIO = 0.95
+# Two-sided 95% t quantiles for 1..30 degrees of freedom (blocks - 1).
+T_95 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+Z_95 = 1.96
+
+
+def ratio_interval(y, m, fpc):
+    """Ratio estimate ``sum(y) / sum(m)`` over blocks (rows of ``y``/``m``) and its 95% half-width."""
+    k = len(y)
+    total = m.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        estimate = y.sum(axis=0) / total
+        if k < 2:
+            return estimate, np.full(estimate.shape, np.nan)
+        residual = y - estimate * m
+        variance = fpc * (residual ** 2).sum(axis=0) / (k - 1) / k / (total / k) ** 2
+    return estimate, (T_95[k - 2] if k - 1 <= len(T_95) else Z_95) * np.sqrt(variance)
+
+
+class ProgressiveProfile:
+    """Running profile of the blocks scanned so far."""
+
+    def __init__(self, total_rows):
+        self.total_rows = int(total_rows)
+        self.state = None
+        self.blocks = 0
+        self._rows, self._missing, self._count, self._sum = [], [], [], []
+        self._discovery = None
+
+    @property
+    def rows(self):
+        return self.state.rows if self.state is not None else 0
+
+    @property
+    def complete(self):
+        return self.rows >= self.total_rows
+
+    @property
+    def fpc(self):
+        return max(1.0 - self.rows / self.total_rows, 0.0) if self.total_rows else 0.0
+
+    def add(self, state):
+        """Merge the ProfileState of one more block."""
+        before = self.distinct() if self.state is not None else None
+        self.state = state if self.state is None else self.state.merge(state)
+        self.blocks += 1
+        self._rows.append(state.rows)
+        self._missing.append(state.missing)
+        self._count.append(state.count)
+        self._sum.append(np.nan_to_num(state.mean) * state.count)
+        if before is not None and state.rows:
+            self._discovery = np.maximum(self.distinct() - before, 0) / state.rows
+
+    def distinct(self):
+        return np.array([len(e) if e is not None else s.count() for e, s in self.state.distinct])
+
+    def missing_rate(self):
+        rows = np.repeat(np.array(self._rows, dtype=float)[:, None], len(self.state.columns), axis=1)
+        return ratio_interval(np.array(self._missing, dtype=float), rows, self.fpc)
+
+    def mean(self):
+        return ratio_interval(np.array(self._sum), np.array(self._count, dtype=float), self.fpc)
+
+    def distinct_range(self):
+        seen = self.distinct()
+        if self.complete or self._discovery is None:
+            return seen, seen
+        upper = seen + np.ceil(self._discovery * (self.total_rows - self.rows)).astype(np.int64)
+        return seen, np.minimum(upper, seen + self.total_rows - self.rows)
+
+    def std(self):
+        state = self.state
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(state.count > 1, np.sqrt(state.m2 / np.maximum(state.count - 1, 1)), np.nan)
+
+    def key_like(self):
+        """Integer columns whose values are (almost) all distinct, e.g. IDs; their means say nothing."""
+        integer = np.array(["int" in t.lower() for t in self.state.types])
+        return integer & (self.distinct() >= KEY_DISTINCT_RATIO * np.maximum(self.state.count, 1))
+
+    def within(self, precision):
+        """True once every missing-rate interval is within ``precision`` and every mean within ``precision`` standard deviations.
+
+        Missing rates are compared absolutely; means relative to the column's
+        spread, which works for means near zero. Key-like columns are left
+        out of the mean criterion.
+        """
+        if self.blocks < MIN_STOP_BLOCKS:
+            return self.complete
+        _, missing_half = self.missing_rate()
+        _, mean_half = self.mean()
+        std = self.std()
+        checked = np.isfinite(mean_half) & np.isfinite(std) & ~self.key_like()
+        return bool(np.all(np.nan_to_num(missing_half) <= precision)
+                    and np.all(mean_half[checked] <= precision * std[checked]))
+
+    def to_profile(self, seconds=0.0, stopped=False):
+        """DataProfile scaled to ``total_rows``, with ± columns for the intervals."""
+        profile = self.state.to_profile(seconds)
+        table = profile.table
+        missing, missing_half = self.missing_rate()
+        mean, mean_half = self.mean()
+        low, high = self.distinct_range()
+        exact = self.complete
+        table["Missing"] = np.rint(np.nan_to_num(missing) * self.total_rows).astype(np.int64)
+        table.insert(table.columns.get_loc("Missing") + 1, "Missing ±",
+                     0 if exact else np.rint(missing_half * self.total_rows))
+        table["Unique"] = low
+        table.insert(table.columns.get_loc("Unique") + 1, "Unique ≤", high)
+        table["Approx"] = table["Approx"] | (not exact)
+        table["Mean"] = np.where(self.state.count > 0, mean, np.nan)
+        table.insert(table.columns.get_loc("Mean") + 1, "Mean ±", np.where(exact, 0.0, mean_half))
+        return DataProfile(
+            rows=self.total_rows,
+            columns=profile.columns,
+            missing_total=int(table["Missing"].sum()),
+            table=table,
+            seconds=seconds,
+            approximate=not exact,
+            meta={
+                "scanned_rows": self.rows,
+                "fraction": self.rows / self.total_rows if self.total_rows else 1.0,
+                "blocks": self.blocks,
+                "stopped": stopped,
+            },
+        )
+
+
+def block_size(rows, block_rows=PROGRESSIVE_BLOCK_ROWS, max_blocks=PROGRESSIVE_MAX_BLOCKS):
+    return max(block_rows, math.ceil(rows / max_blocks), 1)
+
+
+def profile_progressively(df, publish=None, stop=None, precision=None, total_rows=None,
+                          block_rows=None, seed=0):
+    """Profile ``df`` in blocks of random rows and return the last DataProfile.
+
+    ``publish(profile)`` is called after the first ``FIRST_BLOCKS`` blocks and
+    then after every block. The scan ends early when ``stop()`` returns True or
+    when every interval is within ``precision``. Pass ``total_rows`` when
+    ``df`` is itself a random sample of a larger dataset.
+    """
+    start = time.perf_counter()
+    if not len(df):
+        return profile_state(df).to_profile()
+    size = block_rows or block_size(len(df))
+    # Each block is a random sample of rows (sorted for locality), so sorted files don't widen the intervals
+    rows = np.random.default_rng(seed).permutation(len(df))
+    order = range(0, len(df), size)
+    progress = ProgressiveProfile(total_rows or len(df))
+    profile = None
+    with METRICS.phase("profile.progressive", *df.shape) as record:
+        for i, block in enumerate(order):
+            progress.add(profile_state(df.take(np.sort(rows[block:block + size]))))
+            if i + 1 < min(FIRST_BLOCKS, len(order)) and i + 1 < len(order):
+                continue
+            last = i + 1 == len(order)
+            stopped = not last and ((stop is not None and stop()) or
+                                    (precision is not None and progress.within(precision)))
+            profile = progress.to_profile(time.perf_counter() - start, stopped=stopped)
+            if publish is not None:
+                publish(profile)
+            if stopped:
+                break
+        record.set_shape(progress.rows, df.shape[1])
+    return profile
+
+
+def cached_profile(key, precision=None, cache=PROFILE_CACHE):
+    """The complete profile cached for ``key``, else an estimate cached at ``precision``, else None."""
+    profile = cache.get(profile_cache_key(key))
+    if profile is None and precision is not None:
+        profile = cache.get(profile_cache_key(key, precision=precision))
+    return profile
+
+
+def cache_profile(key, profile, precision=None, cache=PROFILE_CACHE):
+    """Share a finished profile with every session: complete scans under ``key``
+    (where ``profile_cached`` finds them too), early stops under their ``precision``."""
+    if profile.meta.get("stopped"):
+        cache.put(profile_cache_key(key, precision=precision), profile)
+    else:
+        cache.put(profile_cache_key(key), profile)
+
+
+def interval_caption(profile):
+    meta = profile.meta
+    if not profile.approximate or "scanned_rows" not in meta:
+        return ""
+    state = "stopped" if meta.get("stopped") else "refining"
+    return (f"Estimated from {meta['scanned_rows']:,} of {profile.rows:,} rows ({meta['fraction']:.0%}, "
+            f"{state}) · ± columns are 95% confidence intervals; Unique is the count seen so far, "
+            f"Unique ≤ its projected upper bound")
+
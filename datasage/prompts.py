@@ -0,0 +1,100 @@
+"""Prompt templates for the Gemini analysis phase.
+
+Bump ``RISK_PROMPT_VERSION`` whenever the template wording changes: it is part
+of the response cache key, so cached answers to an old template are not reused.
+"""
+
+RISK_PROMPT_VERSION = "risk-v2"
+
+RISK_PROMPT = """
+Analyze this business data and identify ONE significant business risk.
+Focus on data quality, operational issues, or strategic risks.
+
+Data Digest (per-column statistics over all rows, then a stratified sample):
+{data_sample}
+
+Provide your response in this format:
+
+**Risk:** [Concise risk name]
+
+**Explanation:** [Brief explanation focusing on data quality issues like:
+- sales_amount containing non-numeric values or errors
+- region having inconsistent casing or missing values
+- customer_feedback having missing values]
+
+**Impact:** [Business impact - how this affects decision making]
+
+**Recommendation:** [Suggested action steps]
+
+Keep the response professional and concise.
+"""
+
+
+def build_risk_prompt(data_sample):
+    return RISK_PROMPT.format(data_sample=data_sample)
+
+
+DEEP_PROMPT_VERSION = "deep-v1"
+
+GROUP_RISK_PROMPT = """
+Analyze this slice of a business dataset (columns: {columns}) and identify the
+most significant business risk visible in these columns.
+Focus on data quality, operational issues, or strategic risks.
+
+Data Digest (per-column statistics over all rows, then a stratified sample):
+{data_sample}
+
+Provide your response in exactly this format:
+
+**Risk:** [Concise risk name]
+
+**Severity:** [Whole number from 1 (minor) to 10 (critical)]
+
+**Explanation:** [Brief explanation grounded in the statistics above]
+
+**Impact:** [Business impact - how this affects decision making]
+
+**Recommendation:** [Suggested action steps]
+
+Keep the response professional and concise.
+"""
+
+
+def build_group_prompt(columns, data_sample):
+    return GROUP_RISK_PROMPT.format(columns=", ".join(map(str, columns)), data_sample=data_sample)
+
+
+CHANGE_PROMPT_VERSION = "change-v1"
+PREVIOUS_INSIGHT_CHARS = 2000
+
+CHANGE_PROMPT = """
+A new version of a business dataset that was analyzed before has been uploaded.
+Identify the ONE most significant business risk introduced or changed by the
+new data. Focus on data quality, operational issues, or strategic risks.
+
+Previous analysis:
+{previous_insight}
+
+What changed (row counts and per-column shifts since the previous version, then
+statistics and a sample of the new or changed rows):
+{data_sample}
+
+Provide your response in this format:
+
+**Risk:** [Concise risk name]
+
+**What changed:** [The change in the data behind this risk]
+
+**Impact:** [Business impact - how this affects decision making]
+
+**Recommendation:** [Suggested action steps]
+
+Keep the response professional and concise.
+"""
+
+
+def build_change_prompt(data_sample, previous_insight=None, insight_chars=PREVIOUS_INSIGHT_CHARS):
+    previous_insight = (previous_insight or "").strip()
+    if len(previous_insight) > insight_chars:
+        previous_insight = previous_insight[:insight_chars].rstrip() + " …"
+    return CHANGE_PROMPT.format(data_sample=data_sample, previous_insight=previous_insight or "(not available)")
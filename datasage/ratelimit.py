@@ -0,0 +1,163 @@
+"""Process-wide throttling primitives for outbound API calls.
+
+``TokenBucket`` spaces requests to a quota shared by every session in the
+process; ``Coalescer`` lets concurrent identical calls share one in-flight
+request; ``backoff_delay`` is capped exponential backoff with full jitter.
+"""
+import asyncio
+import random
+import threading
+import time
+
+from .metrics import METRICS
+
+
+class TokenBucket:
+    """``rate`` tokens per second, bursting up to ``capacity``.
+
+    Callers reserve tokens in arrival order and sleep outside the lock, so a
+    burst of sessions is spread over time instead of all retrying at once.
+    ``pause()`` blocks every caller, e.g. after the server reported a quota error.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost=1):
+        """Take ``cost`` tokens now and return how long the caller must wait for them."""
+        cost = min(float(cost), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= cost
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def acquire(self, cost=1, name=None):
+        """Block until ``cost`` tokens are available; returns the seconds waited."""
+        wait = self.reserve(cost)
+        if wait > 0:
+            time.sleep(wait)
+            self._record(wait, name)
+        return wait
+
+    async def acquire_async(self, cost=1, name=None):
+        """``acquire`` for event loops: the wait is an ``asyncio.sleep``, so it can be cancelled."""
+        wait = self.reserve(cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+            self._record(wait, name)
+        return wait
+
+    @staticmethod
+    def _record(wait, name):
+        if name:
+            METRICS.record(f"{name}_wait", wait)
+            METRICS.incr(f"{name}_throttled")
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    @property
+    def available(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+class _Call:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.text = ""
+        self.done = False
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+    def publish(self, text):
+        with self.cond:
+            self.text = text
+            self.cond.notify_all()
+
+    def finish(self, result=None, error=None):
+        with self.cond:
+            self.result, self.error, self.done = result, error, True
+            self.cond.notify_all()
+
+    def wait(self, on_text=None):
+        seen = ""
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.done or self.text != seen)
+                text, done = self.text, self.done
+            if on_text is not None and text != seen:
+                on_text(text)
+            seen = text
+            if done:
+                break
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class Coalescer:
+    """Run one call per key at a time; concurrent callers with the same key wait for it.
+
+    The leader's ``func(publish)`` may call ``publish(text_so_far)`` so waiting
+    callers can follow a streamed response as it arrives.
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, func, on_text=None):
+        """Returns ``(result, coalesced)``; errors from the shared call reach every caller."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+        if not leader:
+            if self.name:
+                METRICS.incr(f"{self.name}_coalesced")
+            return call.wait(on_text), True
+
+        def publish(text):
+            call.publish(text)
+            if on_text is not None:
+                on_text(text)
+
+        try:
+            result = func(publish)
+        except BaseException as e:
+            call.finish(error=e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+        call.finish(result)
+        return result, False
+
+    @property
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff for retry number ``attempt`` (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
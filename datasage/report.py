@@ -0,0 +1,55 @@
+"""Stitch report (Executive Strategic Brief) text layout, shared by the app and the batch CLI."""
+import hashlib
+from datetime import datetime
+
+from .metrics import METRICS
+
+PROJECT_ID = "452177523793"
+
+RECOMMENDED_ACTIONS = [
+    "Immediate data validation for Sales_Amount column",
+    "Regional data standardization protocol implementation",
+    "Weekly automated data quality audits",
+    "Stakeholder review of BI reporting accuracy",
+    "Data governance framework establishment",
+]
+
+RULE = "=" * 80
+
+
+def make_report_id(file_name, now=None):
+    now = now or datetime.now()
+    return hashlib.md5(f"{file_name}{now}".encode()).hexdigest()[:12].upper()
+
+
+def build_report_text(report_id, file_name, file_size_kb, model, insight, now=None):
+    """Plain-text Executive Strategic Brief, as offered for download."""
+    with METRICS.phase("report", memory=False):
+        return _build_report_text(report_id, file_name, file_size_kb, model, insight, now)
+
+
+def _build_report_text(report_id, file_name, file_size_kb, model, insight, now):
+    now = now or datetime.now()
+    actions = "\n".join(f"{i}. {action}" for i, action in enumerate(RECOMMENDED_ACTIONS, 1))
+    return f"""EXECUTIVE STRATEGIC BRIEF
+{RULE}
+Report ID: A24-{report_id}
+Generated: {now.strftime("%d-%m-%Y")}
+Project ID: {PROJECT_ID}
+Source File: {file_name}
+File Size: {file_size_kb:.2f} KB
+Analysis Model: {model}
+
+CRITICAL RISK IDENTIFIED
+{RULE}
+{insight}
+
+RECOMMENDED ACTIONS
+{RULE}
+{actions}
+
+{RULE}
+DataSage Autopilot v1.0 | Google Agentic Stack
+Generated at: {now.strftime('%Y-%m-%d %H:%M:%S')}
+{RULE}
+"""
@@ -0,0 +1,149 @@
+"""On-disk cache of Gemini analysis responses.
+
+Responses are stored in a local SQLite database keyed by the resolved model
+name, the prompt template version and a fingerprint of the data sent, so
+re-running the analysis on the same cleaned file is answered without a network
+call or quota use. Entries expire after ``ttl`` seconds, and the least recently
+used entries are evicted once the stored text exceeds ``max_bytes``.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from .metrics import METRICS
+from .storage import WORK_DIR
+
+RESPONSE_CACHE_PATH = os.path.join(WORK_DIR, "responses.sqlite")
+RESPONSE_TTL_SECONDS = int(os.getenv("DATASAGE_RESPONSE_TTL", str(7 * 24 * 3600)))
+RESPONSE_CACHE_MB = int(os.getenv("DATASAGE_RESPONSE_CACHE_MB", "50"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    data_fingerprint TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+
+
+def data_fingerprint(data):
+    """Fingerprint of the data text (or bytes) embedded in a prompt."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+@dataclass
+class CachedResponse:
+    text: str
+    model: str
+    created_at: float
+
+
+class ResponseCache:
+    def __init__(self, path=RESPONSE_CACHE_PATH, ttl=RESPONSE_TTL_SECONDS,
+                 max_bytes=RESPONSE_CACHE_MB * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def key(model, prompt_version, fingerprint):
+        return hashlib.sha256(f"{model}|{prompt_version}|{fingerprint}".encode()).hexdigest()
+
+    def get(self, model, prompt_version, fingerprint):
+        key = self.key(model, prompt_version, fingerprint)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                METRICS.incr("response_cache_misses")
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            METRICS.incr("response_cache_hits")
+            return CachedResponse(row[0], model, row[1])
+
+    def put(self, model, prompt_version, fingerprint, response):
+        key = self.key(model, prompt_version, fingerprint)
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, prompt_version, fingerprint, response, size, now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide cache instance on the default path."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ResponseCache()
+        return _shared
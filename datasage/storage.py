@@ -0,0 +1,76 @@
+"""Parquet persistence for parsed and cleaned datasets.
+
+Frames are stored under ``<work_dir>/<content digest>/<name>.parquet`` so a
+dataset that was parsed or cleaned once can be reopened by any process with a
+columnar read instead of a full CSV re-parse.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import pandas as pd
+
+WORK_DIR = os.getenv("DATASAGE_WORK_DIR", ".datasage")
+
+
+class ParquetStore:
+    def __init__(self, root=WORK_DIR):
+        self.root = root
+
+    @staticmethod
+    def dataset_name(kind, mode="standard", options=None):
+        """File stem for a dataset variant, e.g. ``raw-arrow`` or ``raw-standard-1a2b3c4d``."""
+        name = f"{kind}-{mode}"
+        if options:
+            blob = json.dumps(sorted((k, repr(v)) for k, v in options.items()))
+            name += "-" + hashlib.blake2b(blob.encode(), digest_size=4).hexdigest()
+        return name
+
+    def path(self, digest, name):
+        return os.path.join(self.root, digest, f"{name}.parquet")
+
+    def meta_path(self, digest, name):
+        return os.path.join(self.root, digest, f"{name}.json")
+
+    def exists(self, digest, name):
+        return os.path.exists(self.path(digest, name))
+
+    def save(self, digest, name, df, meta=None):
+        """Write ``df`` atomically. Returns False if the frame can't be stored as Parquet."""
+        from .ingest import require_pyarrow
+
+        require_pyarrow()
+        path = self.path(digest, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp, engine="pyarrow", index=False)
+            os.replace(tmp, path)
+        except (TypeError, ValueError, NotImplementedError, OSError):
+            # Mixed-type object columns can't be written; the dataset simply stays unpersisted.
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return False
+        with open(self.meta_path(digest, name), "w") as fh:
+            json.dump(meta or {}, fh)
+        return True
+
+    def load(self, digest, name, arrow=False):
+        """Read a stored frame, or None if it was never persisted."""
+        path = self.path(digest, name)
+        if not os.path.exists(path):
+            return None
+        if arrow:
+            return pd.read_parquet(path, engine="pyarrow", dtype_backend="pyarrow")
+        return pd.read_parquet(path, engine="pyarrow")
+
+    def load_meta(self, digest, name):
+        try:
+            with open(self.meta_path(digest, name)) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def remove(self, digest):
+        shutil.rmtree(os.path.join(self.root, digest), ignore_errors=True)
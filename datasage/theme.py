@@ -0,0 +1,135 @@
+"""Custom CSS for the Streamlit UI, kept out of the app script."""
+
+APP_CSS = """
+<style>
+    /* Main background */
+    .main { 
+        background-color: #f8f9fa; 
+        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+    }
+    
+    /* Headers */
+    h1 {
+        color: #1a73e8;
+        font-weight: 600;
+        border-bottom: 3px solid #1a73e8;
+        padding-bottom: 10px;
+        margin-bottom: 30px;
+    }
+    
+    h2 {
+        color: #1a73e8;
+        font-weight: 500;
+        margin-top: 25px;
+        margin-bottom: 15px;
+    }
+    
+    h3 {
+        color: #5f6368;
+        font-weight: 500;
+        margin-top: 20px;
+        margin-bottom: 10px;
+    }
+    
+    /* Buttons */
+    .stButton>button {
+        width: 100%; 
+        border-radius: 6px; 
+        height: 45px;
+        background-color: #1a73e8; 
+        color: white; 
+        font-weight: 500; 
+        border: none;
+        font-size: 14px;
+        transition: all 0.2s ease;
+        text-transform: uppercase;
+        letter-spacing: 0.5px;
+    }
+    
+    .stButton>button:hover {
+        background-color: #0d62d9;
+        box-shadow: 0 2px 6px rgba(26, 115, 232, 0.3);
+    }
+    
+    /* Report box - matches Executive Strategic Brief from images */
+    .report-box {
+        border: 2px solid #1a73e8; 
+        padding: 25px; 
+        border-radius: 10px;
+        background: white;
+        box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+        margin-top: 20px;
+        font-size: 14px;
+    }
+    
+    /* Status boxes for agent progress */
+    .status-box {
+        background-color: #e8f0fe;
+        border-left: 4px solid #1a73e8;
+        padding: 12px 15px;
+        border-radius: 4px;
+        margin: 8px 0;
+        font-size: 14px;
+    }
+    
+    /* Sidebar styling */
+    .sidebar .sidebar-content {
+        background-color: white;
+        border-right: 1px solid #dadce0;
+    }
+    
+    /* Metrics styling */
+    .metric-container {
+        background: white;
+        border: 1px solid #dadce0;
+        border-radius: 8px;
+        padding: 15px;
+        margin: 10px 0;
+    }
+    
+    /* Upload area styling */
+    .upload-box {
+        border: 2px dashed #dadce0;
+        border-radius: 10px;
+        padding: 40px;
+        text-align: center;
+        background: white;
+        color: #5f6368;
+        margin: 20px 0;
+    }
+    
+    /* Data preview table */
+    .dataframe {
+        font-size: 13px;
+    }
+    
+    /* Alert boxes */
+    .stAlert {
+        border-radius: 8px;
+        padding: 15px;
+    }
+    
+    /* Custom columns for metrics */
+    .metric-card {
+        background: white;
+        border: 1px solid #e0e0e0;
+        border-radius: 8px;
+        padding: 15px;
+        text-align: center;
+        margin: 5px;
+    }
+    
+    .metric-value {
+        font-size: 24px;
+        font-weight: 600;
+        color: #1a73e8;
+    }
+    
+    .metric-label {
+        font-size: 12px;
+        color: #5f6368;
+        text-transform: uppercase;
+        letter-spacing: 0.5px;
+    }
+</style>
+"""
@@ -0,0 +1,475 @@
+"""Incremental re-processing of re-uploaded datasets.
+
+Teams upload the same export every day with a few percent of rows added or
+changed. A re-upload is recognized by its lineage, the file name plus the raw
+schema (column names and dtypes), and compared with the last processed
+version by 64-bit row hashes:
+
+- profiling merges the stored profile state with a profile of the appended
+  rows when the new file extends the old one;
+- cleaning reuses the cleaned row of every raw row seen before, runs the
+  row-local steps on the new rows only and de-duplicates from stored row
+  hashes, which gives the same output as cleaning the whole file;
+- analysis can send Gemini what changed plus the previous insight instead of
+  the whole file.
+
+Version state lives under ``<work_dir>/versions/<lineage>/<digest>/`` (row
+hashes as ``.npy``, the profile state as ``.npz`` and the cleaned frame as an
+Arrow IPC file that is memory-mapped on load), so a re-upload is recognized
+across restarts. Per lineage only the two latest versions and the latest
+cleaned version are kept.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .cleaning import CLEANING_STEPS, CleaningPipeline, StepResult
+from .dedupe import duplicate_mask, row_hashes
+from .digest import DataDigest, build_digest, estimate_tokens
+from .ingest import pyarrow_available
+from .metrics import METRICS
+from .profile import ProfileState, profile_state
+from .storage import WORK_DIR
+
+VERSION_LINEAGES = int(os.getenv("DATASAGE_VERSION_LINEAGES", "16"))
+MEAN_SHIFT = 0.01
+MISSING_SHIFT = 0.001
+
+
+def lineage_key(file_name, df):
+    """Identity of a recurring upload: file name plus column names and dtypes."""
+    blob = json.dumps([
+        os.path.basename(str(file_name)).strip().lower(),
+        [str(c) for c in df.columns],
+        [str(t) for t in df.dtypes],
+    ])
+    return hashlib.blake2b(blob.encode(), digest_size=12).hexdigest()
+
+
+@dataclass
+class RowDelta:
+    rows: int
+    previous_rows: int
+    added: np.ndarray
+    removed: int
+    appended: bool
+
+    @property
+    def unchanged(self):
+        return self.rows - len(self.added)
+
+    @property
+    def summary(self):
+        return (f"{self.previous_rows:,} → {self.rows:,} rows "
+                f"({len(self.added):,} new or changed, {self.removed:,} removed or changed)")
+
+
+def row_delta(hashes, previous_hashes):
+    """Compare row hashes of two versions.
+
+    ``added`` are positions of rows whose hash the previous version lacks; a
+    changed row counts as one removed and one added row. ``appended`` is True
+    when the new version is the previous one plus rows at the end.
+    """
+    n = len(previous_hashes)
+    return RowDelta(
+        rows=len(hashes),
+        previous_rows=n,
+        added=np.flatnonzero(~np.isin(hashes, previous_hashes)),
+        removed=int((~np.isin(previous_hashes, hashes)).sum()),
+        appended=len(hashes) >= n and np.array_equal(hashes[:n], previous_hashes),
+    )
+
+
+@dataclass
+class DatasetVersion:
+    lineage: str
+    digest: str
+    file_name: str
+    rows: int
+    hashes: np.ndarray
+    created_at: float
+    profile: ProfileState = None
+    steps: str = None
+    cleaned: pd.DataFrame = None
+    cleaned_sources: np.ndarray = None
+    cleaned_keys: np.ndarray = None
+    insight: str = None
+    previous_digest: str = None
+    delta: RowDelta = None
+    summary: object = None
+
+    @property
+    def uploaded(self):
+        return datetime.fromtimestamp(self.created_at).strftime("%d-%m-%Y %H:%M")
+
+
+def pipeline_signature(pipeline):
+    """Stable id of a pipeline's steps, versions and parameters."""
+    return pipeline.fingerprints("")[-1] if pipeline.steps else ""
+
+
+def incremental_plan(pipeline):
+    """``(row_local_steps, dedupe_params)`` if the pipeline can run on new rows only, else None.
+
+    Every step must be row-local except an optional final ``drop_duplicates``.
+    """
+    steps = list(pipeline.steps)
+    dedupe = None
+    if steps and steps[-1][0] == "drop_duplicates":
+        dedupe = steps.pop()[1]
+    if any(not CLEANING_STEPS[name].row_local for name, _ in steps):
+        return None
+    return steps, dedupe
+
+
+class VersionStore:
+    """Recent versions per lineage, on disk and in memory."""
+
+    def __init__(self, root=os.path.join(WORK_DIR, "versions"), max_lineages=VERSION_LINEAGES):
+        self.root = root
+        self.max_lineages = max_lineages
+        self._lineages = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _dir(self, lineage, digest=None):
+        return os.path.join(self.root, lineage, digest) if digest else os.path.join(self.root, lineage)
+
+    def _versions(self, lineage):
+        """Versions of a lineage (loaded from disk on first access), most recent last."""
+        versions = self._lineages.get(lineage)
+        if versions is None:
+            versions = {}
+            base = self._dir(lineage)
+            for digest in os.listdir(base) if os.path.isdir(base) else ():
+                version = self._read(lineage, digest)
+                if version is not None:
+                    versions[digest] = version
+            self._lineages[lineage] = versions
+        self._lineages.move_to_end(lineage)
+        while len(self._lineages) > self.max_lineages:
+            self._lineages.popitem(last=False)
+        return versions
+
+    def get(self, lineage, digest):
+        with self._lock:
+            return self._versions(lineage).get(digest)
+
+    def previous(self, lineage, digest, cleaned=False):
+        """Most recent version of ``lineage`` other than ``digest`` (with a cleaned frame if asked)."""
+        with self._lock:
+            candidates = [
+                v for v in self._versions(lineage).values()
+                if v.digest != digest and (not cleaned or v.cleaned is not None)
+            ]
+            return max(candidates, key=lambda v: v.created_at, default=None)
+
+    def register(self, lineage, digest, file_name, hashes, profile):
+        with self._lock:
+            version = DatasetVersion(lineage, digest, file_name, len(hashes), hashes, time.time(), profile)
+            path = self._dir(lineage, digest)
+            os.makedirs(path, exist_ok=True)
+            np.save(os.path.join(path, "hashes.npy"), hashes)
+            if profile is not None:
+                profile.save(os.path.join(path, "profile.npz"))
+            self._write_meta(version)
+            self._versions(lineage)[digest] = version
+            self._prune(lineage)
+            return version
+
+    def save_cleaned(self, version, pipeline, cleaned, keys=None):
+        """Keep the cleaned frame with the raw row hash and dedupe key of each of its rows."""
+        if not pyarrow_available():
+            return False
+        import pyarrow as pa
+
+        plan = incremental_plan(pipeline)
+        if keys is None and plan is not None and plan[1] is not None:
+            keys = row_hashes(cleaned, plan[1].get("subset"))
+        path = self._dir(version.lineage, version.digest)
+        target = os.path.join(path, "cleaned.arrow")
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with METRICS.phase("version_save", *cleaned.shape, memory=False):
+            try:
+                table = pa.Table.from_pandas(cleaned, preserve_index=True)
+                with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            except (TypeError, ValueError, NotImplementedError, OSError, pa.ArrowException):
+                # Mixed-type columns can't be stored; the next version is cleaned in full.
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                return False
+            os.replace(tmp, target)
+        sources = version.hashes[cleaned.index.to_numpy()]
+        np.save(os.path.join(path, "cleaned_sources.npy"), sources)
+        if keys is not None:
+            np.save(os.path.join(path, "cleaned_keys.npy"), keys)
+        with self._lock:
+            version.steps = pipeline_signature(pipeline)
+            version.cleaned = read_arrow(target)
+            version.cleaned_sources = sources
+            version.cleaned_keys = keys
+            self._write_meta(version)
+            self._prune(version.lineage)
+        return True
+
+    def save_insight(self, lineage, digest, insight):
+        with self._lock:
+            version = self._versions(lineage).get(digest)
+            if version is not None and version.insight != insight:
+                version.insight = insight
+                self._write_meta(version)
+
+    def clear(self):
+        with self._lock:
+            self._lineages.clear()
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def _prune(self, lineage):
+        """Keep the two most recent versions (to describe changes) and the most recent cleaned one."""
+        versions = self._versions(lineage)
+        ordered = sorted(versions.values(), key=lambda v: v.created_at, reverse=True)
+        keep = {v.digest for v in ordered[:2]}
+        cleaned = [v for v in ordered if v.cleaned is not None]
+        if cleaned:
+            keep.add(cleaned[0].digest)
+        for version in ordered:
+            if version.digest not in keep:
+                del versions[version.digest]
+                shutil.rmtree(self._dir(lineage, version.digest), ignore_errors=True)
+
+    def _write_meta(self, version):
+        meta = {
+            "file_name": version.file_name,
+            "rows": version.rows,
+            "created_at": version.created_at,
+            "steps": version.steps,
+            "insight": version.insight,
+        }
+        path = os.path.join(self._dir(version.lineage, version.digest), "meta.json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, path)
+
+    def _read(self, lineage, digest):
+        path = self._dir(lineage, digest)
+        try:
+            with open(os.path.join(path, "meta.json")) as fh:
+                meta = json.load(fh)
+            hashes = np.load(os.path.join(path, "hashes.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        version = DatasetVersion(lineage, digest, meta["file_name"], meta["rows"], hashes,
+                                 meta["created_at"], steps=meta.get("steps"), insight=meta.get("insight"))
+        try:
+            version.profile = ProfileState.load(os.path.join(path, "profile.npz"))
+        except (OSError, ValueError, KeyError):
+            pass
+        cleaned = os.path.join(path, "cleaned.arrow")
+        if version.steps is not None and os.path.exists(cleaned) and pyarrow_available():
+            try:
+                version.cleaned = read_arrow(cleaned)
+                version.cleaned_sources = np.load(os.path.join(path, "cleaned_sources.npy"))
+                keys = os.path.join(path, "cleaned_keys.npy")
+                version.cleaned_keys = np.load(keys) if os.path.exists(keys) else None
+            except (OSError, ValueError):
+                version.cleaned = None
+        return version
+
+
+def read_arrow(path):
+    import pyarrow as pa
+
+    return pa.ipc.open_file(pa.memory_map(path)).read_all().to_pandas()
+
+
+# Shared by every session served from this process.
+VERSIONS = VersionStore()
+
+
+def register_upload(file_name, df, digest, store=VERSIONS):
+    """Record an upload and compare it with the previous version of the same lineage.
+
+    Returns the DatasetVersion, with ``delta`` and ``summary`` (the profile)
+    filled in; repeated calls for the same upload return it unchanged.
+    """
+    lineage = lineage_key(file_name, df)
+    version = store.get(lineage, digest)
+    if version is not None and version.summary is not None:
+        return version
+    start = time.perf_counter()
+    with METRICS.phase("version_compare", *df.shape):
+        hashes = row_hashes(df) if version is None else version.hashes
+        previous = store.previous(lineage, digest)
+        delta = row_delta(hashes, previous.hashes) if previous is not None else None
+    if version is not None and version.profile is not None:
+        # Recorded before a restart; only the in-memory comparison is rebuilt.
+        state, profiled = version.profile, 0
+    elif previous is not None and previous.profile is not None and delta.appended:
+        state = previous.profile.merge(profile_state(df.iloc[previous.rows:]))
+        profiled = len(df) - previous.rows
+    else:
+        state = profile_state(df)
+        profiled = len(df)
+    if version is None or version.profile is None:
+        version = store.register(lineage, digest, file_name, hashes, state)
+    version.previous_digest = previous.digest if previous is not None else None
+    version.delta = delta
+    version.summary = state.to_profile(time.perf_counter() - start, meta={"profiled_rows": profiled})
+    return version
+
+
+def clean_incremental(df, version, previous, steps, input_fingerprint, progress=None):
+    """Clean ``df`` reusing the cleaned rows of ``previous``.
+
+    Returns ``(cleaned, step_results, dedupe_keys)``, or None when the
+    pipeline or the previous version doesn't allow it. Row order and index
+    match a full run of the pipeline.
+    """
+    pipeline = CleaningPipeline(steps)
+    plan = incremental_plan(pipeline)
+    if (plan is None or previous is None or previous.cleaned is None
+            or previous.steps != pipeline_signature(pipeline)
+            or not df.index.equals(pd.RangeIndex(len(df)))):
+        return None
+    row_steps, dedupe = plan
+    if dedupe is not None and previous.cleaned_keys is None:
+        return None
+    fingerprints = pipeline.fingerprints(input_fingerprint)
+
+    # Each raw row seen before maps to the cleaned row it produced last time.
+    sources = pd.Index(previous.cleaned_sources)
+    first = np.flatnonzero(~sources.duplicated())
+    hit = sources[first].get_indexer(version.hashes)
+    reuse = hit >= 0
+    reused_rows = first[hit[reuse]]
+    new_positions = np.flatnonzero(~reuse)
+    reused = previous.cleaned.iloc[reused_rows]
+    reused.index = np.flatnonzero(reuse)
+
+    results = []
+    offset = len(reused)
+
+    def on_step(result):
+        result = StepResult(
+            name=result.name,
+            label=result.label,
+            seconds=result.seconds,
+            rows_affected=result.rows_affected,
+            detail=f"{result.detail} ({len(new_positions):,} new rows)",
+            rows_before=result.rows_before + offset,
+            rows_after=result.rows_after + offset,
+            cache_hit=False,
+            fingerprint=fingerprints[len(results)],
+        )
+        results.append(result)
+        if progress is not None:
+            progress(result)
+
+    fresh, _ = CleaningPipeline(row_steps, cache=None).run(df.iloc[new_positions], "delta", progress=on_step)
+    mismatched = {c: t for c, t in fresh.dtypes.items() if reused[c].dtype != t}
+    if mismatched:
+        try:
+            reused = reused.astype(mismatched)
+        except (TypeError, ValueError):
+            return None
+    merged = pd.concat([reused, fresh])
+    order = np.argsort(merged.index.to_numpy(), kind="stable")
+    merged = merged.iloc[order]
+    if dedupe is None:
+        return merged, results, None
+
+    start = time.perf_counter()
+    subset = dedupe.get("subset")
+    if any(c in mismatched for c in (subset or merged.columns)):
+        # Row hashes depend on dtype (int 1 and float 1.0 differ), so stored keys are stale.
+        keys = row_hashes(merged, subset)
+        hashed = f"hashed all {len(merged):,} rows, types changed"
+    else:
+        keys = np.concatenate([previous.cleaned_keys[reused_rows], row_hashes(fresh, subset)])[order]
+        hashed = f"hashed {len(fresh):,} new rows"
+    mask, _, _ = duplicate_mask(merged, subset, hashes=keys)
+    removed = int(mask.sum())
+    cleaned = merged[~mask] if removed else merged
+    scope = f" on {', '.join(map(str, subset))}" if subset else ""
+    step = StepResult(
+        name="drop_duplicates",
+        label=CLEANING_STEPS["drop_duplicates"].label,
+        seconds=time.perf_counter() - start,
+        rows_affected=removed,
+        detail=f"{removed} duplicate rows removed{scope} ({hashed})",
+        rows_before=len(merged),
+        rows_after=len(cleaned),
+        cache_hit=False,
+        fingerprint=fingerprints[-1],
+    )
+    results.append(step)
+    if progress is not None:
+        progress(step)
+    METRICS.incr("incremental_rows_reused", len(reused))
+    return cleaned, results, keys[~mask]
+
+
+def change_digest(version, previous, cleaned, token_budget):
+    """DataDigest of what changed between ``previous`` and ``version`` within ``token_budget``.
+
+    Lists the row delta and columns whose missing rate, mean or distinct count
+    shifted, then digests the cleaned rows that are new.
+    """
+    delta = version.delta or row_delta(version.hashes, previous.hashes)
+    lines = [
+        f"Changes since the previous upload of {previous.file_name} ({previous.uploaded}):",
+        f"- Rows: {delta.summary}",
+    ]
+    if version.profile is not None and previous.profile is not None:
+        lines += column_shifts(previous.profile, version.profile)
+    text = "\n".join(lines)
+    new_rows = cleaned[cleaned.index.isin(delta.added)]
+    remaining = token_budget - estimate_tokens(text)
+    sample_rows = 0
+    if len(new_rows) and remaining > 50:
+        rows_digest = build_digest(new_rows, remaining)
+        text += "\nNew or changed rows (after cleaning):\n" + rows_digest.text
+        sample_rows = rows_digest.sample_rows
+    return DataDigest(text, estimate_tokens(text), token_budget, cleaned.shape[1], sample_rows)
+
+
+def column_shifts(before, after):
+    lines = []
+    for i, column in enumerate(after.columns):
+        changes = []
+        old_missing = before.missing[i] / before.rows if before.rows else 0.0
+        new_missing = after.missing[i] / after.rows if after.rows else 0.0
+        if abs(new_missing - old_missing) >= MISSING_SHIFT:
+            changes.append(f"missing {old_missing:.1%} → {new_missing:.1%}")
+        old_mean, new_mean = before.mean[i], after.mean[i]
+        if np.isfinite(old_mean) and np.isfinite(new_mean) and \
+                abs(new_mean - old_mean) > MEAN_SHIFT * max(abs(old_mean), 1e-9):
+            changes.append(f"mean {old_mean:.4g} → {new_mean:.4g}")
+        if np.isfinite(before.maximum[i]) and after.maximum[i] > before.maximum[i]:
+            changes.append(f"new max {after.maximum[i]:.4g}")
+        if np.isfinite(before.minimum[i]) and after.minimum[i] < before.minimum[i]:
+            changes.append(f"new min {after.minimum[i]:.4g}")
+        old_distinct, new_distinct = distinct_of(before, i), distinct_of(after, i)
+        if new_distinct != old_distinct:
+            changes.append(f"distinct {old_distinct:,} → {new_distinct:,}")
+        if changes:
+            lines.append(f"- {column}: " + ", ".join(changes))
+    if not lines:
+        lines.append("- No column-level shifts in missing values, means, ranges or distinct counts")
+    return lines
+
+
+def distinct_of(state, i):
+    exact, sketch = state.distinct[i]
+    return len(exact) if exact is not None else sketch.count()
@@ -0,0 +1,192 @@
+"""Cleaning and analysis workflows behind the Streamlit UI.
+
+These used to live in ``app1-ds.py``; keeping them here lets the batch CLI,
+benchmarks and tests drive the same code without importing Streamlit, and
+keeps the Gemini SDK out of the import path until a model is actually called.
+"""
+from dataclasses import dataclass
+
+from .cleaning import CleaningPipeline
+from .datasets import DATASETS
+from .digest import digest_cached
+from .fanout import FANOUT_CONCURRENCY, group_prompts, run_fanout
+from .gemini import generate, generate_stream, generative_model
+from .outofcore import OutOfCoreDataset, clean_out_of_core, open_dataset
+from .progressive import cache_profile, cached_profile, profile_progressively
+from .prompts import (CHANGE_PROMPT_VERSION, DEEP_PROMPT_VERSION, RISK_PROMPT_VERSION, build_change_prompt,
+                      build_risk_prompt)
+from .response_cache import get_response_cache
+from .versions import VERSIONS, change_digest, clean_incremental
+
+# Blocks an out-of-core reservoir sample is scanned in, so precision can stop it early.
+SAMPLE_BLOCKS = 20
+
+
+@dataclass
+class AnalysisPlan:
+    data_sample: str
+    prompt_version: str
+    prompt: str = None
+    group_prompt_list: list = None
+    caption: str = ""
+
+
+def prepare_analysis(df, fingerprint, token_budget, deep=False, changes=None):
+    """Build the prompt(s) for a quick or deep analysis of the cleaned frame.
+
+    Out-of-core datasets are analyzed from a reservoir sample. ``changes`` is
+    a ``(version, previous_version)`` pair to analyze only what changed.
+    """
+    if changes is not None:
+        return plan_changes(df, token_budget, *changes)
+    if isinstance(df, OutOfCoreDataset):
+        if not deep:
+            return plan_quick(df.digest_text(token_budget))
+        df = df.sample()
+    if deep:
+        group_prompt_list = group_prompts(df, token_budget=token_budget)
+        return AnalysisPlan(
+            data_sample="\n".join(p for _, p in group_prompt_list),
+            prompt_version=DEEP_PROMPT_VERSION,
+            group_prompt_list=group_prompt_list,
+            caption=(
+                f"🧩 Deep analysis: {len(group_prompt_list)} column groups, "
+                f"up to {FANOUT_CONCURRENCY} concurrent requests"
+            ),
+        )
+    return plan_quick(digest_cached(df, fingerprint, token_budget=token_budget))
+
+
+def plan_quick(data_digest):
+    return AnalysisPlan(
+        data_sample=data_digest.text,
+        prompt_version=RISK_PROMPT_VERSION,
+        prompt=build_risk_prompt(data_digest.text),
+        caption=(
+            f"📏 Data digest: ~{data_digest.tokens} tokens of {data_digest.budget} budget "
+            f"({data_digest.columns_described} columns, {data_digest.sample_rows} sample rows)"
+        ),
+    )
+
+
+def plan_changes(df, token_budget, version, previous):
+    data_digest = change_digest(version, previous, df, token_budget)
+    return AnalysisPlan(
+        data_sample="\n".join([data_digest.text, previous.insight or ""]),
+        prompt_version=CHANGE_PROMPT_VERSION,
+        prompt=build_change_prompt(data_digest.text, previous.insight),
+        caption=(
+            f"🔁 Change digest vs. the upload of {previous.uploaded}: ~{data_digest.tokens} tokens "
+            f"of {data_digest.budget} budget ({version.delta.summary if version.delta else 'row counts only'})"
+        ),
+    )
+
+
+def run_cleaning_job(job, raw_key, steps, input_fingerprint, store, digest, lineage=None):
+    """Clean the shared dataset ``raw_key`` and register the result as its child version.
+
+    Returns the cleaned dataset's key rather than the frame, so the finished
+    job does not keep a private reference to it. With a ``lineage`` the rows
+    already cleaned in the previous version of the upload are reused.
+    """
+    raw_df = DATASETS.get(raw_key, job.session_id)
+    if raw_df is None:
+        raise RuntimeError("The uploaded dataset is no longer loaded; upload the file again.")
+
+    def on_step(step):
+        source = "cached" if step.cache_hit else f"{step.seconds*1000:.0f} ms"
+        job.report(f"{step.label}... {step.detail} ({source})", progress=(len(job.messages) + 1) / len(steps))
+
+    version = VERSIONS.get(lineage, digest) if lineage else None
+    incremental = None
+    if version is not None:
+        previous = VERSIONS.previous(lineage, digest, cleaned=True)
+        incremental = clean_incremental(raw_df, version, previous, steps, input_fingerprint, progress=on_step)
+    if incremental is not None:
+        df, step_results, keys = incremental
+        job.report(f"🔁 Unchanged rows reused from the version uploaded {previous.uploaded}")
+    else:
+        df, step_results = CleaningPipeline(steps).run(raw_df, input_fingerprint=input_fingerprint, progress=on_step)
+        keys = None
+    if version is not None:
+        VERSIONS.save_cleaned(version, CleaningPipeline(steps), df, keys)
+    if store is not None:
+        store.save(digest, "cleaned", df)
+    key = step_results[-1].fingerprint if step_results else input_fingerprint
+    DATASETS.share(key, df, parent=raw_key, session_id=job.session_id)
+    return {"dataset": key, "steps": step_results}
+
+
+def run_out_of_core_cleaning_job(job, raw_path, steps, input_fingerprint, digest):
+    def on_step(step):
+        job.report(f"{step.label}... {step.detail}", progress=(len(job.messages) + 1) / len(steps))
+
+    cleaned, step_results = clean_out_of_core(open_dataset(raw_path, digest), steps, input_fingerprint, progress=on_step)
+    return {"dataset": input_fingerprint if not step_results else step_results[-1].fingerprint,
+            "path": cleaned.path, "steps": step_results}
+
+
+def run_progressive_profile_job(job, raw_key, precision=None, raw_path=None, digest=None, profile_key=None):
+    """Profile a large dataset in blocks of random rows, publishing each estimate as ``job.partial``.
+
+    In-memory frames are scanned until the scan ends, the intervals are
+    within ``precision`` or the session cancels the job. Out-of-core datasets
+    are estimated from their reservoir sample first, then profiled exactly by
+    DuckDB unless cancelled or the estimate is already within ``precision``.
+    Results not cut short by the session are cached under ``profile_key`` for
+    every session.
+    """
+    if profile_key is not None:
+        cached = cached_profile(profile_key, precision)
+        if cached is not None:
+            return cached
+
+    def publish(profile):
+        job.report(progress=profile.meta["fraction"], partial=profile)
+
+    if raw_path is not None:
+        dataset = open_dataset(raw_path, digest)
+        job.report("🎲 Estimating from a reservoir sample...")
+        sample = dataset.sample()
+        profile = profile_progressively(sample, publish=publish, stop=lambda: job.cancel_requested,
+                                        precision=precision, total_rows=dataset.rows,
+                                        block_rows=max(len(sample) // SAMPLE_BLOCKS, 1))
+        if job.cancel_requested:
+            return profile
+        if not profile.meta.get("stopped"):
+            job.report("🦆 Computing the full profile with DuckDB...")
+            profile = dataset.profile()
+    else:
+        df = DATASETS.get(raw_key, job.session_id)
+        if df is None:
+            raise RuntimeError("The uploaded dataset is no longer loaded; upload the file again.")
+        profile = profile_progressively(df, publish=publish, stop=lambda: job.cancel_requested, precision=precision)
+    if profile_key is not None and not job.cancel_requested:
+        cache_profile(profile_key, profile, precision)
+    return profile
+
+
+def run_analysis_job(job, model_name, prompt_version, sample_fingerprint, prompt=None, group_prompt_list=None, stream=True,
+                     version=None):
+    model = generative_model(model_name)
+    if group_prompt_list is not None:
+        job.report(f"🧩 Analyzing {len(group_prompt_list)} column groups...")
+        insight, group_results, wall_seconds = run_fanout(model, group_prompt_list)
+        timing_caption = (
+            f"⏱️ {len(group_results)} calls in {wall_seconds:.2f}s "
+            f"(slowest {max(r.seconds for r in group_results):.2f}s)"
+        )
+    else:
+        if stream:
+            result = generate_stream(model, prompt, on_text=lambda text: job.report(text=text), on_status=job.report)
+        else:
+            result = generate(model, prompt, on_status=job.report)
+        insight = result.text
+        timing_caption = f"⏱️ First token {result.first_token_seconds or 0:.2f}s · total {result.seconds:.2f}s"
+        if result.coalesced:
+            timing_caption += " · shared with an identical request already in flight"
+    get_response_cache().put(model_name, prompt_version, sample_fingerprint, insight)
+    if version is not None:
+        # The next upload of this dataset is analyzed against this insight.
+        VERSIONS.save_insight(version.lineage, version.digest, insight)
+    return {"insight": insight, "caption": timing_caption}
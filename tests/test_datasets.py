@@ -0,0 +1,73 @@
+import gc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from datasage.datasets import Dataset, DatasetStore
+from datasage.metrics import rss_bytes
+
+pytest.importorskip("pyarrow")
+
+
+def numeric_frame(rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({"a": rng.random(rows), "b": np.arange(rows), "c": rng.random(rows)})
+
+
+def test_spill_releases_process_memory(tmp_path):
+    store = DatasetStore(max_bytes=1, spill_dir=str(tmp_path))
+    frame = numeric_frame(4_000_000)
+    expected = frame.iloc[::100_000].copy()
+    gc.collect()
+    before = rss_bytes()
+    mapped = store.share("raw", frame, session_id="s1")
+    del frame
+    gc.collect()
+    after = rss_bytes()
+
+    assert store.stats()["mapped"] == 1
+    assert store.resident_bytes < 1024
+    assert before - after > 64 * 1024 * 1024
+    pd.testing.assert_frame_equal(mapped.iloc[::100_000], expected)
+
+
+def test_rematerialized_columns_stay_resident(tmp_path):
+    store = DatasetStore(max_bytes=1, spill_dir=str(tmp_path))
+    rows = 200_000
+    frame = pd.DataFrame({
+        "x": np.arange(rows),
+        "labels": pd.Series([f"row {i}" for i in range(rows)], dtype=object),
+        "grade": pd.Categorical(np.arange(rows) % 3),
+    })
+    object_bytes = int(frame["labels"].memory_usage(index=False, deep=True))
+    mapped = store.share("raw", frame)
+
+    assert store.stats()["mapped"] == 1
+    assert list(mapped.dtypes) == list(frame.dtypes)
+    assert store.resident_bytes >= object_bytes
+    assert store.resident_bytes < object_bytes + int(frame["grade"].memory_usage(index=False, deep=True)) + 1024
+
+
+def test_spilled_frame_matches_original(tmp_path):
+    store = DatasetStore(max_bytes=1, spill_dir=str(tmp_path))
+    frame = pd.DataFrame({
+        "n": [1.0, None, 3.0],
+        "s": pd.Series(["a", None, "c"], dtype="str"),
+        "d": pd.to_datetime(["2024-01-01", "2024-01-02", None]),
+        "b": [True, False, True],
+    })
+    mapped = store.share("raw", frame.copy())
+    pd.testing.assert_frame_equal(mapped, frame)
+
+
+def test_dropped_while_spilling_removes_file(tmp_path):
+    store = DatasetStore(max_bytes=1, spill_dir=str(tmp_path))
+    frame = numeric_frame(1000)
+    store._datasets["raw"] = dataset = Dataset("raw", frame, nbytes=int(frame.memory_usage().sum()))
+    picked = store._sweep(0.0)
+    assert [d for d, _ in picked] == [dataset] and dataset.spilling
+    store.clear()
+    store._spill_all(picked)
+    assert "raw" not in store
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datasage.dedupe import drop_duplicates_hashed, duplicate_mask, row_hashes
+
+
+def frame_with_duplicates(rows=5000):
+    rng = np.random.default_rng(11)
+    frame = pd.DataFrame({
+        "customer": rng.choice(["ann", "bob", "cy", None], rows),
+        "region": pd.Categorical(rng.choice(["North", "South"], rows)),
+        "amount": rng.choice([1.5, 2.0, np.nan], rows),
+        "units": rng.integers(0, 4, rows),
+    })
+    return pd.concat([frame, frame.sample(500, random_state=2)], ignore_index=True)
+
+
+@pytest.mark.parametrize("subset", [None, ["customer"], ["region", "amount"]])
+@pytest.mark.parametrize("chunk_rows", [7, 200_000])
+def test_duplicate_mask_matches_pandas(subset, chunk_rows):
+    frame = frame_with_duplicates()
+    mask, candidates, collisions = duplicate_mask(frame, subset, chunk_rows)
+    np.testing.assert_array_equal(mask, frame.duplicated(subset=subset, keep="first").to_numpy())
+    assert candidates >= mask.sum()
+    assert collisions == 0
+
+
+def test_drop_duplicates_hashed_matches_pandas():
+    frame = frame_with_duplicates()
+    result = drop_duplicates_hashed(frame)
+    expected = frame.drop_duplicates()
+    pd.testing.assert_frame_equal(result.frame, expected)
+    assert result.removed == len(frame) - len(expected)
+
+
+def test_hash_collisions_are_ruled_out():
+    frame = pd.DataFrame({"a": [1, 2, 1, 3]})
+    forced = np.zeros(len(frame), dtype=np.uint64)
+    mask, candidates, collisions = duplicate_mask(frame, hashes=forced)
+    assert mask.tolist() == [False, False, True, False]
+    assert candidates == 4 and collisions == 2
+
+
+def test_missing_key_columns_raise():
+    with pytest.raises(KeyError):
+        row_hashes(pd.DataFrame({"a": [1]}), ["b"])
@@ -0,0 +1,66 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from datasage.ingest import ingest
+
+SAMPLE = "sample_datasage.xlsx.csv"
+
+
+def business_csv(rows=3000, bad_row=None):
+    rng = np.random.default_rng(7)
+    frame = pd.DataFrame({
+        "order_id": np.arange(rows),
+        "region": rng.choice(["North", "South", "East", "West"], rows),
+        "amount": rng.normal(250, 40, rows).round(2),
+        "units": rng.integers(1, 20, rows),
+        "note": [f"note {i}" for i in range(rows)],
+    })
+    frame.loc[rng.choice(rows, 50, replace=False), "amount"] = np.nan
+    if bad_row is not None:
+        frame["units"] = frame["units"].astype(object)
+        frame.loc[bad_row, "units"] = "ERROR_404"
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False)
+    return buffer.getvalue().encode()
+
+
+def assert_same_values(frame, expected):
+    assert list(frame.columns) == list(expected.columns)
+    for col in expected.columns:
+        got, want = frame[col], expected[col]
+        if isinstance(got.dtype, pd.CategoricalDtype):
+            got = got.astype(want.dtype)
+        if pd.api.types.is_numeric_dtype(want):
+            np.testing.assert_allclose(got.to_numpy(dtype=float), want.to_numpy(dtype=float), rtol=1e-6)
+        else:
+            assert got.isna().tolist() == want.isna().tolist(), col
+            assert got.dropna().astype(str).tolist() == want.dropna().astype(str).tolist(), col
+
+
+@pytest.mark.parametrize("source", [SAMPLE, "generated"])
+def test_optimized_matches_standard(source):
+    data = business_csv() if source == "generated" else open(SAMPLE, "rb").read()
+    standard = ingest(data, "standard", cache=None)
+    optimized = ingest(data, "optimized", cache=None, chunk_rows=500, sample_rows=200)
+    assert_same_values(optimized.frame, standard.frame)
+    assert optimized.memory_bytes <= standard.memory_bytes
+
+
+def test_optimized_reads_column_as_text_when_chunks_disagree():
+    data = business_csv(bad_row=2500)
+    standard = ingest(data, "standard", cache=None)
+    optimized = ingest(data, "optimized", cache=None, chunk_rows=500, sample_rows=200)
+    assert not pd.api.types.is_numeric_dtype(optimized.frame["units"])
+    assert_same_values(optimized.frame, standard.frame)
+
+
+def test_arrow_matches_standard():
+    pytest.importorskip("pyarrow")
+    data = business_csv() + b"3000,North,NA,2,\n3001,,N/A,3,null\n"
+    standard = ingest(data, "standard", cache=None)
+    arrow = ingest(data, "arrow", cache=None)
+    assert arrow.frame.isna().sum().tolist() == standard.frame.isna().sum().tolist()
+    assert_same_values(arrow.frame, standard.frame)
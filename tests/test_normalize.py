@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datasage.normalize import normalize_codes, normalize_values, rebuild_values
+
+VALUES = [" north", "South ", "SOUTH", "east", None, " north", "West  ", "", "  "]
+
+
+def text_series(dtype):
+    values = VALUES * 50
+    if dtype == "category":
+        return pd.Series(pd.Categorical(values))
+    return pd.Series(values, dtype=dtype)
+
+
+@pytest.mark.parametrize("dtype", ["str", object, "category"])
+@pytest.mark.parametrize("case, method", [(None, None), ("lower", "lower"), ("upper", "upper"),
+                                          ("title", "title"), ("capitalize", "capitalize")])
+def test_normalize_values_matches_str_methods(dtype, case, method):
+    series = text_series(dtype)
+    expected = series.astype(object).str.strip()
+    if method:
+        expected = getattr(expected.str, method)()
+    normalized, changed = normalize_values(series, strip=True, case=case)
+
+    assert normalized.isna().tolist() == series.isna().tolist()
+    assert normalized.astype(object).where(normalized.notna(), None).tolist() == \
+        expected.where(expected.notna(), None).tolist()
+    was = series.astype(object)
+    assert changed.tolist() == [pd.notna(v) and v != e for v, e in zip(was, expected)]
+    if dtype == "category":
+        assert isinstance(normalized.dtype, pd.CategoricalDtype)
+    elif dtype == "str":
+        assert normalized.dtype == series.dtype
+
+
+def test_typo_map_applies_after_strip_and_case():
+    series = pd.Series([" south", "Sth", "SOUTH ", None, "North"])
+    normalized, changed = normalize_values(series, case="capitalize", typo_map={"sth": "South"})
+    assert normalized.tolist()[:3] == ["South", "South", "South"]
+    assert pd.isna(normalized.iloc[3]) and normalized.iloc[4] == "North"
+    assert changed.tolist() == [True, True, True, False, False]
+
+
+def test_codes_round_trip_through_rebuild():
+    series = text_series("str")
+    codes, categories, _ = normalize_codes(series)
+    assert codes.dtype == np.int8
+    assert len(categories) == len(set(s.strip() for s in VALUES if s is not None))
+    pd.testing.assert_series_equal(rebuild_values(series, codes, categories), normalize_values(series)[0])
+
+
+def test_unknown_case_raises():
+    with pytest.raises(ValueError):
+        normalize_values(pd.Series(["a"]), case="snake")
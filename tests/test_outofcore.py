@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datasage.cache import LRUCache
+from datasage.cleaning import CleaningPipeline
+from datasage.ingest import ingest
+
+pytest.importorskip("duckdb")
+
+from datasage.outofcore import clean_out_of_core, open_dataset  # noqa: E402
+
+SAMPLE = "sample_datasage.xlsx.csv"
+
+
+def steps(subset=None):
+    return [("normalize_headers", {}), ("strip_text", {}), ("drop_duplicates", {"subset": subset} if subset else {})]
+
+
+def in_memory(path, pipeline_steps):
+    frame = ingest(path, "standard", cache=None).frame
+    return CleaningPipeline(pipeline_steps, cache=None).run(frame)
+
+
+def test_cleaning_matches_in_memory(tmp_path):
+    expected, expected_results = in_memory(SAMPLE, steps())
+    cleaned, results = clean_out_of_core(open_dataset(SAMPLE), steps(), "sample", out_dir=str(tmp_path))
+
+    assert [(r.name, r.rows_affected, r.detail) for r in results] == \
+        [(r.name, r.rows_affected, r.detail) for r in expected_results]
+    got = cleaned.query("SELECT * FROM {source}")
+    assert list(got.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(got.astype(str), expected.reset_index(drop=True).astype(str))
+
+
+def test_missing_markers_match_pandas(tmp_path):
+    path = tmp_path / "na.csv"
+    path.write_text("name,score\nalpha,1\nNA,N/A\nnull,3\n,#N/A\n")
+    dataset = open_dataset(str(path))
+    expected = pd.read_csv(path)
+    assert dataset.types["score"] == "BIGINT"
+    assert dataset.profile().table["Missing"].tolist() == expected.isna().sum().tolist()
+
+
+def test_first_duplicate_is_kept_in_file_order(tmp_path):
+    rows = 400_000
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({"key": rng.integers(0, 500, rows), "value": np.arange(rows)})
+    path = tmp_path / "dups.csv"
+    frame.to_csv(path, index=False)
+    expected = frame.drop_duplicates("key")["value"].tolist()
+    for run in range(2):
+        cleaned, _ = clean_out_of_core(open_dataset(str(path)), steps(["key"]), f"dups-{run}",
+                                       out_dir=str(tmp_path / str(run)))
+        assert cleaned.query("SELECT value FROM {source}")["value"].tolist() == expected
+
+
+def test_lru_cache_count_mode():
+    cache = LRUCache(max_entries=2)
+    for key in "abc":
+        cache.put(key, object())
+    assert "a" not in cache and len(cache) == 2
+    assert cache.stats()["bytes"] == 0
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datasage import parallel
+from datasage.cleaning import strip_text
+from datasage.parallel import get_pool, map_columns
+from datasage.profile import column_distinct
+
+pytest.importorskip("pyarrow")
+
+
+def mixed_frame(rows=5000):
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        "id": np.arange(rows),
+        "amount": rng.normal(100, 20, rows).round(2),
+        "region": rng.choice([" north", "South ", "east", None], rows),
+        "code": [f" c{i % 300} " for i in range(rows)],
+        "flag": rng.choice(["yes", "no"], rows),
+        "mixed": pd.Series([1, "a", 2.5, None] * (rows // 4), dtype=object),
+    })
+
+
+def test_map_columns_distinct_matches_serial():
+    df = mixed_frame()
+    serial = map_columns(column_distinct, df, workers=1)
+    assert map_columns(column_distinct, df, workers=2, min_cells=0) == serial
+    assert map_columns(column_distinct, df, columns=["code", "id"], workers=2, min_cells=0) == [serial[3], serial[0]]
+
+
+def test_strip_text_matches_serial(monkeypatch):
+    df = mixed_frame()
+    monkeypatch.setattr(parallel, "PARALLEL_WORKERS", 1)
+    expected, expected_rows, _ = strip_text(df)
+    monkeypatch.setattr(parallel, "PARALLEL_WORKERS", 2)
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_CELLS", 0)
+    out, rows, _ = strip_text(df)
+    assert rows == expected_rows
+    pd.testing.assert_frame_equal(out, expected)
+
+
+def test_pools_are_kept_per_worker_count():
+    two = get_pool(2)
+    three = get_pool(3)
+    assert get_pool(2) is two and get_pool(3) is three
+    assert two.submit(sum, [1, 2]).result() == 3
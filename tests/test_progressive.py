@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from datasage.profile import profile_frame
+from datasage.progressive import profile_progressively, ratio_interval
+
+
+def test_ratio_interval_covers_true_ratio():
+    rng = np.random.default_rng(5)
+    blocks, block_rows, sampled = 400, 50, 12
+    # Missing rate and values drift across the file, so blocks are not alike.
+    rate = np.linspace(0.02, 0.3, blocks)
+    missing = rng.binomial(block_rows, rate).astype(float)
+    present = block_rows - missing
+    sums = present * rng.normal(np.linspace(10, 30, blocks), 2)
+    truth = (missing.sum() / (blocks * block_rows), sums.sum() / present.sum())
+
+    covered = np.zeros(2)
+    trials = 500
+    fpc = 1 - sampled / blocks
+    for _ in range(trials):
+        pick = rng.choice(blocks, sampled, replace=False)
+        for i, (y, m) in enumerate([(missing, np.full(blocks, float(block_rows))), (sums, present)]):
+            estimate, half = ratio_interval(y[pick, None], m[pick, None], fpc)
+            covered[i] += abs(estimate[0] - truth[i]) <= half[0]
+    assert np.all(covered / trials >= 0.9), covered / trials
+    assert np.all(covered / trials <= 0.99), covered / trials
+
+
+def test_ratio_interval_is_exact_for_a_full_census():
+    y = np.array([[1.0, 4.0], [3.0, 2.0]])
+    m = np.array([[2.0, 2.0], [2.0, 2.0]])
+    estimate, half = ratio_interval(y, m, fpc=0.0)
+    np.testing.assert_allclose(estimate, [1.0, 1.5])
+    np.testing.assert_array_equal(half, [0.0, 0.0])
+
+
+def test_ratio_interval_needs_two_blocks():
+    estimate, half = ratio_interval(np.array([[2.0]]), np.array([[4.0]]), fpc=0.5)
+    assert estimate[0] == 0.5 and np.isnan(half[0])
+
+
+def test_progressive_profile_finishes_at_the_full_profile():
+    rng = np.random.default_rng(2)
+    rows = 20_000
+    df = pd.DataFrame({"amount": rng.normal(5, 1, rows), "region": rng.choice(["a", "b", None], rows)})
+    profile = profile_progressively(df, block_rows=1000)
+    full = profile_frame(df).table.set_index("Column")
+    table = profile.table.set_index("Column")
+    assert not profile.approximate
+    assert table["Missing"].tolist() == full["Missing"].tolist()
+    np.testing.assert_allclose(table["Mean"].astype(float), full["Mean"].astype(float), equal_nan=True)
+
+
+def test_precision_stops_early_on_uniform_data():
+    rng = np.random.default_rng(4)
+    df = pd.DataFrame({"amount": rng.normal(100, 5, 200_000), "flag": rng.choice([1.0, np.nan], 200_000)})
+    profile = profile_progressively(df, block_rows=2000, precision=0.05)
+    assert profile.meta["stopped"] and profile.meta["scanned_rows"] < len(df)
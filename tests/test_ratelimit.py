@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from datasage.ratelimit import Coalescer, TokenBucket, backoff_delay
+
+
+def test_token_bucket_spaces_calls_beyond_the_burst():
+    bucket = TokenBucket(rate=10, capacity=2)
+    waits = [bucket.reserve() for _ in range(4)]
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1, abs=0.02)
+    assert waits[3] == pytest.approx(0.2, abs=0.02)
+
+
+def test_token_bucket_refills_and_caps_cost():
+    bucket = TokenBucket(rate=1000, capacity=5)
+    assert bucket.reserve(50) == 0.0  # a cost above capacity is charged as a full bucket
+    time.sleep(0.01)
+    assert 0 < bucket.available <= 5
+
+
+def test_token_bucket_pause_blocks_every_caller():
+    bucket = TokenBucket(rate=1000, capacity=10)
+    bucket.pause(0.2)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.05)
+
+
+def test_acquire_async_waits_and_can_be_cancelled():
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    async def main():
+        assert await bucket.acquire_async() == 0.0
+        start = time.monotonic()
+        await bucket.acquire_async()
+        waited = time.monotonic() - start
+        task = asyncio.create_task(bucket.acquire_async(cost=1))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return waited
+
+    assert asyncio.run(main()) >= 0.04
+
+
+def test_coalescer_runs_one_call_per_key():
+    coalescer = Coalescer()
+    started, release = threading.Event(), threading.Event()
+    calls, results, streamed = [], [], []
+
+    def call(publish):
+        calls.append(1)
+        started.set()
+        publish("partial")
+        release.wait(5)
+        publish("partial answer")
+        return "answer"
+
+    def follower():
+        results.append(coalescer.run("prompt", call, on_text=streamed.append))
+
+    leader = threading.Thread(target=lambda: results.append(coalescer.run("prompt", call)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=follower) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while coalescer._calls["prompt"].followers < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 3
+    assert streamed.count("partial answer") == 3
+    assert coalescer.in_flight == 0
+
+
+def test_coalescer_shares_errors_and_forgets_failed_calls():
+    coalescer = Coalescer()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def fail(publish):
+        started.set()
+        release.wait(5)
+        raise RuntimeError("quota")
+
+    def run():
+        try:
+            coalescer.run("k", fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    threads[0].start()
+    started.wait(5)
+    threads[1].start()
+    while coalescer._calls["k"].followers < 1:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(errors) == 2 and errors[0] is errors[1]
+    assert coalescer.run("k", lambda publish: 42) == (42, False)
+
+
+def test_backoff_delay_is_capped():
+    assert all(0 <= backoff_delay(attempt, 1.0, 8.0) <= 8.0 for attempt in range(20))
+    assert all(backoff_delay(0, 1.0, 8.0) <= 1.0 for _ in range(50))
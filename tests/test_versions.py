@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datasage.cleaning import CleaningPipeline, cleaning_step
+from datasage.dedupe import row_hashes
+from datasage.versions import VersionStore, clean_incremental
+
+pytest.importorskip("pyarrow")
+
+
+@cleaning_step("test_numeric_amounts", "Parsing amounts")
+def numeric_amounts(df):
+    out = df.copy(deep=False)
+    out["amount"] = pd.to_numeric(df["amount"])
+    return out, 0, "amounts parsed"
+
+
+def clean_both(store, df1, df2, steps):
+    """``(incremental result, full clean)`` of ``df2`` after ``df1`` was cleaned in full."""
+    first = store.register("lineage", "v1", "export.csv", row_hashes(df1), None)
+    cleaned, _ = CleaningPipeline(steps, cache=None).run(df1)
+    assert store.save_cleaned(first, CleaningPipeline(steps), cleaned)
+    second = store.register("lineage", "v2", "export.csv", row_hashes(df2), None)
+    previous = store.previous("lineage", "v2", cleaned=True)
+    incremental = clean_incremental(df2, second, previous, steps, "v2")
+    full, _ = CleaningPipeline(steps, cache=None).run(df2)
+    return incremental, full
+
+
+def test_incremental_matches_full_clean(tmp_path):
+    rng = np.random.default_rng(3)
+    rows = 2000
+    df1 = pd.DataFrame({
+        "Order ID": rng.integers(0, 800, rows),
+        " Region ": rng.choice([" north", "South ", "east"], rows),
+        "amount": rng.integers(1, 50, rows).astype(float),
+    })
+    appended = df1.sample(300, random_state=1).assign(amount=lambda d: d["amount"] + rng.integers(0, 2, 300))
+    df2 = pd.concat([df1, appended], ignore_index=True)
+    steps = [("normalize_headers", {}), ("strip_text", {}), ("drop_duplicates", {})]
+
+    incremental, full = clean_both(VersionStore(str(tmp_path)), df1, df2, steps)
+    cleaned, results, keys = incremental
+    pd.testing.assert_frame_equal(cleaned, full)
+    assert results[-1].rows_affected == len(df2) - len(full)
+    np.testing.assert_array_equal(keys, row_hashes(full))
+
+
+def test_dtype_change_in_new_rows_still_finds_duplicates(tmp_path):
+    df1 = pd.DataFrame({"id": ["a", "b", "c"], "amount": ["1", "2", "3"]})
+    # "1.0" is a new raw row, but parses to the same cleaned row as "1"; the missing amount
+    # turns the cleaned column from int to float.
+    df2 = pd.DataFrame({"id": ["a", "b", "c", "a", "d"], "amount": ["1", "2", "3", "1.0", None]})
+    steps = [("test_numeric_amounts", {}), ("drop_duplicates", {})]
+
+    (cleaned, results, _), full = clean_both(VersionStore(str(tmp_path)), df1, df2, steps)
+    assert full["amount"].dtype == np.float64
+    pd.testing.assert_frame_equal(cleaned, full)
+    assert results[-1].rows_affected == 1